@@ -0,0 +1,85 @@
+"""Sound effects through small voice pools, queued and played once per frame.
+
+The game only queues sound names while it simulates; the sketch calls
+flush() once per frame, after the update loop. A name queued any number of
+times in one frame plays once, and not again until its min_interval has
+passed. Each sample is loaded as a few independent AudioPlayers (voices)
+that take turns, so a new hit starts on a free voice instead of rewinding
+the one still playing.
+"""
+
+
+class Sample:
+    def __init__(self, minim, path, voices=1, min_interval=0):
+        self.voices = [minim.loadFile(path) for _ in range(voices)]
+        self.next_voice = 0
+        # ms that must pass between two plays
+        self.min_interval = min_interval
+        self.last_played = None
+
+    def play(self, now):
+        if self.last_played is not None and now - self.last_played < self.min_interval:
+            return False
+        voice = self.voices[self.next_voice]
+        self.next_voice = (self.next_voice + 1) % len(self.voices)
+        voice.rewind()
+        voice.play()
+        self.last_played = now
+        return True
+
+    def stop(self):
+        for voice in self.voices:
+            voice.pause()
+        self.last_played = None
+
+
+class SoundBoard:
+    def __init__(self, minim):
+        self.minim = minim
+        self.samples = {}
+        self.music = None
+        # names queued since the last flush, in first-queued order
+        self.pending = []
+        self.music_command = None
+
+        self.queued = 0
+        self.played = 0
+
+    def load(self, name, path, voices=1, min_interval=0):
+        self.samples[name] = Sample(self.minim, path, voices, min_interval)
+
+    def load_music(self, path):
+        self.music = self.minim.loadFile(path)
+
+    def queue(self, name):
+        self.queued += 1
+        if name not in self.pending:
+            self.pending.append(name)
+
+    def start_music(self):
+        self.music_command = "start"
+
+    def stop_music(self):
+        self.music_command = "stop"
+
+    def stop_all(self):
+        """Silence every effect now and drop anything still queued."""
+        del self.pending[:]
+        for sample in self.samples.values():
+            sample.stop()
+
+    def flush(self, now):
+        if self.music_command is not None and self.music is not None:
+            if self.music_command == "start":
+                self.music.rewind()
+                self.music.loop()
+            else:
+                self.music.pause()
+        self.music_command = None
+
+        if not self.pending:
+            return
+        for name in self.pending:
+            if self.samples[name].play(now):
+                self.played += 1
+        del self.pending[:]
@@ -0,0 +1,340 @@
+"""Run many seeded headless games across a process pool, for tuning.
+
+Every game is one Simulation played by a policy until it dies or runs out
+of ticks. A parameter set overrides simulation.py's tuning constants
+(upper case: TRAIN_CHANCE, POWERUP_CHANCE, the gap buffers ...) and
+Simulation attributes (lower case: powerup_cooldown, max_obstacles ...),
+only those listed in TUNABLE_CONSTANTS and TUNABLE_ATTRIBUTES; --sweep
+plays every combination of the listed values. Seeds are handed
+out to the workers in chunks, so the pool stays busy and scales with the
+number of cores.
+
+    python batch.py --games 2000                          # defaults
+    python batch.py --set powerup_cooldown=10000 --out cooldown.json
+    python batch.py --sweep TRAIN_CHANCE=0.3,0.4,0.5 --policy random
+
+Results are written column-wise: per parameter set one list per field
+(seed, score, ticks, cause, attempts, rejections, rejection_rate), plus a
+summary of each distribution. `cause` is the type of whatever killed the
+player, or null when the game ran out of ticks.
+"""
+
+import itertools
+import json
+import random
+import sys
+import time
+
+import simulation
+from events import Died
+from simulation import Simulation, SLIDE, TRAIN1, TRAIN3
+
+# constants the simulation reads when it needs them, so overriding them
+# takes effect; layout constants (LANE_COUNT, the kind codes ...) are not
+# tuning knobs and would only corrupt a run
+TUNABLE_CONSTANTS = (
+    "TRACK_SCROLL_SPEED", "SCROLL_ACCELERATION", "MAX_SCROLL_SPEED",
+    "PLAN_CHUNK", "ACTIVATION_X", "PLAN_START_X", "BLOCK_DISTANCE",
+    "TRAIN_CHANCE", "MAX_TRAIN_EXTRA_SPEED", "POWERUP_CHANCE",
+    "OBSTACLE_ATTEMPTS", "COINROW_ATTEMPTS", "POWERUP_ATTEMPTS",
+    "MIN_GAP", "TRAIN_BUFFER", "FAST_TRAIN_BUFFER", "SLIDE_BUFFER", "COIN_BUFFER",
+    "SPAWN_SEARCH_DISTANCE",
+)
+TUNABLE_ATTRIBUTES = ("powerup_cooldown", "max_obstacles", "max_coin_rows", "max_air_coin_rows")
+
+# every tunable constant as shipped, restored before each parameter set
+DEFAULTS = dict((name, getattr(simulation, name)) for name in TUNABLE_CONSTANTS)
+
+COLUMNS = ("seed", "score", "ticks", "cause", "attempts", "rejections", "rejection_rate")
+
+
+# -- policies ------------------------------------------------------------------
+
+class IdlePolicy:
+    """Never touches the controls."""
+
+    def __init__(self, seed):
+        pass
+
+    def __call__(self, sim):
+        pass
+
+
+class RandomPolicy:
+    """simulation.random_policy, but on its own seeded generator."""
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+
+    def __call__(self, sim):
+        r = self.rng.random()
+        if r < 0.01:
+            sim.input("up")
+        elif r < 0.02:
+            sim.input("down")
+        elif r < 0.03:
+            sim.input("jump")
+        elif r < 0.04:
+            sim.input("slide")
+
+
+class DodgePolicy:
+    """Scripted player: reacts to the nearest thing ahead in its lane.
+
+    Jumps fences and bushes, slides under barriers and changes lanes away
+    from trains, about as well as an attentive beginner.
+    """
+
+    # px ahead of the player's hitbox at which it reacts
+    JUMP_AT = 40
+    SLIDE_AT = 20
+    TRAIN_AT = 300
+
+    def __init__(self, seed):
+        self.rng = random.Random(seed)
+
+    def __call__(self, sim):
+        p = sim.player
+        if p.is_flying or p.on_train or p.current_lane != p.target_lane:
+            return
+        left, right = sim.player_span()
+        x0 = sim.distance + right
+        ahead = self.first_ahead(sim, p.current_lane, x0, self.TRAIN_AT)
+        if ahead is None:
+            return
+        gap = ahead.x - x0
+        if TRAIN1 <= ahead.kind <= TRAIN3:
+            lanes = [lane for lane in (p.current_lane - 1, p.current_lane + 1)
+                     if 0 <= lane < simulation.LANE_COUNT and
+                     self.first_ahead(sim, lane, sim.distance + left, self.TRAIN_AT) is None]
+            if lanes:
+                lane = self.rng.choice(lanes)
+                sim.input("up" if lane < p.current_lane else "down")
+        elif ahead.kind == SLIDE:
+            if gap <= self.SLIDE_AT:
+                sim.input("slide")
+        elif gap <= self.JUMP_AT:
+            sim.input("jump")
+
+    def first_ahead(self, sim, lane, x0, reach):
+        found = None
+        for obj in sim.obstacle_index.overlapping(lane, x0, x0 + reach):
+            if found is None or obj.x < found.x:
+                found = obj
+        return found
+
+
+POLICIES = {
+    "idle": IdlePolicy,
+    "random": RandomPolicy,
+    "dodge": DodgePolicy,
+}
+
+
+# -- workers -------------------------------------------------------------------
+
+def split_overrides(overrides):
+    """(module constants, Simulation attributes) of one parameter set."""
+    constants = {}
+    attrs = {}
+    for name, value in overrides.items():
+        if name.isupper():
+            constants[name] = value
+        else:
+            attrs[name] = value
+    return constants, attrs
+
+
+def configure(constants):
+    for name, value in DEFAULTS.items():
+        setattr(simulation, name, value)
+    for name, value in constants.items():
+        setattr(simulation, name, value)
+    if "SPAWN_SEARCH_DISTANCE" not in constants:
+        # has to cover the widest gap, whatever the buffers were set to
+        simulation.SPAWN_SEARCH_DISTANCE = simulation.TRAIN_BUFFER + simulation.FAST_TRAIN_BUFFER
+
+
+def play(seed, attrs, policy, max_ticks):
+    sim = Simulation(seed=seed)
+    if attrs:
+        for name, value in attrs.items():
+            setattr(sim, name, value)
+        # caps and cooldowns are read when the spawn plan starts
+        sim.reset()
+    causes = []
+    sim.events.subscribe(Died, lambda event: causes.append(event.obstacle.type))
+    ticks = sim.run(max_ticks, POLICIES[policy](seed))
+    stats = sim.planner.stats()
+    attempts = stats["attempts"]
+    rejections = stats["rejections"]
+    return (seed, sim.score, ticks, causes[0] if causes else None, attempts, rejections,
+            float(rejections) / attempts if attempts else 0.0)
+
+
+def run_chunk(task):
+    """Play one chunk of seeds under one parameter set; runs in a worker."""
+    index, overrides, seeds, policy, max_ticks = task
+    constants, attrs = split_overrides(overrides)
+    configure(constants)
+    return index, [play(seed, attrs, policy, max_ticks) for seed in seeds]
+
+
+# -- driver --------------------------------------------------------------------
+
+def parse_value(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def parse_assignment(text):
+    name, sep, value = text.partition("=")
+    if not sep or not name:
+        raise ValueError("expected NAME=VALUE, got %r" % text)
+    return name, value
+
+
+def parameter_sets(settings, sweeps):
+    """Every override dict: the fixed settings times each sweep combination."""
+    base = {}
+    for text in settings:
+        name, value = parse_assignment(text)
+        base[name] = parse_value(value)
+    axes = []
+    for text in sweeps:
+        name, values = parse_assignment(text)
+        axes.append([(name, parse_value(value)) for value in values.split(",")])
+    sets = []
+    for combo in itertools.product(*axes):
+        overrides = dict(base)
+        overrides.update(combo)
+        sets.append(overrides)
+    return sets
+
+
+def check_names(overrides):
+    for name in overrides:
+        if name.isupper():
+            if name not in TUNABLE_CONSTANTS:
+                raise ValueError("%s is not a tunable constant (one of %s)" %
+                                 (name, ", ".join(TUNABLE_CONSTANTS)))
+        elif name not in TUNABLE_ATTRIBUTES:
+            raise ValueError("%s is not a tunable Simulation attribute (one of %s)" %
+                             (name, ", ".join(TUNABLE_ATTRIBUTES)))
+
+
+def percentiles(values, points=(10, 50, 90)):
+    if not values:
+        return dict(("p%d" % p, None) for p in points)
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return dict(("p%d" % p, ordered[int(round(last * p / 100.0))]) for p in points)
+
+
+def summarize(columns):
+    summary = {}
+    for name in ("score", "ticks", "rejection_rate"):
+        values = columns[name]
+        stats = percentiles(values)
+        stats["mean"] = sum(values) / float(len(values)) if values else None
+        stats["max"] = max(values) if values else None
+        summary[name] = stats
+    causes = {}
+    for cause in columns["cause"]:
+        key = cause if cause is not None else "survived"
+        causes[key] = causes.get(key, 0) + 1
+    summary["causes"] = causes
+    return summary
+
+
+def run_batch(sets, seeds, policy, max_ticks, jobs, chunk):
+    tasks = []
+    for index, overrides in enumerate(sets):
+        for start in range(0, len(seeds), chunk):
+            tasks.append((index, overrides, seeds[start:start + chunk], policy, max_ticks))
+
+    rows = [[] for _ in sets]
+    if jobs == 1:
+        results = map(run_chunk, tasks)
+        for index, chunk_rows in results:
+            rows[index].extend(chunk_rows)
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(jobs)
+        try:
+            for index, chunk_rows in pool.imap_unordered(run_chunk, tasks):
+                rows[index].extend(chunk_rows)
+        finally:
+            pool.close()
+            pool.join()
+
+    configs = []
+    for overrides, config_rows in zip(sets, rows):
+        config_rows.sort()
+        columns = dict((name, [row[i] for row in config_rows]) for i, name in enumerate(COLUMNS))
+        configs.append({"overrides": overrides, "columns": columns, "summary": summarize(columns)})
+    return configs
+
+
+def print_configs(configs):
+    for config in configs:
+        summary = config["summary"]
+        label = ", ".join("%s=%s" % item for item in sorted(config["overrides"].items()))
+        print(label or "(defaults)")
+        for name in ("score", "ticks", "rejection_rate"):
+            stats = summary[name]
+            print("    %-15s mean %9.2f   p10 %9.2f   p50 %9.2f   p90 %9.2f" % (
+                name, stats["mean"], stats["p10"], stats["p50"], stats["p90"]))
+        causes = sorted(summary["causes"].items(), key=lambda item: -item[1])
+        print("    causes          " + "  ".join("%s %d" % item for item in causes))
+
+
+def main(argv):
+    import argparse
+    import multiprocessing
+
+    parser = argparse.ArgumentParser(description="Play seeded headless games in bulk.")
+    parser.add_argument("--games", type=int, default=1000, help="games per parameter set")
+    parser.add_argument("--seed", type=int, default=0, help="first seed, games use seed..seed+games-1")
+    parser.add_argument("--ticks", type=int, default=60 * 60 * 5,
+                        help="tick limit per game (default 5 minutes)")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="dodge")
+    parser.add_argument("--set", dest="settings", action="append", default=[], metavar="NAME=VALUE",
+                        help="override a constant or Simulation attribute")
+    parser.add_argument("--sweep", action="append", default=[], metavar="NAME=V1,V2,...",
+                        help="play every listed value (several sweeps multiply)")
+    parser.add_argument("--jobs", type=int, default=multiprocessing.cpu_count(),
+                        help="worker processes, 1 runs in this process")
+    parser.add_argument("--chunk", type=int, default=25, help="seeds per worker task")
+    parser.add_argument("--out", metavar="FILE", help="write the columnar results as JSON")
+    args = parser.parse_args(argv)
+
+    try:
+        sets = parameter_sets(args.settings, args.sweep)
+        for overrides in sets:
+            check_names(overrides)
+    except ValueError as e:
+        parser.error(str(e))
+
+    seeds = list(range(args.seed, args.seed + args.games))
+    started = time.time()
+    configs = run_batch(sets, seeds, args.policy, args.ticks, max(1, args.jobs), max(1, args.chunk))
+    elapsed = time.time() - started
+
+    print_configs(configs)
+    games = len(sets) * len(seeds)
+    print("%d games in %.2fs on %d jobs (%.1f games/s)" % (games, elapsed, args.jobs, games / elapsed))
+
+    if args.out:
+        f = open(args.out, "w")
+        try:
+            json.dump({"policy": args.policy, "max_ticks": args.ticks, "configs": configs}, f)
+        finally:
+            f.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,455 @@
+"""Benchmarks for the game's hot paths, runnable without Processing.
+
+Processing and Minim globals are replaced with no-op stand-ins before the
+sketch is imported, so Game.update, Game.display and everything under them
+run exactly as in the sketch, just without pixels or sound. Each scenario
+runs a clean pass for ticks/s and allocations, then a pass with timing
+wrappers around the interesting methods for per-phase cost; each pass is
+repeated from the same seed and the fastest run is kept to damp noise.
+
+    python bench.py                         # run, print a table
+    python bench.py --save bench.json       # also write a baseline
+    python bench.py --compare bench.json    # flag regressions against it
+
+Allocations are measured as net allocated blocks per tick
+(sys.getallocatedblocks, CPython only): steady-state play should hover
+around zero, anything that grows per tick is a leak or an unbounded cache.
+images/tick counts the images the sketch creates per frame (loaded, made
+with createImage/createGraphics, or cut with get()/copy()); drawing only
+blits out of images made at load time, so it should read 0.
+B/entity is the mean record size of the live entities at the end of a run
+(sys.getsizeof of each instance and its __dict__).
+"""
+
+import gc
+import json
+import random
+import sys
+import time
+
+try:
+    import builtins
+except ImportError:
+    import __builtin__ as builtins
+
+perf_counter = getattr(time, "perf_counter", time.time)
+
+
+# -- Processing / Minim stand-ins -------------------------------------------
+
+class StubImage(object):
+    # every image made so far, however it was made
+    created = 0
+
+    def __init__(self, w=100, h=100):
+        StubImage.created += 1
+        self.width = w
+        self.height = h
+
+    def get(self, x=0, y=0, w=None, h=None):
+        return StubImage(w or self.width, h or self.height)
+
+    def resize(self, w, h):
+        self.width = w
+        self.height = h
+
+    def copy(self, *args):
+        return StubImage(self.width, self.height)
+
+
+class StubGraphics(StubImage):
+    """createGraphics() result; every drawing call is a no-op."""
+
+    def __getattr__(self, name):
+        return _noop
+
+
+class StubSound(object):
+    def __getattr__(self, name):
+        return _noop
+
+
+class StubMinim(object):
+    def __init__(self, *args):
+        pass
+
+    def loadFile(self, *args):
+        return StubSound()
+
+
+def _noop(*args, **kwargs):
+    return None
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+clock = FakeClock()
+
+DRAW_CALLS = [
+    "image", "imageMode", "pushMatrix", "popMatrix", "translate", "scale",
+    "fill", "noFill", "stroke", "noStroke", "strokeWeight", "rect", "ellipse",
+    "line", "text", "textSize", "textAlign", "textFont", "tint", "noTint",
+    "background", "size", "frameRate", "noLoop", "loop", "thread",
+]
+
+CONSTANTS = {
+    "CENTER": 3, "CORNER": 0, "CORNERS": 1, "LEFT": 37, "RIGHT": 39,
+    "TOP": 101, "BOTTOM": 102, "CODED": 0xffff, "UP": 38, "DOWN": 40,
+    "CONTROL": 17, "P2D": "P2D", "JAVA2D": "JAVA2D",
+}
+
+
+def install_stubs():
+    names = dict(CONSTANTS)
+    names.update({
+        "add_library": _noop,
+        "Minim": StubMinim,
+        "this": None,
+        "loadImage": lambda *args: StubImage(),
+        "requestImage": lambda *args: StubImage(),
+        "createImage": lambda w, h, *args: StubImage(w, h),
+        "createGraphics": lambda w, h, *args: StubGraphics(w, h),
+        "textWidth": lambda s: 8 * len(s),
+        "millis": clock,
+        "width": 1280,
+        "height": 720,
+        "frameCount": 0,
+    })
+    for name in DRAW_CALLS:
+        names[name] = _noop
+    for name, value in names.items():
+        setattr(builtins, name, value)
+
+
+def load_sketch():
+    install_stubs()
+    import subway_chaser
+    return subway_chaser
+
+
+# -- scenarios ----------------------------------------------------------------
+
+def make_game(sketch, seed):
+    class BenchGame(sketch.Game):
+        """Game that never stays dead and never writes replays."""
+
+        deaths = 0
+
+        def update(self):
+            sketch.Game.update(self)
+            if self.game_over:
+                self.deaths += 1
+                self.game_over = False
+
+        def save_replay(self, path):
+            pass
+
+    game = BenchGame()
+    game.seed = seed
+    game.reset()
+    return game
+
+
+def idle(game, rng):
+    return None
+
+
+def mash(game, rng):
+    r = rng.random()
+    if r < 0.02:
+        game.input(rng.choice(("up", "down", "jump", "slide")))
+
+
+def setup_dense(game, factor):
+    game.max_obstacles *= factor
+    game.max_coin_rows *= factor
+    game.reset(game.run_seed)
+
+
+def keep_flying(game, rng):
+    p = game.player
+    if not p.is_flying:
+        p.fly()
+    # keep pushing the landing back
+    second = sys.modules["simulation"].TICKS_PER_SECOND
+    if game.timers.remaining(p.powerup_timer) < second:
+        game.timers.cancel(p.powerup_timer)
+        p.powerup_timer = game.timers.after(10 * second, p.end_powerup)
+    if rng.random() < 0.02:
+        game.input(rng.choice(("up", "down")))
+
+
+def make_filler(factor):
+    """Keep factor x the normal entity counts on the track, ignoring spacing rules.
+
+    The spawn plan keeps running at its normal density underneath; scaling
+    its caps instead would only multiply rejected attempts.
+    """
+    def fill(game, rng):
+        sim = sys.modules["simulation"]
+        span = 2000 * factor
+        while len(game.OBSTACLES) < game.stress_obstacles:
+            x = game.distance + sim.SCREEN_WIDTH + rng.randint(0, span)
+            lane = rng.randint(0, sim.LANE_COUNT - 1)
+            num = rng.randint(0, 2)
+            if rng.random() < sim.TRAIN_CHANCE:
+                obj = game.train_pool.acquire(x, num, lane, rng.randint(1, sim.MAX_TRAIN_EXTRA_SPEED))
+            else:
+                obj = game.obstacle_pool.acquire(x, num, lane)
+            game.add_obstacle(obj)
+        while len(game.COIN_ROWS) < game.stress_coin_rows:
+            x = game.distance + sim.SCREEN_WIDTH + rng.randint(0, span)
+            row = game.coinrow_pool.acquire(x, rng.randint(0, sim.LANE_COUNT - 1), rng.randint(4, 10))
+            game.add_coinrow(row)
+        mash(game, rng)
+    return fill
+
+
+def setup_stress(game, factor):
+    game.stress_obstacles = game.max_obstacles * factor
+    game.stress_coin_rows = game.max_coin_rows * factor
+
+
+# name: (ticks, setup(game, factor) or None, per-tick driver, factor)
+SCENARIOS = [
+    ("idle", 3000, None, idle, 1),
+    ("dense", 3000, setup_dense, mash, 3),
+    ("flying", 3000, None, keep_flying, 1),
+    ("stress_10x", 1000, setup_stress, make_filler(10), 10),
+    ("stress_100x", 300, setup_stress, make_filler(100), 100),
+    ("stress_1000x", 50, setup_stress, make_filler(1000), 1000),
+]
+
+# method name -> label, wrapped on the instance during the phase pass
+GAME_PHASES = [
+    ("update", "update"),
+    ("display", "display"),
+    ("check_player", "check_player"),
+    ("is_space_free", "is_space_free"),
+    ("activate_spawns", "activate_spawns"),
+    ("spawn_air_coinrow", "spawn_air_coinrow"),
+]
+BACKGROUND_PHASES = [
+    ("update", "background.update"),
+    ("draw", "background.draw"),
+]
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.totals = {}
+        self.calls = {}
+
+    def wrap(self, obj, name, label):
+        method = getattr(obj, name)
+        totals = self.totals
+        calls = self.calls
+        totals[label] = 0.0
+        calls[label] = 0
+
+        def timed(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                totals[label] += perf_counter() - start
+                calls[label] += 1
+        setattr(obj, name, timed)
+
+
+def allocated_blocks():
+    # CPython only; elsewhere allocations simply read as 0
+    return getattr(sys, "getallocatedblocks", lambda: 0)()
+
+
+def record_bytes(objs):
+    """Mean size of objs' records: the instance plus its __dict__, if any.
+
+    Shallow on purpose, attribute values are small ints, floats and shared
+    strings either way, so this is what the record layout itself costs.
+    CPython only; elsewhere it reads as 0.
+    """
+    getsizeof = getattr(sys, "getsizeof", None)
+    if getsizeof is None or not objs:
+        return 0.0
+    total = 0
+    for obj in objs:
+        total += getsizeof(obj)
+        attrs = getattr(obj, "__dict__", None)
+        if attrs is not None:
+            total += getsizeof(attrs)
+    return float(total) / len(objs)
+
+
+def run_frames(game, ticks, drive, rng):
+    for _ in range(ticks):
+        clock.now += 16
+        drive(game, rng)
+        game.update()
+        game.display(1.0)
+        game.audio.flush(clock.now)
+
+
+def prepared_game(sketch, setup, drive, ticks, factor, seed):
+    game = make_game(sketch, seed)
+    if setup is not None:
+        setup(game, factor)
+    rng = random.Random(seed)
+    # warm up so pools and the spawn plan reach steady state
+    run_frames(game, min(ticks, 300), drive, rng)
+    return game, rng
+
+
+def run_scenario(sketch, name, ticks, setup, drive, factor, seed, repeat=3):
+    """Best of `repeat` identical runs, each from a fresh seeded game."""
+    best = None
+    for _ in range(repeat):
+        game, rng = prepared_game(sketch, setup, drive, ticks, factor, seed)
+        gc.collect()
+        start_blocks = allocated_blocks()
+        start_images = StubImage.created
+        start = perf_counter()
+        run_frames(game, ticks, drive, rng)
+        elapsed = perf_counter() - start
+        end_blocks = allocated_blocks()
+        images = StubImage.created - start_images
+        if best is None or elapsed < best[0]:
+            best = (elapsed, end_blocks - start_blocks, images, game)
+    elapsed, blocks, images, game = best
+
+    phases = {}
+    for _ in range(repeat):
+        timed_game, rng = prepared_game(sketch, setup, drive, ticks, factor, seed)
+        timer = PhaseTimer()
+        for method, label in GAME_PHASES:
+            timer.wrap(timed_game, method, label)
+        for method, label in BACKGROUND_PHASES:
+            timer.wrap(timed_game.background, method, label)
+        run_frames(timed_game, ticks, drive, rng)
+        for label, total in timer.totals.items():
+            us = total * 1e6 / ticks
+            if label not in phases or us < phases[label]["us_per_tick"]:
+                phases[label] = {
+                    "us_per_tick": us,
+                    "calls_per_tick": float(timer.calls[label]) / ticks,
+                }
+
+    return {
+        "ticks": ticks,
+        "ticks_per_s": ticks / elapsed if elapsed else 0.0,
+        "allocs_per_tick": float(blocks) / ticks,
+        "images_per_tick": float(images) / ticks,
+        "entities": len(game.OBSTACLES) + len(game.COIN_ROWS) + len(game.POWER_UPS),
+        "bytes_per_entity": record_bytes(game.OBSTACLES + game.COIN_ROWS + game.POWER_UPS),
+        "player_bytes": record_bytes([game.player]),
+        "deaths": game.deaths,
+        "phases": phases,
+    }
+
+
+def run_all(names=None, seed=1, repeat=3):
+    sketch = load_sketch()
+    results = {}
+    for name, ticks, setup, drive, factor in SCENARIOS:
+        if names and name not in names:
+            continue
+        results[name] = run_scenario(sketch, name, ticks, setup, drive, factor, seed, repeat)
+    return results
+
+
+def print_results(results):
+    for name in sorted(results, key=lambda n: [s[0] for s in SCENARIOS].index(n)):
+        r = results[name]
+        print("%-13s %9.0f ticks/s  %7.2f allocs/tick  %5.2f images/tick  %5d entities  "
+              "%5.0f B/entity  %d deaths" % (
+                  name, r["ticks_per_s"], r["allocs_per_tick"], r.get("images_per_tick", 0.0),
+                  r["entities"], r.get("bytes_per_entity", 0.0), r["deaths"]))
+        for label in sorted(r["phases"]):
+            phase = r["phases"][label]
+            print("    %-20s %10.1f us/tick  %6.2f calls/tick" % (
+                label, phase["us_per_tick"], phase["calls_per_tick"]))
+
+
+def compare(baseline, results, tolerance):
+    """Regressions of results against baseline, as readable strings."""
+    regressions = []
+    for name, r in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None:
+            continue
+        if r["ticks_per_s"] < base["ticks_per_s"] * (1 - tolerance):
+            regressions.append("%s: %.0f ticks/s, baseline %.0f" % (
+                name, r["ticks_per_s"], base["ticks_per_s"]))
+        # half a block per tick of slack, net counts jitter around zero
+        if r["allocs_per_tick"] > base["allocs_per_tick"] * (1 + tolerance) + 0.5:
+            regressions.append("%s: %.2f allocs/tick, baseline %.2f" % (
+                name, r["allocs_per_tick"], base["allocs_per_tick"]))
+        # no slack: a frame either creates images or it does not
+        if r["images_per_tick"] > base.get("images_per_tick", 0.0):
+            regressions.append("%s: %.2f images/tick, baseline %.2f" % (
+                name, r["images_per_tick"], base.get("images_per_tick", 0.0)))
+        if "bytes_per_entity" in base and (
+                r["bytes_per_entity"] > base["bytes_per_entity"] * (1 + tolerance)):
+            regressions.append("%s: %.0f B/entity, baseline %.0f" % (
+                name, r["bytes_per_entity"], base["bytes_per_entity"]))
+        for label, phase in sorted(r["phases"].items()):
+            base_phase = base["phases"].get(label)
+            if base_phase is None:
+                continue
+            # ignore phases too cheap to time reliably
+            if phase["us_per_tick"] < 5.0:
+                continue
+            if phase["us_per_tick"] > base_phase["us_per_tick"] * (1 + tolerance):
+                regressions.append("%s/%s: %.1f us/tick, baseline %.1f" % (
+                    name, label, phase["us_per_tick"], base_phase["us_per_tick"]))
+    return regressions
+
+
+def main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark Subway Chaser's hot paths.")
+    parser.add_argument("scenarios", nargs="*", help="scenario names (default: all)")
+    parser.add_argument("--save", metavar="FILE", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed slowdown as a fraction (default 0.25)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per scenario, the fastest one counts (default 3)")
+    args = parser.parse_args(argv)
+
+    results = run_all(args.scenarios, args.seed, args.repeat)
+    print_results(results)
+
+    if args.save:
+        f = open(args.save, "w")
+        try:
+            json.dump(results, f, indent=2, sort_keys=True)
+        finally:
+            f.close()
+
+    if args.compare:
+        f = open(args.compare)
+        try:
+            baseline = json.load(f)
+        finally:
+            f.close()
+        regressions = compare(baseline, results, args.tolerance)
+        if regressions:
+            print("\nREGRESSIONS (tolerance %d%%):" % (args.tolerance * 100))
+            for line in regressions:
+                print("  " + line)
+            return 1
+        print("\nno regressions against %s" % args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,344 @@
+"""Pack the entity sprite sheets into one texture atlas, offline.
+
+    python build_atlas.py                 # writes images/atlas.png and images/atlas.json
+
+Each sheet in SHEETS is cut into sprites at its fully transparent columns
+(plus any `cuts` for sprites that touch), each sprite is trimmed to its
+opaque pixels, and everything is shelf-packed into images/atlas.png. The
+game loads that one image and draws every entity out of it, looking the
+sprite up by name in images/atlas.json:
+
+    {"image": "atlas.png", "width": W, "height": H,
+     "frames": {name: [x, y, w, h, ox, oy, box_w, box_h], ...}}
+
+x, y, w, h is the trimmed sprite in the atlas; ox, oy is where it sits in
+its untrimmed box of box_w x box_h, which is what the game scales into the
+entity's hitbox. Re-run this whenever a sheet in images/ changes. Missing
+sheets are skipped with a warning, and the game draws its placeholder for
+any sprite the atlas lacks.
+
+PNGs are read and written with zlib and struct only, so this runs on a bare
+Python: 8-bit, non-interlaced greyscale, RGB, palette and RGBA images.
+"""
+
+import json
+import os
+import struct
+import sys
+import zlib
+
+from simulation import CoinRow, OBSTACLE_TYPES, TRAIN_TYPES
+
+IMAGES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+ATLAS_PNG = "atlas.png"
+ATLAS_JSON = "atlas.json"
+# transparent px around every sprite, so filtering never bleeds a neighbour in
+PADDING = 1
+ATLAS_WIDTH = 1024
+
+# file, sprite names in sheet order (left to right), options:
+#   flip   mirror each sprite horizontally
+#   cuts   extra columns to cut at, where two sprites touch
+#   box    centre each sprite in a box of this size instead of its own band
+#   size   scale each sprite to this size, so drawing it is a plain blit
+SHEETS = [
+    # the train sheet faces the other way
+    ("trains.png", TRAIN_TYPES, {"flip": True}),
+    ("obstacles.png", OBSTACLE_TYPES, {}),
+    ("powerups.png", ("flying", "doublejump"), {"cuts": (57,)}),
+    ("coins.png", ("coin0", "coin1"), {"box": (CoinRow.coin_w, CoinRow.h)}),
+]
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# colour type -> channels
+CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+
+class Image:
+    """RGBA pixels, one bytearray per row."""
+
+    def __init__(self, width, height, rows=None):
+        self.width = width
+        self.height = height
+        if rows is None:
+            rows = [bytearray(width * 4) for _ in range(height)]
+        self.rows = rows
+
+    def crop(self, x, y, w, h):
+        return Image(w, h, [bytearray(row[x * 4:(x + w) * 4]) for row in self.rows[y:y + h]])
+
+    def flipped(self):
+        rows = []
+        for row in self.rows:
+            out = bytearray(len(row))
+            for x in range(self.width):
+                src = (self.width - 1 - x) * 4
+                out[x * 4:x * 4 + 4] = row[src:src + 4]
+            rows.append(out)
+        return Image(self.width, self.height, rows)
+
+    def scaled(self, w, h):
+        # nearest neighbour, these are small pixel-art sprites
+        rows = []
+        for y in range(h):
+            src_row = self.rows[y * self.height // h]
+            out = bytearray(w * 4)
+            for x in range(w):
+                src = (x * self.width // w) * 4
+                out[x * 4:x * 4 + 4] = src_row[src:src + 4]
+            rows.append(out)
+        return Image(w, h, rows)
+
+    def blit(self, other, x, y):
+        for dy, row in enumerate(other.rows):
+            self.rows[y + dy][x * 4:(x + other.width) * 4] = row
+
+    def opaque_columns(self):
+        return [any(row[x * 4 + 3] for row in self.rows) for x in range(self.width)]
+
+    def opaque_bounds(self):
+        """(x, y, w, h) of the opaque pixels, None when fully transparent."""
+        columns = [x for x, opaque in enumerate(self.opaque_columns()) if opaque]
+        lines = [y for y, row in enumerate(self.rows) if any(row[3::4])]
+        if not columns:
+            return None
+        return columns[0], lines[0], columns[-1] + 1 - columns[0], lines[-1] + 1 - lines[0]
+
+
+# -- PNG ---------------------------------------------------------------------
+
+def read_chunks(data):
+    if data[:8] != PNG_SIGNATURE:
+        raise ValueError("not a PNG file")
+    pos = 8
+    while pos < len(data):
+        length, kind = struct.unpack(">I4s", data[pos:pos + 8])
+        yield kind, data[pos + 8:pos + 8 + length]
+        pos += 12 + length
+
+
+def paeth(a, b, c):
+    p = a + b - c
+    pa = abs(p - a)
+    pb = abs(p - b)
+    pc = abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    if pb <= pc:
+        return b
+    return c
+
+
+def unfilter(raw, height, stride, bpp):
+    rows = []
+    prev = bytearray(stride)
+    pos = 0
+    for _ in range(height):
+        kind = raw[pos]
+        line = bytearray(raw[pos + 1:pos + 1 + stride])
+        pos += 1 + stride
+        if kind == 1:
+            for i in range(bpp, stride):
+                line[i] = (line[i] + line[i - bpp]) & 255
+        elif kind == 2:
+            for i in range(stride):
+                line[i] = (line[i] + prev[i]) & 255
+        elif kind == 3:
+            for i in range(stride):
+                left = line[i - bpp] if i >= bpp else 0
+                line[i] = (line[i] + ((left + prev[i]) >> 1)) & 255
+        elif kind == 4:
+            for i in range(stride):
+                if i >= bpp:
+                    line[i] = (line[i] + paeth(line[i - bpp], prev[i], prev[i - bpp])) & 255
+                else:
+                    line[i] = (line[i] + prev[i]) & 255
+        elif kind != 0:
+            raise ValueError("bad PNG filter type %d" % kind)
+        rows.append(line)
+        prev = line
+    return rows
+
+
+def to_rgba(line, colour_type, width, palette, transparency):
+    if colour_type == 6:
+        return line
+    out = bytearray(width * 4)
+    for x in range(width):
+        if colour_type == 2:
+            r, g, b = line[x * 3:x * 3 + 3]
+            a = 0 if transparency == (r, g, b) else 255
+        elif colour_type == 3:
+            index = line[x]
+            r, g, b = palette[index * 3:index * 3 + 3]
+            a = transparency[index] if index < len(transparency) else 255
+        elif colour_type == 4:
+            r = g = b = line[x * 2]
+            a = line[x * 2 + 1]
+        else:
+            r = g = b = line[x]
+            a = 0 if transparency == (r,) else 255
+        out[x * 4:x * 4 + 4] = bytearray((r, g, b, a))
+    return out
+
+
+def read_png(path):
+    f = open(path, "rb")
+    try:
+        data = f.read()
+    finally:
+        f.close()
+    header = None
+    palette = b""
+    transparency = None
+    idat = []
+    for kind, body in read_chunks(data):
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", body)
+        elif kind == b"PLTE":
+            palette = bytearray(body)
+        elif kind == b"tRNS":
+            transparency = body
+        elif kind == b"IDAT":
+            idat.append(body)
+    width, height, depth, colour_type, _, _, interlace = header
+    if depth != 8 or interlace or colour_type not in CHANNELS:
+        raise ValueError("%s: only 8-bit non-interlaced PNGs are supported" % path)
+    if transparency is not None:
+        if colour_type == 3:
+            transparency = bytearray(transparency)
+        else:
+            # 16-bit sample values, only the low byte matters at depth 8
+            transparency = tuple(bytearray(transparency)[1::2])
+    elif colour_type == 3:
+        transparency = bytearray()
+    bpp = CHANNELS[colour_type]
+    rows = unfilter(bytearray(zlib.decompress(b"".join(idat))), height, width * bpp, bpp)
+    return Image(width, height, [to_rgba(row, colour_type, width, palette, transparency)
+                                 for row in rows])
+
+
+def chunk(kind, body):
+    return (struct.pack(">I", len(body)) + kind + body +
+            struct.pack(">I", zlib.crc32(kind + body) & 0xffffffff))
+
+
+def write_png(path, image):
+    raw = bytearray()
+    prev = bytearray(image.width * 4)
+    for row in image.rows:
+        # "up" filter: sprites repeat vertically, and most rows are empty
+        raw.append(2)
+        raw.extend(bytearray((row[i] - prev[i]) & 255 for i in range(len(row))))
+        prev = row
+    data = (PNG_SIGNATURE +
+            chunk(b"IHDR", struct.pack(">IIBBBBB", image.width, image.height, 8, 6, 0, 0, 0)) +
+            chunk(b"IDAT", zlib.compress(bytes(raw), 9)) +
+            chunk(b"IEND", b""))
+    f = open(path, "wb")
+    try:
+        f.write(data)
+    finally:
+        f.close()
+
+
+# -- slicing and packing -----------------------------------------------------
+
+def column_runs(image, cuts=()):
+    """(x, w) of every run of columns with an opaque pixel, split at `cuts`."""
+    runs = []
+    start = None
+    for x, opaque in enumerate(image.opaque_columns() + [False]):
+        if start is not None and (not opaque or x in cuts):
+            runs.append((start, x - start))
+            start = None
+        if opaque and start is None:
+            start = x
+    return runs
+
+
+def slice_sheet(path, names, flip=False, cuts=(), box=None, size=None):
+    """[(name, trimmed image, ox, oy, box_w, box_h)] of one sheet."""
+    sheet = read_png(path)
+    runs = column_runs(sheet, cuts)
+    if len(runs) != len(names):
+        raise ValueError("%s: found %d sprites, expected %d (%s)" % (
+            os.path.basename(path), len(runs), len(names), ", ".join(names)))
+    sprites = []
+    for name, (x, w) in zip(names, runs):
+        band = sheet.crop(x, 0, w, sheet.height)
+        if flip:
+            band = band.flipped()
+        if size is not None:
+            band = band.scaled(size[0], size[1])
+        bx, by, bw, bh = band.opaque_bounds()
+        trimmed = band.crop(bx, by, bw, bh)
+        if box is not None:
+            # centred in the box, like the frames of a fixed-size strip
+            box_w, box_h = box
+            bx = (box_w - bw) // 2
+            by = (box_h - bh) // 2
+        else:
+            box_w, box_h = band.width, band.height
+        sprites.append((name, trimmed, bx, by, box_w, box_h))
+    return sprites
+
+
+def pack(sprites, width=ATLAS_WIDTH, padding=PADDING):
+    """Shelf-pack sprites, tallest first; returns (atlas image, frames)."""
+    width = max([width] + [s[1].width + 2 * padding for s in sprites])
+    order = sorted(sprites, key=lambda s: (-s[1].height, s[0]))
+    places = []
+    x = y = shelf = 0
+    for name, img, ox, oy, box_w, box_h in order:
+        w = img.width + 2 * padding
+        h = img.height + 2 * padding
+        if x + w > width:
+            y += shelf
+            x = shelf = 0
+        places.append((name, img, x + padding, y + padding, ox, oy, box_w, box_h))
+        x += w
+        shelf = max(shelf, h)
+    atlas = Image(width, y + shelf)
+    frames = {}
+    for name, img, x, y, ox, oy, box_w, box_h in places:
+        atlas.blit(img, x, y)
+        frames[name] = [x, y, img.width, img.height, ox, oy, box_w, box_h]
+    return atlas, frames
+
+
+def build(folder=IMAGES, width=ATLAS_WIDTH):
+    sprites = []
+    for filename, names, options in SHEETS:
+        path = os.path.join(folder, filename)
+        if not os.path.exists(path):
+            print("warning: %s not found, skipping %s" % (filename, ", ".join(names)))
+            continue
+        sprites.extend(slice_sheet(path, names, **options))
+    atlas, frames = pack(sprites, width)
+    write_png(os.path.join(folder, ATLAS_PNG), atlas)
+    f = open(os.path.join(folder, ATLAS_JSON), "w")
+    try:
+        json.dump({"image": ATLAS_PNG, "width": atlas.width, "height": atlas.height,
+                   "frames": frames}, f, indent=1, sort_keys=True)
+    finally:
+        f.close()
+    return atlas, frames
+
+
+def main(argv):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pack the sprite sheets into images/atlas.png.")
+    parser.add_argument("--images", default=IMAGES, help="folder with the sheets, and for the output")
+    parser.add_argument("--width", type=int, default=ATLAS_WIDTH, help="atlas width in px")
+    args = parser.parse_args(argv)
+
+    atlas, frames = build(args.images, args.width)
+    print("%d sprites into %dx%d %s" % (len(frames), atlas.width, atlas.height,
+                                        os.path.join(args.images, ATLAS_PNG)))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
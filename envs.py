@@ -0,0 +1,726 @@
+"""Gym-style environments for training bots on the game's rules.
+
+SubwayEnv wraps one Simulation: reset(seed) starts a run, step(action)
+advances it one tick and returns (observation, reward, done, info).
+Actions are indices into ACTIONS (0 does nothing).
+
+VectorSubwayEnv steps N independent games in lockstep. Player and entity
+state lives in NumPy arrays (one row per game, one column per entity
+slot) and every rule of Player.update and Simulation.update/check_player
+is applied to all games at once. Python only runs per game for the rare
+events that need the game's own random generator or spawn plan: planned
+spawns coming into range, power-up pickups, air coins while flying and
+resets. Same seed and same actions give the same run as SubwayEnv.
+
+Observations are OBS_SIZE floats, named in OBS_NAMES: per lane the
+time-to-contact of the nearest fence or bush, slide barrier, train, coin
+row and power-up (in ticks over HORIZON, 1.0 when nothing is that close),
+per lane whether an obstacle is level with the player right now, then the
+player's own state.
+
+NumPy is only needed for VectorSubwayEnv.
+"""
+
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from simulation import (Simulation, SpawnPlanner, CoinRow, LANE_COUNT, PLAYER_X,
+                        LANE_POSITIONS_Y, LANE_POSITIONS_Y_JACK, AIR_LANE_POSITIONS_Y,
+                        OBSTACLE_TYPES, ACTIVATION_X, MS_PER_TICK, KIND_SIZES,
+                        AnimationConfig)
+from prng import PortableRandom
+import simulation
+
+ACTIONS = (None, "up", "down", "jump", "slide")
+NOOP, UP, DOWN, JUMP, SLIDE = range(len(ACTIONS))
+
+# ticks ahead the observation can see
+HORIZON = 120.0
+# reward per tick survived, on top of one per coin
+SURVIVAL_REWARD = 0.01
+
+# observation layout: CATEGORIES x lanes of time-to-contact, lanes of
+# "blocked now", then the player
+CATEGORIES = ("jump", "slide", "train", "coin", "powerup")
+JUMPABLE, SLIDE_UNDER, TRAIN, COIN, POWERUP = range(len(CATEGORIES))
+BLOCKED = len(CATEGORIES) * LANE_COUNT
+PLAYER = BLOCKED + LANE_COUNT
+PLAYER_FEATURES = ("lane", "target_lane", "height", "velocity_y", "on_train",
+                   "jumping", "sliding", "flying", "air_lane", "powerup")
+OBS_NAMES = tuple(["%s_ttc_%d" % (name, lane) for name in CATEGORIES for lane in range(LANE_COUNT)] +
+                  ["blocked_%d" % lane for lane in range(LANE_COUNT)] +
+                  list(PLAYER_FEATURES))
+OBS_SIZE = len(OBS_NAMES)
+
+LAST_LANE = float(LANE_COUNT - 1)
+
+
+def category_of(kind):
+    if kind >= simulation.TRAIN1:
+        return TRAIN
+    if kind == simulation.SLIDE:
+        return SLIDE_UNDER
+    return JUMPABLE
+
+
+def observe(sim):
+    """Observation of one Simulation, as a list of OBS_SIZE floats."""
+    obs = [1.0] * BLOCKED + [0.0] * (OBS_SIZE - BLOCKED)
+    p_left, p_right = sim.player_span()
+    camera = sim.distance
+    track = sim.track_scroll_speed
+
+    def ahead(obj, category, speed):
+        ox = obj.x - camera
+        if ox + obj.w <= p_left:
+            return
+        ttc = min(max(ox - p_right, 0) / float(speed), HORIZON) / HORIZON
+        i = category * LANE_COUNT + obj.lane
+        if ttc < obs[i]:
+            obs[i] = ttc
+        if category < COIN and ox < p_right:
+            obs[BLOCKED + obj.lane] = 1.0
+
+    p = sim.player
+    for obj in sim.OBSTACLES:
+        ahead(obj, category_of(obj.kind), track + obj.speed)
+    for row in sim.COIN_ROWS:
+        if row.remaining and row.is_air == p.is_flying:
+            ahead(row, COIN, track)
+    for pu in sim.POWER_UPS:
+        ahead(pu, POWERUP, track)
+
+    obs[PLAYER:] = [
+        p.current_lane / LAST_LANE,
+        p.target_lane / LAST_LANE,
+        (LANE_POSITIONS_Y_JACK[p.current_lane] - p.y) / 100.0,
+        p.velocity_y / 15.0,
+        float(p.on_train),
+        float(p.is_jumping),
+        float(p.is_sliding),
+        float(p.is_flying),
+        p.air_lane / LAST_LANE,
+        float(p.powerup_active),
+    ]
+    return obs
+
+
+class SubwayEnv:
+    """One game behind reset()/step(); `max_ticks` ends a run early (0: never)."""
+
+    def __init__(self, max_ticks=0):
+        self.max_ticks = max_ticks
+        self.sim = Simulation()
+
+    def reset(self, seed=None):
+        self.sim.reset(seed)
+        return observe(self.sim)
+
+    def step(self, action):
+        sim = self.sim
+        if ACTIONS[action] is not None:
+            sim.input(ACTIONS[action])
+        score = sim.score
+        sim.update()
+        reward = sim.score - score + SURVIVAL_REWARD
+        truncated = bool(self.max_ticks) and sim.tick >= self.max_ticks
+        info = {"score": sim.score, "tick": sim.tick, "truncated": truncated and not sim.game_over}
+        return observe(sim), reward, sim.game_over or truncated, info
+
+
+# -- vectorized ----------------------------------------------------------------
+
+RUNNING, JUMPING, SLIDING = range(3)
+# obstacle kinds: OBSTACLE_TYPES indices, then trains
+TRAIN_KIND = len(OBSTACLE_TYPES)
+# power-up kinds
+DOUBLEJUMP, FLYING = range(2)
+
+# collider of the player, same sizes Simulation.player_box uses
+HALF_HEIGHT = AnimationConfig.CHARACTER_HEIGHT / 2.0
+PADDING = 15
+TRAIN_BUFFER_X = 20  # how far past a train's ends the player can stand on it
+
+
+class Slots:
+    """Per-game entity columns: one array per field, shaped (games, capacity).
+
+    `alive` marks the used slots; add() takes the first free one in a row
+    and doubles the capacity of every row when a row is full.
+    """
+
+    def __init__(self, n, capacity, **fields):
+        self.fields = fields
+        self.alive = np.zeros((n, capacity), bool)
+        for name, dtype in fields.items():
+            setattr(self, name, np.zeros((n, capacity), dtype))
+
+    def add(self, i, **values):
+        free = np.flatnonzero(~self.alive[i])
+        if not len(free):
+            self.grow()
+            free = np.flatnonzero(~self.alive[i])
+        k = free[0]
+        self.alive[i, k] = True
+        for name, value in values.items():
+            getattr(self, name)[i, k] = value
+        return k
+
+    def grow(self):
+        n, capacity = self.alive.shape
+        self.alive = np.concatenate([self.alive, np.zeros((n, capacity), bool)], axis=1)
+        for name, dtype in self.fields.items():
+            old = getattr(self, name)
+            setattr(self, name, np.concatenate([old, np.zeros((n, capacity), dtype)], axis=1))
+
+    def live(self, mask=None):
+        alive = self.alive if mask is None else self.alive & mask
+        return alive.sum(axis=1)
+
+
+def contact_times(top, bottom, dy, ox, w, oy, oh, v, p_left, p_right):
+    """Simulation.contact_time for arrays: time of first contact, inf if none."""
+    x_in = (ox - p_right) / v + 1
+    x_out = (ox + w - p_left) / v + 1
+    moving = dy != 0
+    safe_dy = np.where(moving, dy, 1.0)
+    t0 = (oy - bottom) / safe_dy + 1
+    t1 = (oy + oh - top) / safe_dy + 1
+    overlap = (top < oy + oh) & (bottom > oy)
+    y_in = np.where(moving, np.where(dy > 0, t0, t1), np.where(overlap, -np.inf, np.inf))
+    y_out = np.where(moving, np.where(dy > 0, t1, t0), np.where(overlap, np.inf, -np.inf))
+    t_in = np.maximum(x_in, y_in)
+    t_out = np.minimum(x_out, y_out)
+    hit = (t_in < t_out) & (t_in < 1) & (t_out > 0) & ~((t_in <= 0) & (t_out <= 1))
+    return np.where(hit, np.maximum(t_in, 0.0), np.inf)
+
+
+class VectorSubwayEnv:
+    """n games in lockstep; step(actions) takes and returns arrays of n.
+
+    Finished games (death, or max_ticks reached) restart straight away on
+    the next seed; step() reports them in `dones` and their final score in
+    info["final_score"], and the observation row is already the new run's.
+    """
+
+    def __init__(self, n, max_ticks=0):
+        if np is None:
+            raise ImportError("VectorSubwayEnv needs NumPy")
+        self.n = n
+        self.max_ticks = max_ticks
+        # the spawn planners' view of the rules; caps and cooldowns come from here
+        self.rules = Simulation(seed=0)
+        self.track_scroll_speed = self.rules.track_scroll_speed
+        self.p_left, self.p_right = self.rules.player_span()
+
+        self.jack_y = np.array(LANE_POSITIONS_Y_JACK, float)
+        self.air_y = np.array(AIR_LANE_POSITIONS_Y, float)
+        self.popcount = np.array([bin(mask).count("1") for mask in range(1 << 10)], np.int64)
+        self.bit_length = np.array([mask.bit_length() for mask in range(1 << 10)], np.int64)
+
+        self.tick = np.zeros(n, np.int64)
+        self.distance = np.zeros(n, np.int64)
+        self.score = np.zeros(n, np.int64)
+        self.game_over = np.zeros(n, bool)
+
+        self.y = np.zeros(n)
+        self.prev_y = np.zeros(n)
+        self.base_y = np.zeros(n)
+        self.velocity_y = np.zeros(n)
+        self.jump_force = np.zeros(n)
+        self.current_lane = np.zeros(n, np.int64)
+        self.target_lane = np.zeros(n, np.int64)
+        self.air_lane = np.zeros(n, np.int64)
+        self.state = np.zeros(n, np.int64)
+        self.state_timer = np.zeros(n, np.int64)
+        self.on_train = np.zeros(n, bool)
+        self.on_ground = np.zeros(n, bool)
+        self.flying = np.zeros(n, bool)
+        self.powerup_active = np.zeros(n, bool)
+        self.powerup_end = np.zeros(n, np.int64)
+        self.invincible = np.zeros(n, bool)
+        self.invincible_end = np.zeros(n, np.int64)
+        # ms from which planned power-ups spawn again, Simulation's cooldown
+        self.powerup_ready_at = np.zeros(n, np.int64)
+        self.last_train = np.zeros(n, np.int64)
+
+        self.obstacles = Slots(n, 16, x=float, w=float, h=float, y=float, lane=np.int64,
+                               kind=np.int64, speed=float)
+        self.coins = Slots(n, 8, x=float, w=float, y=float, lane=np.int64, count=np.int64,
+                           collected=np.int64, remaining=np.int64, is_air=bool)
+        self.powerups = Slots(n, 4, x=float, w=float, h=float, y=float, lane=np.int64,
+                              kind=np.int64)
+
+        self.rngs = [None] * n
+        self.plans = [None] * n
+        self.next_spawn = [None] * n
+        self.next_spawn_x = np.zeros(n)
+        self.next_seed = 0
+
+    # -- resets -------------------------------------------------------------
+
+    def reset(self, seed=None):
+        """Restart every game, game i on seed + i; returns the observations."""
+        if seed is None:
+            seed = random.getrandbits(32)
+        for i in range(self.n):
+            self.reset_game(i, seed + i)
+        self.next_seed = seed + self.n
+        return self.observe()
+
+    def reset_game(self, i, seed):
+        # same order of draws as Simulation.reset
+        rng = PortableRandom(seed)
+        self.rngs[i] = rng
+        self.plans[i] = SpawnPlanner(self.rules, PortableRandom(rng.getrandbits(32))).timeline()
+        self.set_next_spawn(i, next(self.plans[i]))
+
+        self.tick[i] = 0
+        self.distance[i] = 0
+        self.score[i] = 0
+        self.game_over[i] = False
+
+        self.y[i] = self.prev_y[i] = self.base_y[i] = LANE_POSITIONS_Y_JACK[1]
+        self.velocity_y[i] = 0
+        self.jump_force[i] = self.rules.player.NORMAL_JUMP_FORCE
+        self.current_lane[i] = self.target_lane[i] = self.air_lane[i] = 1
+        self.state[i] = RUNNING
+        self.state_timer[i] = 0
+        self.on_train[i] = False
+        self.on_ground[i] = True
+        self.flying[i] = False
+        self.powerup_active[i] = False
+        self.powerup_end[i] = 0
+        self.invincible[i] = False
+        self.invincible_end[i] = 0
+        self.powerup_ready_at[i] = self.rules.powerup_cooldown
+        self.last_train[i] = -1
+
+        self.obstacles.alive[i] = False
+        self.coins.alive[i] = False
+        self.powerups.alive[i] = False
+
+    def set_next_spawn(self, i, entry):
+        self.next_spawn[i] = entry
+        self.next_spawn_x[i] = entry.x
+
+    # -- step ---------------------------------------------------------------
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        score = self.score.copy()
+        self.tick += 1
+        self.apply_actions(actions)
+        self.update_player()
+        self.collide()
+        self.activate_spawns()
+        self.move_world()
+        self.update_air_coins()
+
+        rewards = (self.score - score) + SURVIVAL_REWARD
+        dones = self.game_over.copy()
+        if self.max_ticks:
+            dones |= self.tick >= self.max_ticks
+        info = {"final_score": np.where(dones, self.score, 0),
+                "truncated": dones & ~self.game_over}
+        for i in np.flatnonzero(dones):
+            self.reset_game(i, self.next_seed)
+            self.next_seed += 1
+        return self.observe(), rewards, dones, info
+
+    def change_to_running(self, rows):
+        rows = rows & (self.state != RUNNING)
+        self.state[rows] = RUNNING
+        self.state_timer[rows] = 0
+
+    def apply_actions(self, actions):
+        # Player.jump
+        jump = actions == JUMP
+        leaving_train = jump & self.on_train
+        self.base_y[leaving_train] = self.jack_y[self.current_lane[leaving_train]]
+        jump &= (self.state == RUNNING) & (self.on_ground | self.on_train)
+        self.state[jump] = JUMPING
+        self.state_timer[jump] = 0
+        self.velocity_y[jump] = self.jump_force[jump]
+        self.on_ground[jump] = False
+        self.on_train[jump] = False
+
+        # Player.slide
+        slide = (actions == SLIDE) & (self.state == RUNNING)
+        self.state[slide] = SLIDING
+        self.state_timer[slide] = 0
+
+        # Player.switch_lane, air lanes while flying
+        for action, step in ((UP, -1), (DOWN, 1)):
+            rows = actions == action
+            air = rows & self.flying
+            self.air_lane[air] = np.clip(self.air_lane[air] + step, 0, LANE_COUNT - 1)
+            ground = rows & ~self.flying
+            self.target_lane[ground] = np.clip(self.target_lane[ground] + step, 0, LANE_COUNT - 1)
+
+    def update_player(self):
+        """Player.update for every game."""
+        self.prev_y[:] = self.y
+        now = (self.tick * MS_PER_TICK).astype(np.int64)
+
+        expired = self.powerup_active & (now >= self.powerup_end)
+        self.powerup_active[expired] = False
+        landing = expired & self.flying
+        if landing.any():
+            self.flying[landing] = False
+            self.current_lane[landing] = self.air_lane[landing]
+            self.target_lane[landing] = self.air_lane[landing]
+            self.base_y[landing] = self.jack_y[self.air_lane[landing]]
+            self.y[landing] = self.base_y[landing]
+            self.on_ground[landing] = True
+            self.change_to_running(landing)
+            self.invincible[landing] = True
+            self.invincible_end[landing] = now[landing] + 3000
+        self.invincible &= now < self.invincible_end
+        self.jump_force[~self.powerup_active] = self.rules.player.NORMAL_JUMP_FORCE
+
+        # flying: glide to the air lane and skip everything else
+        flying = self.flying
+        target_y = self.air_y[self.air_lane]
+        gap = target_y - self.y
+        gliding = flying & (np.abs(gap) > 2)
+        self.y = np.where(gliding, self.y + gap * 0.2, self.y)
+        settled = flying & ~gliding
+        self.y[settled] = target_y[settled]
+        self.base_y[settled] = target_y[settled]
+
+        ground = ~flying
+        self.state_timer[ground] += 1
+
+        riding = ground & self.on_train
+        self.y[riding] = self.base_y[riding]
+        self.on_ground[riding] = True
+        self.velocity_y[riding] = 0
+
+        # apply_gravity, only while jumping
+        jumping = ground & (self.state == JUMPING)
+        falling = np.minimum(self.velocity_y + self.rules.player.GRAVITY, self.rules.player.MAX_FALL_SPEED)
+        self.velocity_y = np.where(jumping, np.where(self.on_ground, 0.0, falling), self.velocity_y)
+        self.y = np.where(jumping, self.y + self.velocity_y, self.y)
+        landed = jumping & (self.y >= self.base_y)
+        self.y[landed] = self.base_y[landed]
+        self.velocity_y[landed] = 0
+        self.on_ground[landed] = True
+        self.change_to_running(landed)
+
+        slid = ground & (self.state == SLIDING) & (self.state_timer >= AnimationConfig.SLIDE_DURATION)
+        self.change_to_running(slid)
+
+        self.update_lane_movement(ground, riding)
+
+    def update_lane_movement(self, ground, riding):
+        # off the end of the train: fall back to the lane's ground
+        train = np.maximum(self.last_train, 0)
+        rows = np.arange(self.n)
+        train_x = self.obstacles.x[rows, train] - self.distance
+        train_w = self.obstacles.w[rows, train]
+        off = riding & ((PLAYER_X < train_x - TRAIN_BUFFER_X) |
+                        (PLAYER_X > train_x + train_w + TRAIN_BUFFER_X))
+        self.on_train[off] = False
+        self.base_y[off] = self.jack_y[self.current_lane[off]]
+
+        switching = ground & ~riding
+        target_y = self.jack_y[self.target_lane]
+        gap = target_y - self.base_y
+        moving = switching & (np.abs(gap) > 2)
+        self.base_y = np.where(moving, self.base_y + gap * 0.3, self.base_y)
+        settled = switching & ~moving
+        self.base_y[settled] = target_y[settled]
+        self.current_lane[settled] = self.target_lane[settled]
+        follow = switching & self.on_ground
+        self.y[follow] = self.base_y[follow]
+
+    def player_box(self, rows=None):
+        y = self.y if rows is None else self.y[rows]
+        return y - HALF_HEIGHT + PADDING, y + HALF_HEIGHT - PADDING
+
+    def in_player_lanes(self, lanes):
+        return (lanes == self.current_lane[:, None]) | (lanes == self.target_lane[:, None])
+
+    def collide(self):
+        self.collide_obstacles()
+        self.collect_coins()
+        self.collect_powerups()
+
+    def contacts(self, candidates, ox, w, oy, oh, v):
+        """(games, slots, times) of every candidate the player touches this tick."""
+        # only what passed through the player's column can touch it
+        near = candidates & (ox < self.p_right) & (ox + v + w > self.p_left)
+        rows, slots = np.nonzero(near)
+        if not len(rows):
+            return rows, slots, np.zeros(0)
+
+        def pick(a):
+            return a[rows, slots] if np.ndim(a) == 2 else a
+
+        top, bottom = self.player_box(rows)
+        toi = contact_times(top, bottom, self.y[rows] - self.prev_y[rows], pick(ox), pick(w),
+                            pick(oy), pick(oh), pick(v), self.p_left, self.p_right)
+        hit = np.isfinite(toi)
+        return rows[hit], slots[hit], toi[hit]
+
+    def collide_obstacles(self):
+        o = self.obstacles
+        exposed = ~self.flying & ~self.invincible
+        candidates = o.alive & exposed[:, None] & self.in_player_lanes(o.lane)
+        rows, slots, toi = self.contacts(candidates, o.x - self.distance[:, None], o.w, o.y, o.h,
+                                         self.track_scroll_speed + o.speed)
+        if not len(rows):
+            return
+        # contacts in time-of-impact order, one round per contact, so a
+        # landing on one train covers a later hit exactly as in Simulation
+        order = np.lexsort((o.x[rows, slots], toi, rows))
+        rows = rows[order]
+        slots = slots[order]
+        firsts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        rank = np.arange(len(rows)) - np.repeat(firsts, np.diff(np.r_[firsts, len(rows)]))
+        for r in range(rank.max() + 1):
+            this_round = rank == r
+            game = rows[this_round]
+            live = ~self.game_over[game]
+            game = game[live]
+            if not len(game):
+                break
+            lethal = self.check_obstacles(game, slots[this_round][live])
+            self.game_over[game[lethal]] = True
+
+    def check_obstacles(self, rows, slots):
+        """Simulation.check_player for obstacle slots[j] of game rows[j]."""
+        o = self.obstacles
+        ox = o.x[rows, slots] - self.distance[rows]
+        w = o.w[rows, slots]
+        oy = o.y[rows, slots]
+        oh = o.h[rows, slots]
+        v = self.track_scroll_speed + o.speed[rows, slots]
+        kind = o.kind[rows, slots]
+        y = self.y[rows]
+        vy = self.velocity_y[rows]
+        top, bottom = self.player_box(rows)
+        dy = y - self.prev_y[rows]
+        touching = np.isfinite(contact_times(top, bottom, dy, ox, w, oy, oh, v,
+                                             self.p_left, self.p_right))
+
+        # trains: jumping off is safe, falling onto the roof is a landing
+        train = kind == TRAIN_KIND
+        leaving = train & touching & (vy < 0)
+        feet = bottom
+        prev_feet = feet - dy
+        over = (self.p_right > ox) & (self.p_left < ox + v + w)
+        within = (feet >= oy - 5) & (feet <= oy + 5)
+        crossed = (vy > 0) & (prev_feet <= oy) & (oy <= feet)
+        lands = train & ~leaving & over & (vy >= 0) & (within | crossed)
+        if lands.any():
+            landed = rows[lands]
+            self.on_train[landed] = True
+            self.on_ground[landed] = True
+            self.velocity_y[landed] = 0
+            self.base_y[landed] = oy[lands] - 30
+            self.y[landed] = self.base_y[landed]
+            self.last_train[landed] = slots[lands]
+        riding = train & ~leaving & ~lands & self.on_train[rows]
+        safe = leaving | lands | riding
+
+        state = self.state[rows]
+        jumped = (kind < 2) & (state == JUMPING) & ~self.on_ground[rows]
+        slid = (kind == OBSTACLE_TYPES.index("slide")) & (state == SLIDING)
+        return ~safe & touching & ~jumped & ~slid
+
+    def collect_coins(self):
+        c = self.coins
+        in_layer = np.where(self.flying[:, None], c.is_air & (c.lane == self.air_lane[:, None]),
+                            ~c.is_air & self.in_player_lanes(c.lane))
+        candidates = c.alive & (c.remaining > 0) & in_layer
+        rows, slots, _ = self.contacts(candidates, c.x - self.distance[:, None], c.w, c.y,
+                                       CoinRow.h, self.track_scroll_speed)
+        if not len(rows):
+            return
+        # CoinRow.collect_span over the span swept this tick, in world x
+        left = self.p_left + self.distance[rows] - self.track_scroll_speed
+        right = self.p_right + self.distance[rows]
+        x = c.x[rows, slots]
+        count = c.count[rows, slots]
+        first = np.floor_divide(left - CoinRow.coin_w - x, CoinRow.space).astype(np.int64) + 1
+        last = -np.floor_divide(x - right, CoinRow.space).astype(np.int64) - 1
+        first = np.clip(first, 0, count)
+        last = np.clip(last, -1, count - 1)
+        span = ((np.int64(1) << (last + 1)) - 1) & ~((np.int64(1) << first) - 1)
+        new = span & ~c.collected[rows, slots]
+        picked = self.popcount[new]
+        c.collected[rows, slots] |= new
+        c.remaining[rows, slots] -= picked
+        np.add.at(self.score, rows, picked)
+        done = c.remaining[rows, slots] == 0
+        c.alive[rows[done], slots[done]] = False
+
+    def collect_powerups(self):
+        p = self.powerups
+        able = ~self.powerup_active & ~self.flying & ~self.invincible
+        candidates = p.alive & able[:, None]
+        rows, slots, _ = self.contacts(candidates, p.x - self.distance[:, None], p.w, p.y, p.h,
+                                       self.track_scroll_speed)
+        # first lane the player is in wins, then the nearest in that lane
+        picked = set()
+        for lanes in (self.current_lane, self.target_lane):
+            best = {}
+            for i, k in zip(rows, slots):
+                if i in picked or p.lane[i, k] != lanes[i]:
+                    continue
+                if i not in best or p.x[i, k] < p.x[i, best[i]]:
+                    best[i] = k
+            for i, k in best.items():
+                self.pick_powerup(i, k)
+                picked.add(i)
+
+    def pick_powerup(self, i, k):
+        now = int(self.tick[i] * MS_PER_TICK)
+        rng = self.rngs[i]
+        self.powerup_active[i] = True
+        self.powerup_ready_at[i] = now + self.rules.powerup_cooldown
+        if self.powerups.kind[i, k] == DOUBLEJUMP:
+            # Player.super_jump
+            self.jump_force[i] = self.rules.player.SUPER_JUMP_FORCE
+            self.powerup_end[i] = now + rng.randint(8000, 15000)
+        else:
+            # Player.fly
+            self.flying[i] = True
+            self.powerup_end[i] = now + rng.randint(8000, 15000)
+            self.air_lane[i] = 1
+            self.y[i] = self.base_y[i] = AIR_LANE_POSITIONS_Y[1]
+            self.on_ground[i] = False
+        self.powerups.alive[i, k] = False
+
+    def activate_spawns(self):
+        due = np.flatnonzero(self.next_spawn_x - self.distance <= ACTIVATION_X)
+        for i in due:
+            entry = self.next_spawn[i]
+            camera = self.distance[i]
+            while entry.x - camera <= ACTIVATION_X:
+                self.add_entry(i, entry)
+                entry = next(self.plans[i])
+            self.set_next_spawn(i, entry)
+
+    def add_entry(self, i, entry):
+        lane = entry.lane
+        if entry.kind == simulation.COINROW:
+            self.add_coinrow(i, entry.x, lane, entry.param, False)
+            return
+        w, h = KIND_SIZES[entry.kind]
+        if entry.kind <= simulation.TRAIN3:
+            # trains are one kind here, obstacles keep their number
+            kind = TRAIN_KIND if entry.kind >= simulation.TRAIN1 else entry.param
+            self.obstacles.add(i, x=entry.x, w=w, h=h, y=LANE_POSITIONS_Y[lane] - h, lane=lane,
+                               kind=kind, speed=entry.speed)
+        else:
+            now = int(self.tick[i] * MS_PER_TICK)
+            if now < self.powerup_ready_at[i]:
+                return
+            self.powerups.add(i, x=entry.x, w=w, h=h, y=LANE_POSITIONS_Y[lane] - h, lane=lane,
+                              kind=DOUBLEJUMP if entry.kind == simulation.DOUBLEJUMP else FLYING)
+            self.powerup_ready_at[i] = now + self.rules.powerup_cooldown
+
+    def add_coinrow(self, i, x, lane, count, is_air):
+        self.coins.add(i, x=x, w=CoinRow.width(count), y=CoinRow.row_y(lane, is_air), lane=lane,
+                       count=count, collected=0, remaining=count, is_air=is_air)
+
+    def move_world(self):
+        o = self.obstacles
+        trains = o.alive & (o.kind == TRAIN_KIND)
+        o.x = np.where(trains, o.x - o.speed, o.x)
+        self.distance += self.track_scroll_speed
+
+        camera = self.distance[:, None]
+        o.alive &= o.x + o.w - camera > 0
+        c = self.coins
+        # last coin still on the track
+        full = (np.int64(1) << c.count) - 1
+        last = self.bit_length[full & ~c.collected] - 1
+        c.alive &= c.x + last * CoinRow.space + CoinRow.coin_w - camera >= 0
+        p = self.powerups
+        p.alive &= p.x + p.w - camera >= 0
+
+    def update_air_coins(self):
+        c = self.coins
+        air_rows = c.live(c.is_air)
+        grounded = ~self.flying & (air_rows > 0)
+        c.alive[grounded] &= ~c.is_air[grounded]
+        for i in np.flatnonzero(self.flying & (air_rows < self.rules.max_air_coin_rows)):
+            self.spawn_air_coinrow(i)
+
+    def spawn_air_coinrow(self, i):
+        """Simulation.spawn_air_coinrow for game i."""
+        rng = self.rngs[i]
+        c = self.coins
+        width = simulation.SCREEN_WIDTH
+        for _ in range(4):
+            lane = rng.randint(0, LANE_COUNT - 1)
+            x = self.distance[i] + rng.randint(width + 100, width + 500)
+            count = rng.randint(4, 10)
+            w = CoinRow.width(count)
+            # is_space_free against air rows in the lane: a coin gap either side
+            others = c.alive[i] & c.is_air[i] & (c.lane[i] == lane)
+            blocked = others & (x < c.x[i] + c.w[i] + simulation.COIN_BUFFER) & \
+                (c.x[i] < x + w + simulation.COIN_BUFFER)
+            if blocked.any():
+                continue
+            self.add_coinrow(i, x, lane, count, True)
+            return
+
+    # -- observation --------------------------------------------------------
+
+    def observe(self):
+        """observe() for every game, as an (n, OBS_SIZE) float32 array."""
+        obs = np.zeros((self.n, OBS_SIZE), np.float32)
+        obs[:, :BLOCKED] = 1.0
+        camera = self.distance[:, None]
+        track = self.track_scroll_speed
+
+        o = self.obstacles
+        ox = o.x - camera
+        rows, slots, ttc = self.ttc(o.alive, ox, o.w, track + o.speed)
+        category = np.array([JUMPABLE, JUMPABLE, SLIDE_UNDER, TRAIN])[o.kind[rows, slots]]
+        lanes = o.lane[rows, slots]
+        np.minimum.at(obs, (rows, category * LANE_COUNT + lanes), ttc)
+        level = ox[rows, slots] < self.p_right
+        obs[rows[level], BLOCKED + lanes[level]] = 1.0
+
+        c = self.coins
+        in_layer = c.alive & (c.remaining > 0) & (c.is_air == self.flying[:, None])
+        rows, slots, ttc = self.ttc(in_layer, c.x - camera, c.w, track)
+        np.minimum.at(obs, (rows, COIN * LANE_COUNT + c.lane[rows, slots]), ttc)
+
+        p = self.powerups
+        rows, slots, ttc = self.ttc(p.alive, p.x - camera, p.w, track)
+        np.minimum.at(obs, (rows, POWERUP * LANE_COUNT + p.lane[rows, slots]), ttc)
+
+        obs[:, PLAYER:] = np.stack([
+            self.current_lane / LAST_LANE,
+            self.target_lane / LAST_LANE,
+            (self.jack_y[self.current_lane] - self.y) / 100.0,
+            self.velocity_y / 15.0,
+            self.on_train,
+            self.state == JUMPING,
+            self.state == SLIDING,
+            self.flying,
+            self.air_lane / LAST_LANE,
+            self.powerup_active,
+        ], axis=1)
+        return obs
+
+    def ttc(self, alive, ox, w, speed):
+        """(games, slots, time-to-contact) of what is ahead, within HORIZON or about."""
+        # the bound is loose by a pixel, ttc itself is clamped as in observe()
+        near = alive & (ox + w > self.p_left) & (ox - self.p_right < HORIZON * speed + 1)
+        rows, slots = np.nonzero(near)
+        if np.ndim(speed) == 2:
+            speed = speed[rows, slots]
+        ttc = np.minimum(np.maximum(ox[rows, slots] - self.p_right, 0) / speed, HORIZON) / HORIZON
+        return rows, slots, ttc
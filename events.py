@@ -0,0 +1,76 @@
+"""Gameplay events emitted by the simulation.
+
+The simulation announces what happened (a coin row was hit, the player
+died, an entity spawned ...) on its EventBus and leaves the reaction to
+whoever subscribed: the sketch plays sounds and keeps its render queue
+in step with Spawned and Despawned, tools can log telemetry. emit() looks
+the event type up first and only builds the event object when someone
+listens, so a headless or batch run with no subscribers pays one dict
+lookup per emit.
+"""
+
+
+class Event:
+    pass
+
+
+class CoinCollected(Event):
+    def __init__(self, row, count):
+        self.row = row
+        self.count = count
+
+
+class PowerUpCollected(Event):
+    def __init__(self, powerup):
+        self.powerup = powerup
+
+
+class Died(Event):
+    def __init__(self, obstacle, tick):
+        self.obstacle = obstacle
+        self.tick = tick
+
+
+class LandedOnTrain(Event):
+    def __init__(self, train):
+        self.train = train
+
+
+class LaneChanged(Event):
+    def __init__(self, old_lane, new_lane, is_air=False):
+        self.old_lane = old_lane
+        self.new_lane = new_lane
+        self.is_air = is_air
+
+
+class Spawned(Event):
+    def __init__(self, obj):
+        self.obj = obj
+
+
+class Despawned(Event):
+    def __init__(self, obj):
+        self.obj = obj
+
+
+class EventBus:
+    def __init__(self):
+        # event class -> handlers, in subscription order
+        self.handlers = {}
+
+    def subscribe(self, event_type, handler):
+        self.handlers.setdefault(event_type, []).append(handler)
+
+    def unsubscribe(self, event_type, handler):
+        handlers = self.handlers.get(event_type)
+        if handlers and handler in handlers:
+            handlers.remove(handler)
+            if not handlers:
+                del self.handlers[event_type]
+
+    def emit(self, event_type, *args):
+        handlers = self.handlers.get(event_type)
+        if handlers:
+            event = event_type(*args)
+            for handler in handlers:
+                handler(event)
@@ -0,0 +1,84 @@
+"""Asset loading in stages, so the first frame does not wait for all of it.
+
+A StagedLoader runs a list of (name, load) stages in order. The first
+`critical` stages run on the caller's thread, everything the start screen
+needs; start() then runs the rest on a background thread while frames are
+being drawn. progress() is the finished fraction for a progress bar, and
+ready() turns true once every stage has run. Each stage's wall time is kept
+in `timings` (ms), in the order the stages ran.
+
+A stage that raises stops the loader; ready() re-raises it on the drawing
+thread, naming the stage, instead of the game waiting forever.
+"""
+
+import threading
+import time
+
+perf_counter = getattr(time, "perf_counter", time.time)
+
+
+class StagedLoader:
+    def __init__(self, stages, critical=1):
+        self.stages = list(stages)
+        self.critical = critical
+        # index of the next stage to run; only the running thread moves it
+        self.next_stage = 0
+        self.timings = []
+        self.error = None
+        self.failed_stage = None
+        self.thread = None
+
+    def run_stage(self):
+        name, load = self.stages[self.next_stage]
+        start = perf_counter()
+        try:
+            load()
+        except Exception as e:
+            self.error = e
+            self.failed_stage = name
+            return False
+        self.timings.append((name, (perf_counter() - start) * 1000.0))
+        self.next_stage += 1
+        return True
+
+    def run_critical(self):
+        """Run the stages the first frame needs, here and now."""
+        while self.next_stage < min(self.critical, len(self.stages)) and self.error is None:
+            self.run_stage()
+        self.check()
+
+    def run(self):
+        while self.next_stage < len(self.stages) and self.error is None:
+            self.run_stage()
+
+    def start(self):
+        """Run the remaining stages on a background thread."""
+        if self.thread is not None or self.next_stage >= len(self.stages):
+            return
+        self.thread = threading.Thread(target=self.run, name="asset-loader")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def finish(self):
+        """Block until every stage has run, loading here if nothing was started."""
+        if self.thread is not None:
+            self.thread.join()
+        else:
+            self.run()
+        self.check()
+
+    def check(self):
+        if self.error is not None:
+            raise RuntimeError("loading %s failed: %s" % (self.failed_stage, self.error))
+
+    def ready(self):
+        self.check()
+        return self.next_stage >= len(self.stages)
+
+    def progress(self):
+        if not self.stages:
+            return 1.0
+        return self.next_stage / float(len(self.stages))
+
+    def total_ms(self):
+        return sum(ms for name, ms in self.timings)
@@ -0,0 +1,30 @@
+"""Free-list pools so the game loop recycles entities instead of allocating."""
+
+
+class Pool:
+    """Objects of one kind, handed out again after release().
+
+    Pooled classes take their state through reinit(*args), which __init__
+    calls as well, so a recycled object is indistinguishable from a new one.
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.free = []
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, *args):
+        if self.free:
+            self.hits += 1
+            obj = self.free.pop()
+            obj.reinit(*args)
+            return obj
+        self.misses += 1
+        return self.factory(*args)
+
+    def release(self, obj):
+        self.free.append(obj)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "free": len(self.free)}
@@ -0,0 +1,55 @@
+"""The game's random generator, the same on Jython 2.7 and CPython 3.
+
+random.Random gives no such promise: CPython 3 rewrote randint() and
+choice() on top of getrandbits(), and Jython backs the module with a Java
+generator of its own, so a replay recorded in the sketch would play out
+differently headless. PortableRandom is SplitMix64 in plain integer
+arithmetic, masked to 64 bits, and derives every draw from that alone.
+
+It covers the part of the random.Random interface the simulation uses,
+including getstate()/setstate() for snapshots; the state is one integer.
+"""
+
+
+MASK = 0xFFFFFFFFFFFFFFFF
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+# 2 ** -53, random() keeps the top 53 bits of a draw
+UNIT = 1.0 / 9007199254740992.0
+
+
+class PortableRandom(object):
+    __slots__ = ("state",)
+
+    def __init__(self, seed=0):
+        self.seed(seed)
+
+    def seed(self, seed):
+        self.state = seed & MASK
+
+    def getstate(self):
+        return self.state
+
+    def setstate(self, state):
+        self.state = state & MASK
+
+    def next64(self):
+        self.state = z = (self.state + GOLDEN_GAMMA) & MASK
+        z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK
+        z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK
+        return z ^ (z >> 31)
+
+    def random(self):
+        """Float in [0, 1)."""
+        return (self.next64() >> 11) * UNIT
+
+    def getrandbits(self, k):
+        """Int with k random bits, k <= 64."""
+        return int(self.next64() >> (64 - k))
+
+    def randint(self, a, b):
+        """Int in [a, b]. The modulo bias is below 2 ** -40 for the spans
+        the game draws from."""
+        return a + int(self.next64() % (b - a + 1))
+
+    def choice(self, seq):
+        return seq[int(self.next64() % len(seq))]
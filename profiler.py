@@ -0,0 +1,154 @@
+"""Per-phase frame profiler.
+
+Code marks phases with begin(name) / end(name). Time spent in a scope is
+summed over the frame (a frame can run several simulation ticks), and at
+frame_end() each scope's total goes into a fixed-size ring buffer that the
+overlay turns into rolling p50/p95/p99. Samples can also be streamed to a
+.csv or .jsonl file; rows are buffered and written every `flush_every`
+frames so logging does not add a disk write per frame.
+
+A disabled profiler returns from every call straight away, so the scopes
+can stay in the hot paths permanently.
+"""
+
+import json
+import time
+
+perf_counter = getattr(time, "perf_counter", time.time)
+
+
+class Profiler:
+    def __init__(self, window=240, flush_every=120):
+        self.enabled = False
+        self.window = window
+        self.flush_every = flush_every
+
+        self.frame = 0
+        self.starts = {}
+        # this frame's totals, in ms
+        self.current = {}
+        self.counts = {}
+        # name -> ring of the last `window` frame totals
+        self.rings = {}
+        self.ring_pos = 0
+        self.filled = 0
+        # scope names in first-seen order, fixes the CSV columns
+        self.names = []
+        self.count_names = []
+
+        self.log = None
+        self.log_format = None
+        self.pending_rows = []
+        self.frame_started = 0.0
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        # drop half-measured scopes from before the switch
+        self.starts.clear()
+        self.current.clear()
+
+    def begin(self, name):
+        if not self.enabled:
+            return
+        self.starts[name] = perf_counter()
+
+    def end(self, name):
+        if not self.enabled:
+            return
+        start = self.starts.pop(name, None)
+        if start is None:
+            # profiler switched on halfway through this scope
+            return
+        self.current[name] = self.current.get(name, 0.0) + (perf_counter() - start) * 1000.0
+
+    def count(self, name, value):
+        if not self.enabled:
+            return
+        self.counts[name] = value
+
+    def frame_start(self):
+        if not self.enabled:
+            return
+        self.frame_started = perf_counter()
+
+    def frame_end(self):
+        if not self.enabled:
+            return
+        self.current["frame"] = (perf_counter() - self.frame_started) * 1000.0
+        self.frame += 1
+
+        for name in self.current:
+            if name not in self.rings:
+                self.rings[name] = [0.0] * self.window
+                self.names.append(name)
+        pos = self.ring_pos
+        for name in self.names:
+            self.rings[name][pos] = self.current.get(name, 0.0)
+        self.ring_pos = (pos + 1) % self.window
+        if self.filled < self.window:
+            self.filled += 1
+
+        for name in self.counts:
+            if name not in self.count_names:
+                self.count_names.append(name)
+
+        if self.log is not None:
+            self.pending_rows.append(self.format_row())
+            if len(self.pending_rows) >= self.flush_every:
+                self.flush()
+        self.current.clear()
+
+    def percentiles(self, name, points=(50, 95, 99)):
+        ring = self.rings.get(name)
+        if ring is None or not self.filled:
+            return [0.0] * len(points)
+        if self.filled < self.window:
+            samples = sorted(ring[:self.filled])
+        else:
+            samples = sorted(ring)
+        last = len(samples) - 1
+        return [samples[min(last, int(round(last * p / 100.0)))] for p in points]
+
+    def summary(self):
+        """[(name, p50, p95, p99)] for every scope, frame first."""
+        rows = []
+        for name in self.names:
+            p50, p95, p99 = self.percentiles(name)
+            rows.append((name, p50, p95, p99))
+        rows.sort(key=lambda row: (row[0] != "frame", row[0]))
+        return rows
+
+    # -- sample log -----------------------------------------------------------
+
+    def open_log(self, path):
+        self.close_log()
+        self.log = open(path, "w")
+        self.log_format = "jsonl" if path.endswith(".jsonl") else "csv"
+        self.log_columns = None
+
+    def format_row(self):
+        if self.log_format == "jsonl":
+            sample = {"index": self.frame, "ms": self.current, "counts": self.counts}
+            return json.dumps(sample, sort_keys=True) + "\n"
+        if self.log_columns is None:
+            # columns are fixed by the first logged frame
+            self.log_columns = (list(self.names), list(self.count_names))
+            header = ["index"] + self.log_columns[0] + self.log_columns[1]
+            self.pending_rows.append(",".join(header) + "\n")
+        names, count_names = self.log_columns
+        row = [str(self.frame)]
+        row.extend("%.4f" % self.current.get(name, 0.0) for name in names)
+        row.extend(str(self.counts.get(name, "")) for name in count_names)
+        return ",".join(row) + "\n"
+
+    def flush(self):
+        if self.log is not None and self.pending_rows:
+            self.log.write("".join(self.pending_rows))
+            self.log.flush()
+        del self.pending_rows[:]
+
+    def close_log(self):
+        if self.log is not None:
+            self.flush()
+            self.log.close()
+            self.log = None
@@ -0,0 +1,93 @@
+"""Painter's-order queue of what the sketch draws on the track.
+
+Entities sit in one bucket per (layer, lane), ground layer first and lanes
+top to bottom, each bucket kept sorted by depth as entities are added and
+removed. Walking the buckets in order is the draw order, so a frame needs
+no sorting and no list building; the player is drawn right after the
+bucket of the lane it is in.
+
+The planner activates entities well ahead of the camera, so a spawned
+entity first waits among the arrivals, ordered by where it comes into view,
+and joins its bucket once the right screen edge reaches it. Entities leave
+through the despawn paths, which the lane indexes drive as things go off
+the left edge, so the buckets only ever hold what is on screen.
+"""
+
+from bisect import bisect_left, bisect_right
+from heapq import heappush, heappop
+
+from simulation import COINROW
+from spatial import GROUND, AIR, layer_of
+
+
+def depth_of(obj):
+    # coin rows lie flat on the track, under anything standing in their lane;
+    # within a kind, taller sprites (smaller y) are further back
+    return (0 if obj.kind == COINROW else 1, obj.y)
+
+
+class RenderQueue:
+    def __init__(self, lane_count):
+        self.lane_count = lane_count
+        self.buckets = [[[] for _ in range(lane_count)] for _ in (GROUND, AIR)]
+        self.keys = [[[] for _ in range(lane_count)] for _ in (GROUND, AIR)]
+        self.size = 0
+        # speed -> heap of (x + speed * travel, seq, obj), as the lane
+        # indexes key moving entities; trains of one speed keep their order
+        self.arrivals = {}
+        # entity -> seq of its live arrival entry; entries of entities that
+        # were despawned before coming into view are dropped when popped
+        self.waiting = {}
+        self.seq = 0
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        self.__init__(self.lane_count)
+
+    def add(self, obj, travel=0):
+        """Queue obj to be drawn once it comes into view; `travel` is the
+        moving lane index's, for trains."""
+        self.seq += 1
+        self.waiting[obj] = self.seq
+        heap = self.arrivals.get(obj.speed)
+        if heap is None:
+            heap = self.arrivals[obj.speed] = []
+        heappush(heap, (obj.x + obj.speed * travel, self.seq, obj))
+
+    def admit(self, right_edge, travel=0):
+        """Move the arrivals whose left end is now left of right_edge into
+        their buckets."""
+        for speed, heap in self.arrivals.items():
+            limit = right_edge + speed * travel
+            while heap and heap[0][0] < limit:
+                key, seq, obj = heappop(heap)
+                if self.waiting.get(obj) == seq:
+                    del self.waiting[obj]
+                    self.insert(obj)
+
+    def insert(self, obj):
+        layer = layer_of(obj)
+        key = depth_of(obj)
+        keys = self.keys[layer][obj.lane]
+        i = bisect_right(keys, key)
+        keys.insert(i, key)
+        self.buckets[layer][obj.lane].insert(i, obj)
+        self.size += 1
+
+    def remove(self, obj):
+        if self.waiting.pop(obj, None) is not None:
+            return True
+        layer = layer_of(obj)
+        keys = self.keys[layer][obj.lane]
+        bucket = self.buckets[layer][obj.lane]
+        i = bisect_left(keys, depth_of(obj))
+        while i < len(bucket) and bucket[i] is not obj:
+            i += 1
+        if i == len(bucket):
+            return False
+        del keys[i]
+        del bucket[i]
+        self.size -= 1
+        return True
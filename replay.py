@@ -0,0 +1,154 @@
+"""Compact input logs and replay for deterministic runs.
+
+A run is fully described by its seed and the (tick, action) pairs applied
+to it, so a log is a few bytes: a header with the seed, one varint per
+input packing the tick delta and the action code, and a trailer with the
+end tick and score the recording finished on so a replay can be checked.
+
+    python replay.py runs/last_run.replay
+"""
+
+import struct
+
+
+ACTIONS = ("up", "down", "jump", "slide")
+ACTION_CODES = dict((action, code) for code, action in enumerate(ACTIONS))
+
+MAGIC = b"SCR1"
+
+
+def write_varint(buf, value):
+    while value >= 0x80:
+        buf.append((value & 0x7f) | 0x80)
+        value >>= 7
+    buf.append(value)
+
+
+def read_varint(data, pos):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class InputLog:
+    """(tick, action) pairs of one run, stored varint-packed as they arrive."""
+
+    def __init__(self, seed):
+        self.seed = seed
+        self.body = bytearray()
+        self.count = 0
+        self.last_tick = 0
+        # filled in by finish(), 0 while the run is still going
+        self.end_tick = 0
+        self.score = 0
+
+    def record(self, tick, action):
+        write_varint(self.body, ((tick - self.last_tick) << 2) | ACTION_CODES[action])
+        self.last_tick = tick
+        self.count += 1
+
+    def finish(self, end_tick, score):
+        self.end_tick = end_tick
+        self.score = score
+
+    def entries(self):
+        tick = 0
+        pos = 0
+        for _ in range(self.count):
+            value, pos = read_varint(self.body, pos)
+            tick += value >> 2
+            yield tick, ACTIONS[value & 3]
+
+    def to_bytes(self):
+        buf = bytearray(MAGIC + struct.pack("<I", self.seed))
+        write_varint(buf, self.count)
+        buf.extend(self.body)
+        write_varint(buf, self.end_tick)
+        write_varint(buf, self.score)
+        return bytes(buf)
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytearray(data)
+        if bytes(data[:4]) != MAGIC:
+            raise ValueError("not a Subway Chaser replay")
+        seed = struct.unpack("<I", bytes(data[4:8]))[0]
+        log = cls(seed)
+        count, pos = read_varint(data, 8)
+        start = pos
+        for _ in range(count):
+            _, pos = read_varint(data, pos)
+        log.body = data[start:pos]
+        log.count = count
+        log.end_tick, pos = read_varint(data, pos)
+        log.score, pos = read_varint(data, pos)
+        return log
+
+    def save(self, path):
+        f = open(path, "wb")
+        try:
+            f.write(self.to_bytes())
+        finally:
+            f.close()
+
+    @classmethod
+    def load(cls, path):
+        f = open(path, "rb")
+        try:
+            return cls.from_bytes(f.read())
+        finally:
+            f.close()
+
+
+class ReplayCursor:
+    """Hands a log's actions back to the simulation tick by tick."""
+
+    def __init__(self, log):
+        self.log = log
+        self.entries = iter(log.entries())
+        self.pending = next(self.entries, None)
+
+    def actions_for(self, tick):
+        actions = []
+        while self.pending is not None and self.pending[0] <= tick:
+            actions.append(self.pending[1])
+            self.pending = next(self.entries, None)
+        return actions
+
+    def done(self):
+        return self.pending is None
+
+
+def replay_headless(log, max_ticks=10 ** 7):
+    """Re-run a log without rendering; returns (score, death_tick)."""
+    from simulation import Simulation
+
+    sim = Simulation()
+    sim.start_replay(log)
+    limit = log.end_tick or max_ticks
+    sim.run(limit)
+    return sim.score, sim.death_tick
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    log = InputLog.load(sys.argv[1])
+    started = time.time()
+    score, death_tick = replay_headless(log)
+    elapsed = time.time() - started
+    print("seed %d, %d inputs, %d bytes" % (log.seed, log.count, len(log.to_bytes())))
+    print("score %d, death tick %s (%.3fs)" % (score, death_tick, elapsed))
+    if log.end_tick:
+        if (score, death_tick) == (log.score, log.end_tick):
+            print("matches the recording")
+        else:
+            print("MISMATCH: recorded score %d at tick %d" % (log.score, log.end_tick))
+            sys.exit(1)
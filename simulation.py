@@ -0,0 +1,1427 @@
+"""Headless simulation core for Subway Chaser.
+
+Everything in here is plain Python: no Processing, no Minim. The sketch in
+subway_chaser.py builds on top of Simulation and adds images, sound and
+drawing, while scripts can drive Simulation directly one tick at a time.
+Keep it Python 2.7 compatible so it still imports under Processing.py.
+"""
+
+import math
+import random
+import time
+from collections import deque
+
+from events import (EventBus, CoinCollected, PowerUpCollected, Died, LandedOnTrain,
+                    LaneChanged, Spawned, Despawned)
+from pools import Pool
+from prng import PortableRandom
+from profiler import Profiler
+from replay import InputLog, ReplayCursor
+from spatial import LaneIndex, AIR
+from timers import TimerWheel
+
+
+SCREEN_WIDTH = 1280
+SCREEN_HEIGHT = 720
+LANE_COUNT = 3
+
+PLAYER_X = 250
+
+# simulation runs at the sketch frame rate, one tick per frame
+TICKS_PER_SECOND = 60
+MS_PER_TICK = 1000.0 / TICKS_PER_SECOND
+
+TRACK_SCROLL_SPEED = 5
+# px/tick the track speeds up by every tick (0 keeps it constant), and its cap
+SCROLL_ACCELERATION = 0
+MAX_SCROLL_SPEED = 20
+
+INF = float("inf")
+
+OBSTACLE_TYPES = ["fence", "bush", "slide"]
+TRAIN_TYPES = ["train1", "train2", "train3"]
+
+# entity kinds as small ints: obj.kind is one of these, obj.type its name
+FENCE, BUSH, SLIDE, TRAIN1, TRAIN2, TRAIN3, COINROW, FLYING, DOUBLEJUMP = range(9)
+KIND_NAMES = tuple(OBSTACLE_TYPES + TRAIN_TYPES + ["coinrow", "flying", "doublejump"])
+KIND_CODES = dict((name, kind) for kind, name in enumerate(KIND_NAMES))
+# hitbox (w, h) of each kind, shared by all its entities; sprites are
+# scaled into them from where build_atlas.py put them in images/atlas.png
+KIND_SIZES = (
+    (107, 100), (94, 100), (136, 100),   # fence, bush, slide barrier
+    (276, 134), (275, 134), (314, 134),  # trains
+    None,                                # coin rows are as wide as their count
+    (57, 51), (43, 51),                  # flying, doublejump
+)
+
+# spawn planning, in world coordinates (pixels of track scrolled)
+# PLAN_CHUNK, BLOCK_DISTANCE, TRAIN_CHANCE and the attempt counts are
+# calibrated to the on-screen density of the old per-tick spawner: about 3.1
+# obstacles (1.0 of them trains) and 2.1 ground coin rows on screen
+PLAN_CHUNK = 1300                      # track planned at a time, max_obstacles per chunk
+ACTIVATION_X = SCREEN_WIDTH + 1000     # planned spawns go live once this close
+PLAN_START_X = SCREEN_WIDTH + 200      # nothing is planned nearer than this
+BLOCK_DISTANCE = 200                   # obstacles this close in two lanes block a third
+TRAIN_CHANCE = 0.5                     # trains need wider gaps, so more are proposed
+# trains run 1..MAX_TRAIN_EXTRA_SPEED px/tick through the world, against the track
+MAX_TRAIN_EXTRA_SPEED = 2
+POWERUP_CHANCE = 0.003                 # per tick once the cooldown has passed
+# tries per planned obstacle, coin row and power-up before it is given up
+OBSTACLE_ATTEMPTS = 16
+COINROW_ATTEMPTS = 3
+POWERUP_ATTEMPTS = 12
+
+# gaps is_space_free keeps between entities in one lane
+MIN_GAP = 200
+TRAIN_BUFFER = 800
+FAST_TRAIN_BUFFER = 600                # extra, for a faster train behind a slower one
+SLIDE_BUFFER = 350
+COIN_BUFFER = 100
+
+# widest gap is_space_free can ask for, so spawn checks only look this far around
+SPAWN_SEARCH_DISTANCE = TRAIN_BUFFER + FAST_TRAIN_BUFFER
+
+LANE_POSITIONS_Y_JACK = [
+    390,  # up
+    518,  # mid
+    635   # down
+]
+
+LANE_POSITIONS_Y = [
+    430,  # up
+    550,  # mid
+    665   # down
+]
+
+# Air lanes for flying powerup
+AIR_LANE_POSITIONS_Y = [
+    100,  # up
+    180,  # mid
+    260   # down
+]
+
+class AnimationConfig:
+    SPRITE_RUN1 = 0
+    SPRITE_RUN2 = 1
+    SPRITE_RUN3 = 2
+    SPRITE_RUN4 = 3
+    SPRITE_JUMP = 4
+    SPRITE_SLIDE = 5
+    SPRITE_FLY = 6
+
+    SLIDE_DURATION = 70
+    RUN_ANIMATION_FRAMES = [0, 1, 2, 3]  # cycle between run1 and run2
+    RUN_ANIMATION_SPEED = 11
+    CHARACTER_WIDTH = 60
+    CHARACTER_HEIGHT = 60
+
+class State:
+    IDLE = "IDLE"
+    RUNNING = "RUNNING"
+    JUMPING = "JUMPING"
+    SLIDING = "SLIDING"
+
+class Player(object):
+    __slots__ = ("game", "x", "y", "prev_y", "base_y", "target_lane", "current_lane",
+                 "velocity_x", "velocity_y", "JUMP_FORCE", "powerup_active", "powerup_timer",
+                 "is_moving", "on_train", "state", "current_sprite_index", "state_timer",
+                 "slide_timer", "animation_counter", "run_frame_index", "is_jumping",
+                 "is_on_ground", "is_sliding", "is_flying", "air_lane", "invincible",
+                 "invincible_timer")
+
+    NORMAL_JUMP_FORCE = -10
+    SUPER_JUMP_FORCE = -14
+    GRAVITY = 0.5
+    MAX_FALL_SPEED = 15
+
+    # Use animation config sizes as collider sizes to avoid mismatch
+    sprite_width = AnimationConfig.CHARACTER_WIDTH
+    sprite_height = AnimationConfig.CHARACTER_HEIGHT
+
+    def __init__(self, game):
+        # store game reference (important)
+        self.game = game
+
+        self.x = PLAYER_X
+        self.y = LANE_POSITIONS_Y_JACK[1]
+        self.prev_y = self.y  # y at the start of the last tick, for rendering
+        self.base_y = LANE_POSITIONS_Y_JACK[1]
+        self.target_lane = 1
+        self.current_lane = 1
+
+        self.velocity_x = 0
+        self.velocity_y = 0
+
+        self.JUMP_FORCE = self.NORMAL_JUMP_FORCE
+
+        self.powerup_active = False
+        # Timers on game.timers, None when not running
+        self.powerup_timer = None
+
+        self.is_moving = True
+        self.on_train = False
+
+        self.state = State.RUNNING
+        self.current_sprite_index = AnimationConfig.SPRITE_RUN1
+
+        self.state_timer = 0
+        self.slide_timer = None
+        self.animation_counter = 0
+        self.run_frame_index = 0
+
+        self.is_jumping = False
+        self.is_on_ground = True
+        self.is_sliding = False
+        self.is_flying = False
+        self.air_lane = 1  # track which air lane when flying
+
+        self.invincible = False
+        self.invincible_timer = None
+
+    def change_state(self, new_state):
+        if self.state == new_state:
+            return False
+
+        if new_state == State.JUMPING:
+            if self.state != State.RUNNING or (not self.is_on_ground and not self.on_train):
+                return False
+
+        if new_state == State.SLIDING:
+            if self.state != State.RUNNING:
+                return False
+
+        # reset flags for old states
+        if self.state == State.JUMPING:
+            self.is_jumping = False
+        elif self.state == State.SLIDING:
+            self.is_sliding = False
+            self.game.timers.cancel(self.slide_timer)
+            self.slide_timer = None
+
+        self.state = new_state
+        self.state_timer = 0
+
+        if new_state == State.IDLE:
+            self.current_sprite_index = AnimationConfig.SPRITE_IDLE
+        elif new_state == State.RUNNING:
+            self.current_sprite_index = AnimationConfig.SPRITE_RUN1
+            self.run_frame_index = 0
+        elif new_state == State.JUMPING:
+            self.current_sprite_index = AnimationConfig.SPRITE_JUMP
+            self.is_jumping = True
+            self.velocity_y = self.JUMP_FORCE
+            self.is_on_ground = False
+            self.on_train = False
+        elif new_state == State.SLIDING:
+            self.current_sprite_index = AnimationConfig.SPRITE_SLIDE
+            self.is_sliding = True
+            # inputs land before this tick's update, whose advance() is the first of the 70
+            self.slide_timer = self.game.timers.after(AnimationConfig.SLIDE_DURATION, self.end_slide)
+
+        return True
+
+    def jump(self):
+        if self.on_train:
+            # jump off train
+            # ensure base_y set to lane ground to allow normal jump physics
+            self.base_y = LANE_POSITIONS_Y_JACK[self.current_lane]
+
+        return self.change_state(State.JUMPING)
+
+    def slide(self):
+        return self.change_state(State.SLIDING)
+
+    def toggle_pause(self):
+        self.is_moving = not self.is_moving
+
+    def apply_gravity(self):
+        if self.is_on_ground:
+            self.velocity_y = 0
+        else:
+            self.velocity_y += self.GRAVITY
+            if self.velocity_y > self.MAX_FALL_SPEED:
+                self.velocity_y = self.MAX_FALL_SPEED
+
+        self.y += self.velocity_y
+
+        if self.y >= self.base_y:
+            self.y = self.base_y
+            self.velocity_y = 0
+            self.is_on_ground = True
+            if self.state == State.JUMPING:
+                self.change_state(State.RUNNING)
+
+    def start_powerup(self):
+        game = self.game
+        game.timers.cancel(self.powerup_timer)
+        self.powerup_active = True
+        # 8-15 seconds in milliseconds
+        duration = game.ticks_for_ms(game.rng.randint(8000, 15000))
+        self.powerup_timer = game.timers.after(duration, self.end_powerup)
+
+    # activate super jump
+    def super_jump(self):
+        self.JUMP_FORCE = self.SUPER_JUMP_FORCE
+        self.start_powerup()
+
+    def fly(self):
+        self.is_flying = True
+        self.start_powerup()
+
+        self.air_lane = 1  # start in middle air lane
+        self.current_sprite_index = AnimationConfig.SPRITE_FLY
+        # Move player to air lane position
+        self.y = AIR_LANE_POSITIONS_Y[self.air_lane]
+        self.base_y = AIR_LANE_POSITIONS_Y[self.air_lane]
+        self.is_on_ground = False
+
+    def _update_idle(self):
+        pass
+
+    def _update_running(self):
+            self.animation_counter += 1
+            if self.animation_counter >= AnimationConfig.RUN_ANIMATION_SPEED:
+                self.animation_counter = 0
+                self.run_frame_index = (self.run_frame_index + 1) % len(AnimationConfig.RUN_ANIMATION_FRAMES)
+                self.current_sprite_index = AnimationConfig.RUN_ANIMATION_FRAMES[self.run_frame_index]
+
+    def _update_jumping(self):
+        self.apply_gravity()
+        if self.state == State.JUMPING:
+            self.current_sprite_index = AnimationConfig.SPRITE_JUMP
+
+    def _update_sliding(self):
+        pass
+
+    def _update_flying(self):
+        self.current_sprite_index = AnimationConfig.SPRITE_FLY
+        target_y = AIR_LANE_POSITIONS_Y[self.air_lane]
+        distance = target_y - self.y
+
+        if abs(distance) > 2:
+            self.y += distance * 0.2  # smooth interpolation
+        else:
+            self.y = target_y
+            self.base_y = target_y
+
+    def end_powerup(self):
+        self.powerup_timer = None
+        self.powerup_active = False
+        self.JUMP_FORCE = self.NORMAL_JUMP_FORCE
+        # end flying if active
+        if self.is_flying:
+            self.is_flying = False
+            # Return to ground lane matching the air lane position
+            if self.current_lane != self.air_lane:
+                self.game.events.emit(LaneChanged, self.current_lane, self.air_lane)
+            self.current_lane = self.air_lane
+            self.target_lane = self.air_lane
+            self.base_y = LANE_POSITIONS_Y_JACK[self.air_lane]
+            self.y = self.base_y
+            self.is_on_ground = True
+            self.change_state(State.RUNNING)
+            # Brief invincibility after landing (3 seconds)
+            self.invincible = True
+            game = self.game
+            self.invincible_timer = game.timers.after(game.ticks_for_ms(3000), self.end_invincibility)
+
+    def end_invincibility(self):
+        self.invincible_timer = None
+        self.invincible = False
+
+    def end_slide(self):
+        self.slide_timer = None
+        # a flight holds the slide; landing ends it anyway
+        if not self.is_flying:
+            self.change_state(State.RUNNING)
+
+    def update(self):
+        self.prev_y = self.y
+        if not self.is_moving:
+            return
+
+        # If flying, handle air movement instead of normal states
+        if self.is_flying:
+            self._update_flying()
+            return
+
+        self.state_timer += 1
+
+        # If on_train
+        if self.on_train:
+            self.y = self.base_y
+            self.is_on_ground = True
+            self.velocity_y = 0
+
+        if self.state == State.IDLE:
+            self._update_idle()
+        elif self.state == State.RUNNING:
+            self._update_running()
+        elif self.state == State.JUMPING:
+            self._update_jumping()
+        elif self.state == State.SLIDING:
+            self._update_sliding()
+
+        if self.is_moving:
+            self._update_lane_movement()
+
+    def _update_lane_movement(self):
+        # If on train, SKIP the logic that pulls us to the ground lane
+        if self.on_train:
+            # Check if we ran off the end of the train
+            if getattr(self.game, "last_train", None) is not None:
+                train = self.game.last_train
+                px = self.x
+                buffer = 20
+
+                # If player X is outside train width
+                train_x = train.x - self.game.distance
+                if px < train_x - buffer or px > train_x + train.w + buffer:
+                    self.on_train = False
+                    # Reset floor to real ground so we fall
+                    self.base_y = LANE_POSITIONS_Y_JACK[self.current_lane]
+            return
+
+        # Normal lane switching logic (only runs if NOT on train)
+        target_y = LANE_POSITIONS_Y_JACK[self.target_lane]
+        distance = target_y - self.base_y
+
+        if abs(distance) > 2:
+            self.velocity_x = distance * 0.3
+            self.base_y += self.velocity_x
+        else:
+            self.base_y = target_y
+            self.velocity_x = 0
+            if self.current_lane != self.target_lane:
+                self.game.events.emit(LaneChanged, self.current_lane, self.target_lane)
+            self.current_lane = self.target_lane
+
+        if self.is_on_ground:
+            self.y = self.base_y
+
+    def switch_lane(self, direction):
+        if not self.is_moving:
+            return
+
+        # If flying, switch air lanes instead
+        if self.is_flying:
+            old_lane = self.air_lane
+            if direction == "up" and self.air_lane > 0:
+                self.air_lane -= 1
+            elif direction == "down" and self.air_lane < LANE_COUNT - 1:
+                self.air_lane += 1
+            if self.air_lane != old_lane:
+                self.game.events.emit(LaneChanged, old_lane, self.air_lane, True)
+            return
+
+        if direction == "up" and self.target_lane > 0:
+            self.target_lane -= 1
+        elif direction == "down" and self.target_lane < LANE_COUNT - 1:
+            self.target_lane += 1
+
+class Entity(object):
+    """Base of the pooled entity records.
+
+    Entities are slotted (no per-instance __dict__) and carry an int `kind`
+    from KIND_NAMES; `type` is its name, for code outside the hot paths.
+    """
+
+    __slots__ = ()
+
+    @property
+    def type(self):
+        return KIND_NAMES[self.kind]
+
+
+class Obstacle(Entity):
+    __slots__ = ("x", "num", "kind", "w", "h", "lane", "y", "slot")
+
+    # px/tick through the world; the track scroll comes on top
+    speed = 0
+
+    def __init__(self, x, num, lane):
+        self.reinit(x, num, lane)
+
+    def reinit(self, x, num, lane):
+        self.x = x
+        self.num = num
+        self.kind = FENCE + num
+        self.w, self.h = KIND_SIZES[self.kind]
+        self.lane = lane
+        self.y = LANE_POSITIONS_Y[self.lane] - self.h
+        self.slot = None
+
+    def offscreen(self, camera):
+        return self.x + self.w - camera <= 0
+
+class Train(Entity):
+    """An obstacle that moves `speed` px/tick left through the world.
+
+    Nothing moves it tick by tick: once put on a moving LaneIndex its x is
+    worked out from where it was put down and how far the index has
+    travelled since, the same way the index keys it.
+    """
+
+    __slots__ = ("x0", "t0", "track", "num", "kind", "w", "h", "lane", "y", "speed", "slot")
+
+    def __init__(self, x, num, lane, speed):
+        self.reinit(x, num, lane, speed)
+
+    def reinit(self, x, num, lane, speed):
+        self.x0 = x
+        self.t0 = 0
+        self.track = None
+        self.num = num
+        self.kind = TRAIN1 + num
+        self.w, self.h = KIND_SIZES[self.kind]
+
+        self.lane = lane
+        self.y = LANE_POSITIONS_Y[self.lane] - self.h
+
+        self.speed = speed
+        self.slot = None
+
+    @property
+    def x(self):
+        track = self.track
+        if track is None:
+            return self.x0
+        return self.x0 - self.speed * (track.travel - self.t0)
+
+    def put_on(self, track):
+        """Start moving from x as track (a moving LaneIndex) advances."""
+        self.x0 = self.x
+        self.t0 = track.travel
+        self.track = track
+
+    def take_off(self):
+        """Stop moving, where it is now."""
+        self.x0 = self.x
+        self.track = None
+
+    def offscreen(self, camera):
+        return self.x + self.w - camera <= 0
+
+class CoinRow(Entity):
+    """A row of evenly spaced coins, stored as origin x, count and a bitmask.
+
+    Bit i of `collected` is set once coin i (at x + i * space) is picked up,
+    so pickup and drawing never need per-coin objects.
+    """
+
+    __slots__ = ("x", "lane", "count", "w", "collected", "full_mask", "remaining", "is_air", "y",
+                 "slot")
+
+    coin_w = 30
+    space = 50
+    h = 30
+    kind = COINROW
+    speed = 0
+
+    def __init__(self, x, lane, count, is_air=False):
+        self.reinit(x, lane, count, is_air)
+
+    def reinit(self, x, lane, count, is_air=False):
+        self.x = x
+        self.lane = lane
+        self.count = count
+        self.w = CoinRow.width(count)
+
+        self.collected = 0
+        self.full_mask = (1 << self.count) - 1
+        self.remaining = self.count
+
+        self.is_air = is_air
+        self.y = CoinRow.row_y(lane, is_air)
+        self.slot = None
+
+    @staticmethod
+    def width(count):
+        return (count * CoinRow.coin_w) + (CoinRow.space * (count - 1))
+
+    @staticmethod
+    def row_y(lane, is_air):
+        if is_air:
+            return AIR_LANE_POSITIONS_Y[lane] - CoinRow.h
+        return LANE_POSITIONS_Y[lane] - CoinRow.h
+
+    def coin_x(self, i):
+        return self.x + i * self.space
+
+    def is_collected(self, i):
+        return (self.collected >> i) & 1
+
+    def collect_span(self, left, right):
+        """Collect the coins whose [x, x + coin_w) overlaps (left, right).
+
+        Returns how many new coins were picked up.
+        """
+        # coin i overlaps when x + i*space + coin_w > left and x + i*space < right
+        first = int((left - self.coin_w - self.x) // self.space) + 1
+        last = -int((self.x - right) // self.space) - 1
+        if first < 0:
+            first = 0
+        if last > self.count - 1:
+            last = self.count - 1
+
+        picked = 0
+        for i in range(first, last + 1):
+            bit = 1 << i
+            if not self.collected & bit:
+                self.collected |= bit
+                picked += 1
+        self.remaining -= picked
+        return picked
+
+    def offscreen(self, camera):
+        # last coin still on the track
+        last = (self.full_mask & ~self.collected).bit_length() - 1
+        return self.coin_x(last) + self.coin_w - camera < 0
+
+
+# CLASS POWER UPS: initializing and updating work for all powerups
+class PowerUP(Entity):
+    __slots__ = ("x", "lane", "kind", "w", "h", "y", "slot")
+
+    speed = 0
+
+    def __init__(self, x, lane, kind):
+        self.reinit(x, lane, kind)
+
+    def reinit(self, x, lane, kind):
+        self.x = x
+        self.lane = lane
+        self.kind = kind
+        self.w, self.h = KIND_SIZES[kind]
+        self.y = LANE_POSITIONS_Y[lane] - self.h
+        self.slot = None
+
+    def offscreen(self, camera):
+        return self.x + self.w - camera < 0
+
+
+class SpawnCandidate(Entity):
+    """Spawn record checked with is_space_free before anything is built.
+
+    Spawners fill a scratch candidate, and only one that passes every check
+    is copied into the plan and later turned into a pooled entity, so
+    rejected attempts cost no allocation at all. `param` is the sprite
+    number for obstacles and trains and the coin count for coin rows.
+    """
+
+    __slots__ = ("x", "lane", "y", "w", "h", "kind", "speed", "is_air", "param")
+
+    def __init__(self):
+        self.set(0, 0, 0, 0, 0, FENCE, 0)
+
+    def set(self, x, lane, y, w, h, kind, speed, is_air=False, param=None):
+        self.x = x
+        self.lane = lane
+        self.y = y
+        self.w = w
+        self.h = h
+        self.kind = kind
+        self.speed = speed
+        self.is_air = is_air
+        self.param = param
+        return self
+
+    def copy(self):
+        return SpawnCandidate().set(self.x, self.lane, self.y, self.w, self.h, self.kind,
+                                    self.speed, self.is_air, self.param)
+
+
+class SpawnPlanner:
+    """Lazily plans upcoming spawns as a timeline in world coordinates.
+
+    next_entry() (or the timeline() iterator) returns SpawnCandidates
+    sorted by world x, planning one PLAN_CHUNK of track at a time and only
+    when the game asks for more. Every entry already satisfies the
+    is_space_free gap rules and the two-blocked-lanes rule against the
+    rest of the plan, so the game just activates entries as they cross
+    ACTIVATION_X. All of the planner's state is plain attributes, so a
+    snapshot can capture and restore it.
+    """
+
+    def __init__(self, game, rng, start_x=None):
+        if start_x is None:
+            start_x = PLAN_START_X
+        self.game = game
+        self.rng = rng
+        self.start_x = start_x
+        self.scratch = SpawnCandidate()
+        # planned entries still close enough to constrain new ones
+        self.planned = LaneIndex(LANE_COUNT)
+        self.recent = deque()
+        # power-ups are planned as if POWERUP_CHANCE was rolled every tick;
+        # the game drops those that come up during its cooldown
+        self.next_powerup_x = start_x + self.powerup_delay()
+        # start of the next chunk to plan, planned entries waiting to be
+        # handed out, and power-ups planned past the current chunk
+        self.horizon = start_x
+        self.queue = deque()
+        self.carried = []
+
+        self.attempts = 0
+        self.rejections = 0
+
+    def stats(self):
+        return {"attempts": self.attempts, "rejections": self.rejections}
+
+    def powerup_delay(self):
+        # POWERUP_CHANCE rolled every tick, as a distance of track
+        ticks = int(math.log(1.0 - self.rng.random()) / math.log(1.0 - POWERUP_CHANCE))
+        # whole pixels even once the scroll speed is fractional, for randint()
+        return int(ticks * self.game.track_scroll_speed)
+
+    def timeline(self):
+        while True:
+            yield self.next_entry()
+
+    def next_entry(self):
+        while not self.queue:
+            self.plan_chunk()
+        return self.queue.popleft()
+
+    def plan_chunk(self):
+        horizon = self.horizon
+        end = horizon + PLAN_CHUNK
+        # entries from before the previous chunk no longer constrain anything
+        self.forget(horizon - SPAWN_SEARCH_DISTANCE - PLAN_CHUNK)
+        batch = [entry for entry in self.carried if entry.x < end]
+        carried = [entry for entry in self.carried if entry.x >= end]
+
+        # obstacles and coin rows take turns, as they did when each had a
+        # per-tick spawn, so neither crowds the other out of the chunk
+        game = self.game
+        for i in range(max(game.max_obstacles, game.max_coin_rows)):
+            if i < game.max_obstacles:
+                self.plan(self.plan_obstacle, horizon, end, OBSTACLE_ATTEMPTS, batch)
+            if i < game.max_coin_rows:
+                self.plan(self.plan_coinrow, horizon, end, COINROW_ATTEMPTS, batch)
+        while self.next_powerup_x < end:
+            x = self.next_powerup_x
+            entry = self.plan(self.plan_powerup, x, x + 600, POWERUP_ATTEMPTS, carried)
+            if entry is not None:
+                self.next_powerup_x = entry.x + self.powerup_delay()
+            else:
+                self.next_powerup_x = x + self.powerup_delay() + 1
+        batch.extend(entry for entry in carried if entry.x < end)
+        self.carried = [entry for entry in carried if entry.x >= end]
+
+        batch.sort(key=lambda entry: entry.x)
+        self.queue.extend(batch)
+        self.horizon = end
+
+    def plan(self, propose, lo, hi, attempts, batch):
+        for _ in range(attempts):
+            self.attempts += 1
+            entry = propose(lo, hi)
+            if entry is not None:
+                entry = entry.copy()
+                self.planned.add(entry)
+                self.recent.append(entry)
+                batch.append(entry)
+                return entry
+            self.rejections += 1
+        return None
+
+    def forget(self, before_x):
+        while self.recent and self.recent[0].x + self.recent[0].w < before_x:
+            self.planned.remove(self.recent.popleft())
+
+    def nearby(self, entry):
+        return self.planned.neighbours(entry.lane, entry.x, entry.x + entry.w, SPAWN_SEARCH_DISTANCE)
+
+    def blocked_lanes(self, entry):
+        blocked = 0
+        for lane in range(LANE_COUNT):
+            for other in self.planned.neighbours(lane, entry.x, entry.x + entry.w, BLOCK_DISTANCE):
+                if other.kind <= TRAIN3:
+                    blocked += 1
+                    break
+        return blocked
+
+    def plan_obstacle(self, lo, hi):
+        rng = self.rng
+        game = self.game
+        x = rng.randint(lo, hi - 1)
+        is_train = rng.random() < TRAIN_CHANCE
+        num = rng.randint(0, 2)
+        lane = rng.randint(0, LANE_COUNT - 1)
+        if is_train:
+            kind = TRAIN1 + num
+            speed = rng.randint(1, MAX_TRAIN_EXTRA_SPEED)
+        else:
+            kind = FENCE + num
+            speed = 0
+        w, h = KIND_SIZES[kind]
+        entry = self.scratch.set(x, lane, LANE_POSITIONS_Y[lane] - h, w, h, kind, speed, param=num)
+
+        # always leave the player a free lane
+        if self.blocked_lanes(entry) >= 2:
+            return None
+        if not game.is_space_free(entry, self.nearby(entry)):
+            return None
+        return entry
+
+    def plan_coinrow(self, lo, hi):
+        rng = self.rng
+        lane = rng.randint(0, LANE_COUNT - 1)
+        x = rng.randint(lo, hi - 1)
+        count = rng.randint(4, 10)
+        entry = self.scratch.set(x, lane, CoinRow.row_y(lane, False), CoinRow.width(count),
+                                 CoinRow.h, COINROW, 0, param=count)
+        if not self.game.is_space_free(entry, self.nearby(entry), is_coin_check=True):
+            return None
+        return entry
+
+    def plan_powerup(self, lo, hi):
+        rng = self.rng
+        lane = rng.randint(0, LANE_COUNT - 1)
+        x = rng.randint(lo, hi - 1)
+        kind = rng.choice((DOUBLEJUMP, FLYING))
+        w, h = KIND_SIZES[kind]
+        entry = self.scratch.set(x, lane, LANE_POSITIONS_Y[lane] - h, w, h, kind, 0)
+        if not self.game.is_space_free(entry, self.nearby(entry)):
+            return None
+        return entry
+
+
+def sweep_interval(a0, a1, b0, b1, v):
+    """Times t where [a0, a1] - v * (1 - t) strictly overlaps [b0, b1].
+
+    The moving span ends the tick at [a0, a1] after travelling v. Returns
+    (t_in, t_out), empty when t_in >= t_out; unbounded without motion.
+    """
+    if v == 0:
+        if a0 < b1 and a1 > b0:
+            return -INF, INF
+        return INF, -INF
+    t0 = (b0 - a1) / float(v) + 1
+    t1 = (b1 - a0) / float(v) + 1
+    if v > 0:
+        return t0, t1
+    return t1, t0
+
+
+def add_live(items, obj):
+    """Append obj to one of the live entity lists, noting its slot there."""
+    obj.slot = len(items)
+    items.append(obj)
+
+
+def remove_live(items, obj):
+    """Take obj out of items in O(1): the last entity moves into its slot.
+
+    Returns whether obj was in items. List order is not kept, only made
+    the same by the same adds and removes, which is all a replay needs.
+    """
+    i = obj.slot
+    if i is None or i >= len(items) or items[i] is not obj:
+        return False
+    last = items.pop()
+    if last is not obj:
+        items[i] = last
+        last.slot = i
+    obj.slot = None
+    return True
+
+
+class Simulation:
+    """Game rules without rendering or audio, advanced one tick per update().
+
+    Time is the tick counter, so headless runs are independent of
+    wall-clock speed: gameplay timers live on `timers`, a TimerWheel
+    update() advances once per tick.
+
+    Entities live in world coordinates: `distance` is the world x of the
+    left screen edge and the only thing the track scroll advances, so an
+    entity's screen x is obj.x - distance and its `speed` is what it moves
+    through the world by itself (trains only).
+    """
+
+    def __init__(self, seed=None):
+        # seeds every run; None draws a fresh seed per run (kept in run_seed)
+        self.seed = seed
+
+        # entity caps
+        self.max_obstacles = 6
+        self.max_coin_rows = 3
+        self.max_air_coin_rows = 3
+
+        self.powerup_cooldown = 20000  # 20 seconds cooldown between power-ups
+
+        # despawned entities come back through these
+        self.obstacle_pool = Pool(Obstacle)
+        self.train_pool = Pool(Train)
+        self.coinrow_pool = Pool(CoinRow)
+        self.powerup_pool = Pool(PowerUP)
+        self.candidate = SpawnCandidate()
+
+        # disabled until someone switches it on, see profiler.py
+        self.profiler = Profiler()
+        # side effects (sound, rendering, telemetry) subscribe here and
+        # survive restarts, see events.py
+        self.events = EventBus()
+
+        self.reset()
+
+    def reset(self, run_seed=None):
+        """Start a new run; only gameplay state is touched.
+
+        All randomness of a run comes from self.rng, seeded with run_seed
+        (or the fixed seed, or a fresh one), so the seed plus the input log
+        reproduces the run exactly, on Jython as on CPython (see prng.py).
+        """
+        # hand the previous run's entities back to the pools
+        for obj in getattr(self, "OBSTACLES", ()):
+            self.pool_for(obj).release(obj)
+        for row in getattr(self, "COIN_ROWS", ()):
+            self.coinrow_pool.release(row)
+        for pu in getattr(self, "POWER_UPS", ()):
+            self.powerup_pool.release(pu)
+
+        self.tick = 0
+        self.death_tick = None
+
+        self.game_over = False
+        self.score = 0
+
+        self.track_scroll_speed = TRACK_SCROLL_SPEED
+        self.scroll_acceleration = SCROLL_ACCELERATION
+        self.max_scroll_speed = MAX_SCROLL_SPEED
+        # world coordinate of the left screen edge
+        self.distance = 0
+
+        # every timer of the run, advanced once per tick in update()
+        self.timers = TimerWheel()
+        self.player = Player(self)
+
+        # live entities, each knowing its `slot` in its list (see add_live)
+        self.OBSTACLES = []
+        self.COIN_ROWS = []
+        self.POWER_UPS = []
+        self.taken_lanes = set()
+
+        # per-lane lookups for spawn and collision checks, kept next to the lists
+        # trains move in it, see advance() in update()
+        self.obstacle_index = LaneIndex(LANE_COUNT, moving=True)
+        self.coin_index = LaneIndex(LANE_COUNT)
+        self.powerup_index = LaneIndex(LANE_COUNT)
+
+        self.last_train = None
+        self.powerups_count = 0
+
+        # no power-up spawns until the cooldown from the start, the last
+        # spawn or the last collection is over
+        self.powerup_cooldown_timer = None
+        self.start_powerup_cooldown()
+
+        if run_seed is None:
+            run_seed = self.seed if self.seed is not None else random.getrandbits(32)
+        self.run_seed = run_seed
+        self.rng = PortableRandom(run_seed)
+        # inputs queued by input() for the next tick, and every one applied so far
+        self.pending_inputs = []
+        self.input_log = InputLog(run_seed)
+        # a ReplayCursor while start_replay() drives the run instead of input()
+        self.replay = None
+
+        self.planner = SpawnPlanner(self, PortableRandom(self.rng.getrandbits(32)))
+        self.spawn_plan = self.planner.timeline()
+        self.next_spawn = next(self.spawn_plan)
+
+    def pool_for(self, obj):
+        if isinstance(obj, Train):
+            return self.train_pool
+        return self.obstacle_pool
+
+    def pool_stats(self):
+        return {
+            "obstacle": self.obstacle_pool.stats(),
+            "train": self.train_pool.stats(),
+            "coinrow": self.coinrow_pool.stats(),
+            "powerup": self.powerup_pool.stats(),
+        }
+
+    def add_obstacle(self, obj):
+        add_live(self.OBSTACLES, obj)
+        if obj.speed:
+            obj.put_on(self.obstacle_index)
+        self.obstacle_index.add(obj)
+        self.events.emit(Spawned, obj)
+
+    def add_coinrow(self, row):
+        add_live(self.COIN_ROWS, row)
+        self.coin_index.add(row)
+        self.events.emit(Spawned, row)
+
+    def add_powerup(self, pu):
+        add_live(self.POWER_UPS, pu)
+        self.powerup_index.add(pu)
+        self.events.emit(Spawned, pu)
+
+    def despawn_obstacle(self, obj):
+        if obj.lane in self.taken_lanes:
+            self.taken_lanes.remove(obj.lane)
+        if remove_live(self.OBSTACLES, obj):
+            self.obstacle_index.remove(obj)
+            if obj.speed:
+                obj.take_off()
+            self.events.emit(Despawned, obj)
+            # the player may still hold the last train it rode; leave that
+            # one alone rather than let it be reused underneath
+            if obj is not self.last_train:
+                self.pool_for(obj).release(obj)
+
+    def despawn_coinrow(self, row, free_lane=True):
+        if free_lane and row.lane in self.taken_lanes:
+            self.taken_lanes.remove(row.lane)
+        if remove_live(self.COIN_ROWS, row):
+            self.coin_index.remove(row)
+            self.events.emit(Despawned, row)
+            self.coinrow_pool.release(row)
+
+    def despawn_powerup(self, pu):
+        if remove_live(self.POWER_UPS, pu):
+            self.powerup_index.remove(pu)
+            self.events.emit(Despawned, pu)
+            self.powerup_pool.release(pu)
+
+    def ticks_for_ms(self, ms):
+        """Timer ticks from now until the tick clock has moved on by ms.
+
+        That is the first tick on which int(tick * MS_PER_TICK) is ms past
+        its value now, so timers agree with the ms deadlines the vectorized
+        envs keep.
+        """
+        end = int(self.tick * MS_PER_TICK) + ms
+        ticks = max(1, int(math.ceil(ms / MS_PER_TICK)))
+        while ticks > 1 and int((self.tick + ticks - 1) * MS_PER_TICK) >= end:
+            ticks -= 1
+        while int((self.tick + ticks) * MS_PER_TICK) < end:
+            ticks += 1
+        return ticks
+
+    def start_powerup_cooldown(self):
+        self.powerup_ready = False
+        self.timers.cancel(self.powerup_cooldown_timer)
+        self.powerup_cooldown_timer = self.timers.after(self.ticks_for_ms(self.powerup_cooldown),
+                                                        self.end_powerup_cooldown)
+
+    def end_powerup_cooldown(self):
+        self.powerup_cooldown_timer = None
+        self.powerup_ready = True
+
+    def player_span(self):
+        # horizontal hitbox used by check_player
+        padding = 15
+        return (self.player.x - self.player.sprite_width/2 + padding,
+                self.player.x + self.player.sprite_width/2 - padding)
+
+    def player_lanes(self):
+        if self.player.current_lane == self.player.target_lane:
+            return (self.player.current_lane,)
+        return (self.player.current_lane, self.player.target_lane)
+
+    def nearby(self, index, obj, layer=None):
+        return index.neighbours(obj.lane, obj.x, obj.x + obj.w, SPAWN_SEARCH_DISTANCE, layer)
+
+    def check_player(self, obj):
+        p = self.player
+        kind = obj.kind
+        is_coin = kind == COINROW
+        # Invincible: skip obstacles but still collect coins
+        if p.invincible and not is_coin:
+            return False
+
+        if p.is_flying:
+            # flying - collect air coins in matching air lane
+            if not (is_coin and obj.is_air and obj.lane == p.air_lane):
+                return False
+        else:
+            if obj.lane != p.current_lane and obj.lane != p.target_lane:
+                return False
+
+        # coins: collect, but not lethal; power-ups: collect and use
+        if is_coin or kind >= FLYING:
+            return self.contact_time(obj) is not None
+
+        # trains:
+        if TRAIN1 <= kind <= TRAIN3:
+            p_left, p_right, p_top, p_bottom = self.player_box()
+            feet = p_bottom
+            prev_feet = feet - (p.y - p.prev_y)
+            train_top = obj.y
+
+            # 1. Check if we are jumping OUT of the train
+            # If colliding but moving UP, we are jumping off. Safe.
+            is_touching = self.contact_time(obj) is not None
+
+            if is_touching and p.velocity_y < 0:
+                return False
+
+            # 2. Check Landing
+            # the train was screen_speed further right when the tick started
+            ox = obj.x - self.distance
+            horizontally_over = (p_right > ox and p_left < ox + self.screen_speed(obj) + obj.w)
+            falling_down = p.velocity_y >= 0
+            # Allow feet to be slightly below top (tolerance), or to have
+            # fallen past the top during the tick however fast they fell
+            # (a lane switch moves y too, but that is running into the side)
+            within_landing = (feet >= train_top - 5 and feet <= train_top + 5)
+            crossed_top = p.velocity_y > 0 and prev_feet <= train_top <= feet
+
+            if horizontally_over and falling_down and (within_landing or crossed_top):
+                if not p.on_train or self.last_train is not obj:
+                    self.events.emit(LandedOnTrain, obj)
+                p.on_train = True
+                p.is_on_ground = True
+                p.velocity_y = 0
+
+                # --- VISUAL FIX ---
+                # Lift base_y by half height (30px) so feet sit ON top, not waist.
+                p.base_y = train_top - 30
+                p.y = p.base_y
+
+                self.last_train = obj
+                return False
+
+            # If we are already riding this train, ignore collision
+            if p.on_train:
+                return False
+
+        # --- GENERAL COLLISION (Death) ---
+        if self.contact_time(obj) is None:
+            return False
+
+        # Avoidance logic
+        if kind == FENCE or kind == BUSH:
+            if p.is_jumping and not p.is_on_ground:
+                return False
+
+        if kind == SLIDE:
+            if p.is_sliding:
+                return False
+
+        return True
+
+    def screen_speed(self, obj):
+        # px/tick obj moves left on screen
+        return self.track_scroll_speed + obj.speed
+
+    def player_box(self):
+        padding = 15
+        p = self.player
+        return (p.x - p.sprite_width/2 + padding,
+                p.x + p.sprite_width/2 - padding,
+                p.y - p.sprite_height/2 + padding,
+                p.y + p.sprite_height/2 - padding)
+
+    def contact_time(self, obj):
+        """When in this tick the player's box first overlaps obj, or None.
+
+        Swept test over the whole tick: when it started obj was
+        screen_speed(obj) further right and the player at prev_y. Returns a time in [0, 1],
+        0 for contact carried over from the previous tick; a contact that
+        began and ended inside the tick (tunnelling at high speed) is
+        still found. Overlap that ended before the tick's end and was
+        already there at its start was judged last tick and is ignored.
+        """
+        p_left, p_right, p_top, p_bottom = self.player_box()
+        # relative to obj the player moves screen_speed(obj) right and dy down
+        ox = obj.x - self.distance
+        x_in, x_out = sweep_interval(p_left, p_right, ox, ox + obj.w, self.screen_speed(obj))
+        if x_in >= x_out:
+            return None
+        dy = self.player.y - self.player.prev_y
+        y_in, y_out = sweep_interval(p_top, p_bottom, obj.y, obj.y + obj.h, dy)
+        t_in = max(x_in, y_in)
+        t_out = min(x_out, y_out)
+        if t_in >= t_out or t_in >= 1 or t_out <= 0:
+            return None
+        if t_in <= 0 and t_out <= 1:
+            return None
+        return max(t_in, 0.0)
+
+    def check_collision(self, rect1, rect2):
+        return (rect1.x < rect2.x + rect2.w and
+                rect1.x + rect1.w > rect2.x and
+                rect1.y < rect2.y + rect2.h and
+                rect1.y + rect1.h > rect2.y)
+
+    def is_space_free(self, new_obj, other_list, is_coin_check=False):
+        new_kind = new_obj.kind
+        new_train = TRAIN1 <= new_kind <= TRAIN3
+        for other in other_list:
+            if new_obj.lane != other.lane:
+                continue
+
+            # collision check
+            if self.check_collision(new_obj, other):
+                return False
+
+            if new_obj.x < other.x:
+                left, right = new_obj, other
+            else:
+                left, right = other, new_obj
+
+            distance = right.x - (left.x + left.w)
+
+            required_gap = MIN_GAP
+
+            kind = other.kind
+            if is_coin_check or kind == COINROW or new_kind == COINROW:
+                required_gap = COIN_BUFFER
+            elif new_train or TRAIN1 <= kind <= TRAIN3:
+                required_gap = TRAIN_BUFFER
+                if left.speed > right.speed:
+                    required_gap += FAST_TRAIN_BUFFER
+            elif new_kind == SLIDE and kind == SLIDE:
+                required_gap = SLIDE_BUFFER
+
+            if distance < required_gap:
+                return False
+
+        return True
+
+    def activate_spawns(self):
+        """Bring planned spawns to life as they cross ACTIVATION_X."""
+        entry = self.next_spawn
+        while entry.x - self.distance <= ACTIVATION_X:
+            x = entry.x
+            kind = entry.kind
+            if TRAIN1 <= kind <= TRAIN3:
+                new_obj = self.train_pool.acquire(x, entry.param, entry.lane, entry.speed)
+                self.add_obstacle(new_obj)
+                self.taken_lanes.add(new_obj.lane)
+            elif kind <= SLIDE:
+                new_obj = self.obstacle_pool.acquire(x, entry.param, entry.lane)
+                self.add_obstacle(new_obj)
+                self.taken_lanes.add(new_obj.lane)
+            elif kind == COINROW:
+                new_row = self.coinrow_pool.acquire(x, entry.lane, entry.param)
+                self.add_coinrow(new_row)
+                self.taken_lanes.add(new_row.lane)
+            elif self.powerup_ready:
+                # power-ups planned while the cooldown runs are dropped
+                new_pu = self.powerup_pool.acquire(x, entry.lane, kind)
+                self.add_powerup(new_pu)
+                self.start_powerup_cooldown()
+            entry = self.next_spawn = next(self.spawn_plan)
+
+    def coinrow_candidate(self, start_x, lane, count, is_air=False):
+        return self.candidate.set(start_x, lane, CoinRow.row_y(lane, is_air), CoinRow.width(count),
+                                  CoinRow.h, COINROW, 0, is_air)
+
+    def spawn_air_coinrow(self):
+        """Spawn coin rows in air lanes while flying"""
+        if not self.player.is_flying:
+            return
+        attempts = 4
+        for _ in range(attempts):
+            lane = self.rng.randint(0, LANE_COUNT - 1)
+            start_x = self.distance + self.rng.randint(SCREEN_WIDTH + 100, SCREEN_WIDTH + 500)
+            count = self.rng.randint(4, 10)
+
+            new_row = self.coinrow_candidate(start_x, lane, count, is_air=True)
+
+            # Check against other air coins only (ground coins are far below)
+            air_rows = self.nearby(self.coin_index, new_row, AIR)
+            if not self.is_space_free(new_row, air_rows, is_coin_check=True):
+                continue
+
+            self.add_coinrow(self.coinrow_pool.acquire(start_x, lane, count, True))
+            return
+
+    def input(self, action):
+        """Queue a player action ('up', 'down', 'jump', 'slide') for the next tick."""
+        if self.replay is None:
+            self.pending_inputs.append(action)
+
+    def start_replay(self, log):
+        """Restart with log's seed and feed it its recorded inputs."""
+        self.reset(log.seed)
+        self.replay = ReplayCursor(log)
+
+    def apply_input(self, action):
+        self.input_log.record(self.tick, action)
+        if action == 'jump':
+            self.player.jump()
+        elif action == 'slide':
+            self.player.slide()
+        else:
+            self.player.switch_lane(action)
+
+    def update(self):
+        prof = self.profiler
+        self.tick += 1
+
+        prof.begin("sim.player")
+        # inputs land at the start of a tick, so the log replays exactly
+        if self.replay is not None:
+            actions = self.replay.actions_for(self.tick)
+        else:
+            actions = self.pending_inputs
+            self.pending_inputs = []
+        for action in actions:
+            self.apply_input(action)
+
+        # the tick's timers (power-up, invincibility, slide, cooldown) come
+        # due after its inputs and before the player moves
+        self.timers.advance()
+        self.player.update()
+        prof.end("sim.player")
+
+        prof.begin("sim.collide")
+        p_left, p_right = self.player_span()
+        lanes = self.player_lanes()
+        # the player's span in world coordinates, for the index queries
+        camera = self.distance
+        w_left = p_left + camera
+        w_right = p_right + camera
+
+        # obstacles the player touched this tick, handled in time-of-impact
+        # order so an earlier train landing covers a later hit (nothing can
+        # hit a flying or invincible player)
+        if not self.player.is_flying and not self.player.invincible:
+            sweep = self.track_scroll_speed + MAX_TRAIN_EXTRA_SPEED
+            contacts = []
+            for lane in lanes:
+                for obs in self.obstacle_index.overlapping(lane, w_left - sweep, w_right):
+                    toi = self.contact_time(obs)
+                    if toi is not None:
+                        contacts.append((toi, obs.x, obs))
+            contacts.sort(key=lambda contact: contact[:2])
+            for toi, _, obs in contacts:
+                if self.check_player(obs):
+                    self.game_over = True
+                    self.death_tick = self.tick
+                    self.events.emit(Died, obs, self.tick)
+                    break
+
+        # coins collection, over the span the player swept past this tick
+        sweep = self.track_scroll_speed
+        if self.player.is_flying:
+            rows = self.coin_index.overlapping(self.player.air_lane, w_left - sweep, w_right, AIR)
+        else:
+            rows = []
+            for lane in lanes:
+                rows.extend(self.coin_index.overlapping(lane, w_left - sweep, w_right))
+        for cr in rows:
+            # one bounding-box test per row, then work out the coin indices
+            if cr.remaining and self.check_player(cr):
+                picked = cr.collect_span(w_left - sweep, w_right)
+                if picked:
+                    self.score += picked
+                    self.events.emit(CoinCollected, cr, picked)
+                    if not cr.remaining:
+                        self.despawn_coinrow(cr)
+
+        # power-ups collection, skipped if a power-up is already active
+        # (off-screen ones are dropped by retire_offscreen)
+        if not self.player.powerup_active and not self.player.is_flying:
+            for lane in lanes:
+                collected = None
+                for pu in self.powerup_index.overlapping(lane, w_left - sweep, w_right):
+                    if self.check_player(pu):
+                        collected = pu
+                        break
+                if collected is not None:
+                    pu = collected
+                    self.events.emit(PowerUpCollected, pu)
+                    self.start_powerup_cooldown()
+                    if pu.kind == DOUBLEJUMP:
+                        self.player.super_jump()
+                    elif pu.kind == FLYING:
+                        self.player.fly()
+                    self.despawn_powerup(pu)
+                    break
+        prof.end("sim.collide")
+
+        # planned obstacles, coin rows and power-ups that came into range
+        prof.begin("sim.spawn")
+        self.activate_spawns()
+        prof.end("sim.spawn")
+
+        # the world scrolls by moving the camera; only trains move themselves
+        prof.begin("sim.entities")
+        # trains drive through the world, their x follows the index's travel
+        self.obstacle_index.advance()
+        self.distance += self.track_scroll_speed
+        self.retire_offscreen()
+        if self.scroll_acceleration:
+            self.track_scroll_speed = min(self.track_scroll_speed + self.scroll_acceleration,
+                                          self.max_scroll_speed)
+        prof.end("sim.entities")
+
+        # spawn air coins while flying
+        prof.begin("sim.spawn")
+        if self.player.is_flying:
+            if self.coin_index.layer_size(AIR) < self.max_air_coin_rows:
+                self.spawn_air_coinrow()
+
+        # Remove air coin rows when flying ends
+        elif self.coin_index.layer_size(AIR):
+            for row in list(self.coin_index.in_layer(AIR)):
+                self.despawn_coinrow(row, free_lane=False)
+        prof.end("sim.spawn")
+
+        if self.game_over:
+            self.input_log.finish(self.tick, self.score)
+
+    def retire_offscreen(self):
+        """Despawn everything that scrolled past the left screen edge."""
+        camera = self.distance
+        for obj in self.leftmost(self.obstacle_index, camera):
+            self.despawn_obstacle(obj)
+        for row in self.leftmost(self.coin_index, camera):
+            self.despawn_coinrow(row)
+        for pu in self.leftmost(self.powerup_index, camera):
+            self.despawn_powerup(pu)
+
+    def leftmost(self, index, camera):
+        # buckets are sorted by x, so only their left ends can be off-screen
+        return [obj for obj in index.left_ends(camera) if obj.offscreen(camera)]
+
+    def run(self, max_ticks, policy=None):
+        """Advance up to max_ticks or until game over; returns ticks run.
+
+        `policy` is called with the simulation before every tick and may
+        steer the player through input().
+        """
+        start = self.tick
+        while not self.game_over and self.tick - start < max_ticks:
+            if policy is not None:
+                policy(self)
+            self.update()
+        return self.tick - start
+
+
+def random_policy(sim):
+    # mash the controls now and then, enough to exercise every code path
+    r = random.random()
+    if r < 0.01:
+        sim.input("up")
+    elif r < 0.02:
+        sim.input("down")
+    elif r < 0.03:
+        sim.input("jump")
+    elif r < 0.04:
+        sim.input("slide")
+
+
+if __name__ == '__main__':
+    import sys
+
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    ticks = 0
+    games = 0
+    started = time.time()
+    while ticks < total:
+        sim = Simulation()
+        ticks += sim.run(total - ticks, random_policy)
+        games += 1
+    elapsed = time.time() - started
+    print("%d ticks over %d games in %.2fs (%.0f ticks/s)" % (ticks, games, elapsed, ticks / elapsed))
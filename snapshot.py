@@ -0,0 +1,330 @@
+"""Binary snapshots of a running Simulation, and a ring of them for seeking.
+
+snapshot(sim) packs everything a run depends on into a few kilobytes:
+counters, the player, every live entity, the spawn planner's pending plan
+and both random generators, plus the input log so far. restore(sim, data)
+puts any Simulation (or Game) back into that state; from there it plays
+on exactly as the original did.
+
+Timers are stored as ticks left and scheduled afresh on restore, so they
+fire on the same ticks as in the original run whatever the wheel's own
+count, and references between objects (the train the player rides) are stored
+as the entity's position in the snapshot's obstacle table.
+
+    ring = SnapshotRing(capacity=30, every=TICKS_PER_SECOND)
+    ring.take(sim)                  # after every update, keeps one per second
+    seek(sim, ring, tick)           # rewind or fast-forward a replaying run
+"""
+
+import struct
+
+from simulation import (State, TICKS_PER_SECOND, Train, SpawnCandidate, FLYING, DOUBLEJUMP)
+from replay import ACTIONS, ACTION_CODES, ReplayCursor
+
+MAGIC = b"SCSN"
+VERSION = 3
+
+STATES = (State.IDLE, State.RUNNING, State.JUMPING, State.SLIDING)
+STATE_CODES = dict((state, code) for code, state in enumerate(STATES))
+# PowerUP.kind; SpawnCandidate.kind is stored as is
+POWERUP_KINDS = (DOUBLEJUMP, FLYING)
+PLAYER_FLAGS = ("powerup_active", "is_moving", "on_train", "is_jumping", "is_on_ground",
+                "is_sliding", "is_flying", "invincible")
+
+# magic, version, tick
+HEADER = struct.Struct("<4sHI")
+# death_tick (-1: alive), game_over, score, track_scroll_speed, distance,
+# ticks of power-up cooldown left, powerups_count, taken_lanes bitmask, run_seed
+SIM = struct.Struct("<iBIddIHBI")
+# y, prev_y, base_y, velocity_x, velocity_y, JUMP_FORCE, ticks of power-up,
+# invincibility and slide left, target/current/air lane, state,
+# state_timer, animation_counter, run_frame_index, current_sprite_index, flags
+PLAYER = struct.Struct("<ddddddIIIBBBBIIBBH")
+# obstacles, coin rows, power-ups, last_train (-1: none, -2: despawned, record follows)
+COUNTS = struct.Struct("<HHHh")
+# is_train, num, lane, x, speed
+OBSTACLE = struct.Struct("<BBBdd")
+# lane, count, collected bitmask, is_air, x
+COINROW = struct.Struct("<BBHBd")
+# lane, kind (POWERUP_KINDS index), x
+POWERUP = struct.Struct("<BBd")
+# x, lane, y, w, h, kind, speed, is_air, param (-1: None)
+ENTRY = struct.Struct("<dBdddBdBh")
+# horizon, next_powerup_x, attempts, rejections, then queue/carried/recent sizes
+PLANNER = struct.Struct("<ddIIHHH")
+# PortableRandom state
+RNG = struct.Struct("<Q")
+# pending inputs, input log count, last_tick, body length
+INPUTS = struct.Struct("<BIII")
+
+
+def pack_rng(parts, rng):
+    parts.append(RNG.pack(rng.getstate()))
+
+
+def unpack_rng(data, pos, rng):
+    rng.setstate(RNG.unpack_from(data, pos)[0])
+    return pos + RNG.size
+
+
+def pack_entry(parts, entry):
+    parts.append(ENTRY.pack(entry.x, entry.lane, entry.y, entry.w, entry.h,
+                            entry.kind, entry.speed, entry.is_air,
+                            -1 if entry.param is None else entry.param))
+
+
+def unpack_entry(data, pos):
+    x, lane, y, w, h, kind, speed, is_air, param = ENTRY.unpack_from(data, pos)
+    entry = SpawnCandidate().set(x, lane, y, w, h, kind, speed, bool(is_air),
+                                 None if param < 0 else param)
+    return entry, pos + ENTRY.size
+
+
+def pack_obstacle(parts, obj):
+    is_train = isinstance(obj, Train)
+    parts.append(OBSTACLE.pack(is_train, obj.num, obj.lane, obj.x, obj.speed))
+
+
+def rearm(timers, ticks, callback):
+    if not ticks:
+        return None
+    return timers.after(ticks, callback)
+
+
+def snapshot(sim):
+    """The whole state of sim as bytes."""
+    timers = sim.timers
+    p = sim.player
+    parts = [HEADER.pack(MAGIC, VERSION, sim.tick)]
+
+    taken = 0
+    for lane in sim.taken_lanes:
+        taken |= 1 << lane
+    parts.append(SIM.pack(-1 if sim.death_tick is None else sim.death_tick, sim.game_over,
+                          sim.score, sim.track_scroll_speed, sim.distance,
+                          timers.remaining(sim.powerup_cooldown_timer), sim.powerups_count, taken, sim.run_seed))
+
+    flags = 0
+    for bit, name in enumerate(PLAYER_FLAGS):
+        if getattr(p, name):
+            flags |= 1 << bit
+    parts.append(PLAYER.pack(p.y, p.prev_y, p.base_y, p.velocity_x, p.velocity_y, p.JUMP_FORCE,
+                             timers.remaining(p.powerup_timer), timers.remaining(p.invincible_timer),
+                             timers.remaining(p.slide_timer),
+                             p.target_lane, p.current_lane, p.air_lane, STATE_CODES[p.state],
+                             p.state_timer, p.animation_counter, p.run_frame_index,
+                             p.current_sprite_index, flags))
+
+    # entities by table position, which is also how last_train is referenced
+    last_train = -1
+    if sim.last_train is not None:
+        last_train = -2
+        for i, obj in enumerate(sim.OBSTACLES):
+            if obj is sim.last_train:
+                last_train = i
+                break
+    parts.append(COUNTS.pack(len(sim.OBSTACLES), len(sim.COIN_ROWS), len(sim.POWER_UPS), last_train))
+    for obj in sim.OBSTACLES:
+        pack_obstacle(parts, obj)
+    for row in sim.COIN_ROWS:
+        parts.append(COINROW.pack(row.lane, row.count, row.collected, row.is_air, row.x))
+    for pu in sim.POWER_UPS:
+        parts.append(POWERUP.pack(pu.lane, POWERUP_KINDS.index(pu.kind), pu.x))
+    if last_train == -2:
+        pack_obstacle(parts, sim.last_train)
+
+    planner = sim.planner
+    parts.append(PLANNER.pack(planner.horizon, planner.next_powerup_x, planner.attempts,
+                              planner.rejections, len(planner.queue), len(planner.carried),
+                              len(planner.recent)))
+    for entries in (planner.queue, planner.carried, planner.recent):
+        for entry in entries:
+            pack_entry(parts, entry)
+    pack_entry(parts, sim.next_spawn)
+    pack_rng(parts, planner.rng)
+    pack_rng(parts, sim.rng)
+
+    log = sim.input_log
+    parts.append(INPUTS.pack(len(sim.pending_inputs), log.count, log.last_tick, len(log.body)))
+    parts.append(bytes(bytearray(ACTION_CODES[action] for action in sim.pending_inputs)))
+    parts.append(bytes(log.body))
+    return b"".join(parts)
+
+
+def snapshot_tick(data):
+    magic, version, tick = HEADER.unpack_from(data, 0)
+    return tick
+
+
+def restore(sim, data):
+    """Put sim in the state snapshot() captured in data.
+
+    A replaying sim keeps replaying its log from the snapshot's tick on.
+    """
+    magic, version, tick = HEADER.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise ValueError("not a Subway Chaser snapshot")
+    if version != VERSION:
+        raise ValueError("snapshot version %d, expected %d" % (version, VERSION))
+    pos = HEADER.size
+
+    # entities leave through the despawn paths so the lane indexes and the
+    # Despawned subscribers (the sketch's render queue) stay in step
+    for obj in list(sim.OBSTACLES):
+        sim.despawn_obstacle(obj)
+    for row in list(sim.COIN_ROWS):
+        sim.despawn_coinrow(row)
+    for pu in list(sim.POWER_UPS):
+        sim.despawn_powerup(pu)
+
+    sim.tick = tick
+    timers = sim.timers
+    timers.clear()
+    (death_tick, game_over, sim.score, sim.track_scroll_speed, sim.distance, cooldown_left,
+     sim.powerups_count, taken, sim.run_seed) = SIM.unpack_from(data, pos)
+    pos += SIM.size
+    sim.death_tick = None if death_tick < 0 else death_tick
+    sim.game_over = bool(game_over)
+    sim.powerup_cooldown_timer = rearm(timers, cooldown_left, sim.end_powerup_cooldown)
+    sim.powerup_ready = sim.powerup_cooldown_timer is None
+    sim.taken_lanes = set(lane for lane in range(8) if taken >> lane & 1)
+
+    p = sim.player
+    (p.y, p.prev_y, p.base_y, p.velocity_x, p.velocity_y, p.JUMP_FORCE, powerup_left,
+     invincible_left, slide_left, p.target_lane, p.current_lane, p.air_lane, state, p.state_timer,
+     p.animation_counter, p.run_frame_index, p.current_sprite_index, flags) = PLAYER.unpack_from(data, pos)
+    pos += PLAYER.size
+    p.state = STATES[state]
+    p.powerup_timer = rearm(timers, powerup_left, p.end_powerup)
+    p.invincible_timer = rearm(timers, invincible_left, p.end_invincibility)
+    p.slide_timer = rearm(timers, slide_left, p.end_slide)
+    for bit, name in enumerate(PLAYER_FLAGS):
+        setattr(p, name, bool(flags >> bit & 1))
+
+    obstacles, rows, powerups, last_train = COUNTS.unpack_from(data, pos)
+    pos += COUNTS.size
+    for _ in range(obstacles):
+        obj, pos = restore_obstacle(sim, data, pos)
+        sim.add_obstacle(obj)
+    for _ in range(rows):
+        lane, count, collected, is_air, x = COINROW.unpack_from(data, pos)
+        pos += COINROW.size
+        row = sim.coinrow_pool.acquire(x, lane, count, bool(is_air))
+        row.collected = collected
+        row.remaining = count - bin(collected).count("1")
+        sim.add_coinrow(row)
+    for _ in range(powerups):
+        lane, kind, x = POWERUP.unpack_from(data, pos)
+        pos += POWERUP.size
+        sim.add_powerup(sim.powerup_pool.acquire(x, lane, POWERUP_KINDS[kind]))
+    if last_train == -2:
+        sim.last_train, pos = restore_obstacle(sim, data, pos)
+    elif last_train >= 0:
+        sim.last_train = sim.OBSTACLES[last_train]
+    else:
+        sim.last_train = None
+
+    planner = sim.planner
+    (horizon, next_powerup_x, planner.attempts, planner.rejections,
+     queued, carried, recent) = PLANNER.unpack_from(data, pos)
+    # whole pixels, the planner feeds them to randint()
+    planner.horizon = int(horizon)
+    planner.next_powerup_x = int(next_powerup_x)
+    pos += PLANNER.size
+    lists = []
+    for count in (queued, carried, recent):
+        entries = []
+        for _ in range(count):
+            entry, pos = unpack_entry(data, pos)
+            entries.append(entry)
+        lists.append(entries)
+    planner.queue.clear()
+    planner.queue.extend(lists[0])
+    planner.carried = lists[1]
+    planner.recent.clear()
+    planner.planned.clear()
+    for entry in lists[2]:
+        planner.recent.append(entry)
+        planner.planned.add(entry)
+    sim.next_spawn, pos = unpack_entry(data, pos)
+    sim.spawn_plan = planner.timeline()
+    pos = unpack_rng(data, pos, planner.rng)
+    pos = unpack_rng(data, pos, sim.rng)
+
+    pending, count, last_tick, body = INPUTS.unpack_from(data, pos)
+    pos += INPUTS.size
+    sim.pending_inputs = [ACTIONS[code] for code in bytearray(data[pos:pos + pending])]
+    pos += pending
+    log = sim.input_log
+    log.seed = sim.run_seed
+    log.body = bytearray(data[pos:pos + body])
+    log.count = count
+    log.last_tick = last_tick
+    log.end_tick = tick if sim.game_over else 0
+    log.score = sim.score if sim.game_over else 0
+
+    if sim.replay is not None:
+        # drop the actions the snapshot's ticks already applied
+        sim.replay = ReplayCursor(sim.replay.log)
+        sim.replay.actions_for(tick)
+    return sim
+
+
+def restore_obstacle(sim, data, pos):
+    is_train, num, lane, x, speed = OBSTACLE.unpack_from(data, pos)
+    if is_train:
+        obj = sim.train_pool.acquire(x, num, lane, speed)
+    else:
+        obj = sim.obstacle_pool.acquire(x, num, lane)
+    return obj, pos + OBSTACLE.size
+
+
+class SnapshotRing:
+    """The last `capacity` snapshots, one every `every` ticks."""
+
+    def __init__(self, capacity=30, every=TICKS_PER_SECOND):
+        self.capacity = capacity
+        self.every = every
+        self.slots = [None] * capacity
+        self.ticks = [-1] * capacity
+
+    def clear(self):
+        self.slots = [None] * self.capacity
+        self.ticks = [-1] * self.capacity
+
+    def take(self, sim, force=False):
+        """Snapshot sim if its tick is due (or force); returns whether it did."""
+        if not force and sim.tick % self.every:
+            return False
+        i = (sim.tick // self.every) % self.capacity
+        self.slots[i] = snapshot(sim)
+        self.ticks[i] = sim.tick
+        return True
+
+    def latest(self, at_or_before=None):
+        """Newest snapshot at or before the given tick, or None."""
+        best = None
+        best_tick = -1
+        for data, tick in zip(self.slots, self.ticks):
+            if data is None or tick <= best_tick:
+                continue
+            if at_or_before is not None and tick > at_or_before:
+                continue
+            best = data
+            best_tick = tick
+        return best
+
+
+def seek(sim, ring, tick):
+    """Move a replaying sim to `tick`: restore the nearest earlier snapshot
+    if that gets there sooner, then play the log forward. Further back than
+    the ring reaches, the replay starts over from its first tick."""
+    data = ring.latest(tick)
+    if data is not None and (tick < sim.tick or snapshot_tick(data) > sim.tick):
+        restore(sim, data)
+    elif data is None and tick < sim.tick:
+        sim.start_replay(sim.replay.log)
+    while sim.tick < tick and not sim.game_over:
+        sim.update()
+        ring.take(sim)
+    return sim.tick
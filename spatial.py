@@ -0,0 +1,162 @@
+"""Lane-bucketed spatial index for the simulation's entities.
+
+Every (layer, lane) pair owns a list of entities kept sorted by x, next to a
+parallel list of keys so lookups are a bisect instead of a scan. Entities
+live in world coordinates, so scrolling the track never touches the index.
+
+Entities that move through the world by themselves (trains) sit in buckets
+of their own, one per speed, keyed by where they would be had they been
+moving since the index was made: x + speed * travel. advance() moves every
+one of them a tick by bumping `travel`, and as trains of one speed never
+overtake each other their keys and order never change.
+"""
+
+from bisect import bisect_left, bisect_right
+
+
+GROUND = 0
+AIR = 1
+
+
+def layer_of(obj):
+    return AIR if getattr(obj, "is_air", False) else GROUND
+
+
+class LaneIndex:
+    """`moving` makes entities with a non-zero `speed` move; otherwise
+    (the spawn plan) every entry stays where it was added."""
+
+    def __init__(self, lane_count, moving=False):
+        self.lane_count = lane_count
+        self.moving = moving
+        self.keys = [[[] for _ in range(lane_count)] for _ in (GROUND, AIR)]
+        self.items = [[[] for _ in range(lane_count)] for _ in (GROUND, AIR)]
+        # per (layer, lane): speed -> (keys, items) of the moving entities
+        self.movers = [[{} for _ in range(lane_count)] for _ in (GROUND, AIR)]
+        # ticks the moving buckets have moved
+        self.travel = 0
+        # widest entity ever stored per bucket, bounds how far left to look
+        self.max_w = [[0] * lane_count for _ in (GROUND, AIR)]
+        self.sizes = [0, 0]
+
+    def __len__(self):
+        return self.sizes[GROUND] + self.sizes[AIR]
+
+    def layer_size(self, layer):
+        return self.sizes[layer]
+
+    def clear(self):
+        self.__init__(self.lane_count, self.moving)
+
+    def advance(self):
+        """Every moving entity went `speed` further left; call once per tick."""
+        self.travel += 1
+
+    def bucket(self, obj):
+        """(keys, items, key) of obj's bucket and its key there."""
+        layer = layer_of(obj)
+        speed = obj.speed if self.moving else 0
+        if not speed:
+            return self.keys[layer][obj.lane], self.items[layer][obj.lane], obj.x
+        movers = self.movers[layer][obj.lane]
+        if speed not in movers:
+            movers[speed] = ([], [])
+        keys, items = movers[speed]
+        return keys, items, obj.x + speed * self.travel
+
+    def add(self, obj):
+        keys, items, key = self.bucket(obj)
+        i = bisect_right(keys, key)
+        keys.insert(i, key)
+        items.insert(i, obj)
+        layer = layer_of(obj)
+        if obj.w > self.max_w[layer][obj.lane]:
+            self.max_w[layer][obj.lane] = obj.w
+        self.sizes[layer] += 1
+
+    def remove(self, obj):
+        keys, items, key = self.bucket(obj)
+        i = bisect_left(keys, key)
+        while i < len(items) and items[i] is not obj:
+            i += 1
+        if i == len(items):
+            # key off by float rounding, fall back to identity search
+            if obj not in items:
+                return False
+            i = items.index(obj)
+        del keys[i]
+        del items[i]
+        layer = layer_of(obj)
+        self.sizes[layer] -= 1
+        if not keys and keys is not self.keys[layer][obj.lane]:
+            # last train of its speed in the lane
+            del self.movers[layer][obj.lane][obj.speed]
+        return True
+
+    def sorted_buckets(self, layer, lane):
+        """(keys, items, shift) of each bucket in (layer, lane); key - shift is x."""
+        yield self.keys[layer][lane], self.items[layer][lane], 0
+        movers = self.movers[layer][lane]
+        for speed in sorted(movers):
+            keys, items = movers[speed]
+            yield keys, items, speed * self.travel
+
+    def overlapping(self, lane, x0, x1, layer=GROUND):
+        """Entities in lane whose [x, x + w) span overlaps [x0, x1)."""
+        keys = self.keys[layer][lane]
+        items = self.items[layer][lane]
+        movers = self.movers[layer][lane]
+        x_lo = x0 - self.max_w[layer][lane]
+        if keys:
+            lo = bisect_right(keys, x_lo)
+            hi = bisect_left(keys, x1)
+            found = [obj for obj in items[lo:hi] if obj.x + obj.w > x0]
+        else:
+            found = []
+        if movers:
+            for speed in sorted(movers):
+                keys, items = movers[speed]
+                shift = speed * self.travel
+                lo = bisect_right(keys, x_lo + shift)
+                hi = bisect_left(keys, x1 + shift)
+                found.extend([obj for obj in items[lo:hi] if obj.x + obj.w > x0])
+        return found
+
+    def neighbours(self, lane, x0, x1, distance, layer=None):
+        """Entities in lane within distance of the [x0, x1) span.
+
+        layer=None searches both the ground and the air layer.
+        """
+        if layer is not None:
+            return self.overlapping(lane, x0 - distance, x1 + distance, layer)
+        return (self.overlapping(lane, x0 - distance, x1 + distance, GROUND) +
+                self.overlapping(lane, x0 - distance, x1 + distance, AIR))
+
+    def rightmost_x(self, lane, layer=GROUND):
+        found = None
+        for keys, items, shift in self.sorted_buckets(layer, lane):
+            if keys and (found is None or keys[-1] - shift > found):
+                found = keys[-1] - shift
+        return found
+
+    def left_ends(self, x):
+        """Entities from the left end of each bucket, up to the first past x."""
+        found = []
+        for layer in (GROUND, AIR):
+            for lane in range(self.lane_count):
+                buckets = [self.items[layer][lane]]
+                movers = self.movers[layer][lane]
+                if movers:
+                    buckets.extend(movers[speed][1] for speed in sorted(movers))
+                for items in buckets:
+                    for obj in items:
+                        if obj.x > x:
+                            break
+                        found.append(obj)
+        return found
+
+    def in_layer(self, layer):
+        for lane in range(self.lane_count):
+            for keys, items, shift in self.sorted_buckets(layer, lane):
+                for obj in items:
+                    yield obj
@@ -1,1232 +1,559 @@
 add_library('minim')
 
-import time
+import json
 import os
-import random
+
+from simulation import (SCREEN_WIDTH, SCREEN_HEIGHT, TRACK_SCROLL_SPEED, LANE_COUNT,
+                        TICKS_PER_SECOND, COINROW, KIND_NAMES, KIND_SIZES, AnimationConfig,
+                        CoinRow, Simulation)
+from render_queue import RenderQueue
+from spatial import GROUND, AIR
+from replay import InputLog
+from snapshot import SnapshotRing, seek
+from timestep import FixedTimestep, interpolate
+from audio import SoundBoard
+from loader import StagedLoader
+from events import Died, CoinCollected, PowerUpCollected, Spawned, Despawned
+from ui import HUD, in_button
 
 
 PATH = os.getcwd()
+# every run's inputs are saved here on death; `python replay.py` re-checks it
+LAST_RUN_REPLAY = os.path.join(PATH, "replays", "last_run.replay")
+# set to a .replay file to watch that run instead of playing; LEFT and
+# RIGHT then seek by SEEK_SECONDS
+REPLAY_FILE = None
+SEEK_SECONDS = 5
+# set to a .csv or .jsonl path to profile from the first frame and log
+# every frame's phase timings there; P toggles the profiler overlay
+PROFILE_LOG = None
 player = Minim(this)
 
 
-SCREEN_WIDTH = 1280
-SCREEN_HEIGHT = 720
-LANE_COUNT = 3
-
-PLAYER_X = 250
-
-LANE_POSITIONS_Y_JACK = [
-    390,  # up
-    518,  # mid
-    635   # down
-]
-
-LANE_POSITIONS_Y = [
-    430,  # up
-    550,  # mid
-    665   # down
-]
-
-# Air lanes for flying powerup
-AIR_LANE_POSITIONS_Y = [
-    100,  # up
-    180,  # mid
-    260   # down
-]
-
-class AnimationConfig:
-    SPRITE_RUN1 = 0
-    SPRITE_RUN2 = 1
-    SPRITE_RUN3 = 2
-    SPRITE_RUN4 = 3
-    SPRITE_JUMP = 4
-    SPRITE_SLIDE = 5
-    SPRITE_FLY = 6
-
-    SPRITE_COORDINATES = {
-        0: (0, 0, 27, 40),     # run0
-        1: (27, 0, 25, 40),    # run1
-        2: (52, 0, 27, 40),    # run2 
-        3: (84, 0, 24, 40),    # run3 
-        4: (109, 0, 24, 40),    # jump 
-        5: (136, 0, 28, 40),   # slide
-        6: (165, 0, 37, 40),   # flying
-    }
-
-    SLIDE_DURATION = 70
-    RUN_ANIMATION_FRAMES = [0, 1, 2, 3]  # cycle between run1 and run2
-    RUN_ANIMATION_SPEED = 11
-    CHARACTER_WIDTH = 60
-    CHARACTER_HEIGHT = 60
-
-class State:
-    IDLE = "IDLE"
-    RUNNING = "RUNNING"
-    JUMPING = "JUMPING"
-    SLIDING = "SLIDING"
-
-class Player:
-    def __init__(self, sprite_img, game):
-        # store game reference (important)
-        self.game = game
-
-        self.x = PLAYER_X
-        self.y = LANE_POSITIONS_Y_JACK[1]
-        self.base_y = LANE_POSITIONS_Y_JACK[1]
-        self.target_lane = 1
-        self.current_lane = 1
-
-        self.velocity_x = 0
-        self.velocity_y = 0
-        
-        self.NORMAL_JUMP_FORCE = -10
-        self.SUPER_JUMP_FORCE = -14
-
-        self.JUMP_FORCE = self.NORMAL_JUMP_FORCE
-        self.GRAVITY = 0.5
-        self.MAX_FALL_SPEED = 15
-        
-        self.powerup_active = False
-        self.powerup_end_time = 0
-
-        self.is_moving = True
-        self.on_train = False
-
-        # Use animation config sizes as collider sizes to avoid mismatch
-        self.sprite_sheet = sprite_img
-        self.sprite_width = AnimationConfig.CHARACTER_WIDTH
-        self.sprite_height = AnimationConfig.CHARACTER_HEIGHT
-
-        self.state = State.RUNNING
-        self.current_sprite_index = AnimationConfig.SPRITE_RUN1
+class Atlas:
+    """images/atlas.png and its lookup table, both made by build_atlas.py.
+
+    Every entity is drawn out of this one texture. placement() turns a
+    sprite's entry into what a single image() call needs to draw it scaled
+    into a w x h box: (dx, dy, dw, dh, u1, v1, u2, v2), the offset and size
+    relative to the box's corner and the source rectangle in the atlas.
+    """
+
+    def __init__(self, img, frames):
+        self.img = img
+        self.frames = frames
+
+    def placement(self, name, w, h):
+        frame = self.frames.get(name)
+        if frame is None or not self.img:
+            return None
+        x, y, fw, fh, ox, oy, box_w, box_h = frame
+        sx = w / float(box_w)
+        sy = h / float(box_h)
+        return (ox * sx, oy * sy, fw * sx, fh * sy, x, y, x + fw, y + fh)
+
+    def frame_names(self, prefix):
+        """prefix0, prefix1, ... for as many as the atlas has."""
+        names = []
+        while prefix + str(len(names)) in self.frames:
+            names.append(prefix + str(len(names)))
+        return names
+
+# rows of lanes.png: transparent above TRACK_TOP, fully opaque from
+# FAR_BOTTOM down, so nothing behind the track shows below FAR_BOTTOM
+TRACK_TOP = 366
+FAR_BOTTOM = 370
+# px/tick of the sky and city at the default track speed; they scale with it
+SKY_SPEED = 1
+CITY_SPEED = 2
+
+
+class ParallaxLayer:
+    """One endlessly tiled image scrolling at a fixed speed.
+
+    The layer is just an offset into its texture, wrapped at the texture
+    width. Drawing it is two sub-image blits of the `top`..`bottom` band:
+    the texture from the offset to its end, then its start.
+    """
+
+    def __init__(self, img, speed, top=0, bottom=SCREEN_HEIGHT):
+        self.img = img
+        self.speed = speed
+        self.top = top
+        self.bottom = bottom
+        self.width = img.width if img else SCREEN_WIDTH
+        self.offset = 0
 
-        self.state_timer = 0
-        self.animation_counter = 0
-        self.run_frame_index = 0
+    def reset(self):
+        self.offset = 0
 
-        self.is_jumping = False
-        self.is_on_ground = True
-        self.is_sliding = False
-        self.is_flying = False
-        self.air_lane = 1  # track which air lane when flying
-        
-        self.invincible = False
-        self.invincible_end_time = 0
-
-    def change_state(self, new_state):
-        if self.state == new_state:
-            return False
-
-        if new_state == State.JUMPING:
-            if self.state != State.RUNNING or (not self.is_on_ground and not self.on_train):
-                return False
-
-        if new_state == State.SLIDING:
-            if self.state != State.RUNNING:
-                return False
-
-        # reset flags for old states
-        if self.state == State.JUMPING:
-            self.is_jumping = False
-        elif self.state == State.SLIDING:
-            self.is_sliding = False
-
-        self.state = new_state
-        self.state_timer = 0
-
-        if new_state == State.IDLE:
-            self.current_sprite_index = AnimationConfig.SPRITE_IDLE
-        elif new_state == State.RUNNING:
-            self.current_sprite_index = AnimationConfig.SPRITE_RUN1
-            self.run_frame_index = 0
-        elif new_state == State.JUMPING:
-            self.current_sprite_index = AnimationConfig.SPRITE_JUMP
-            self.is_jumping = True
-            self.velocity_y = self.JUMP_FORCE
-            self.is_on_ground = False
-            self.on_train = False
-        elif new_state == State.SLIDING:
-            self.current_sprite_index = AnimationConfig.SPRITE_SLIDE
-            self.is_sliding = True
-
-        return True
-
-    def jump(self):
-        if self.on_train:
-            # jump off train
-            # ensure base_y set to lane ground to allow normal jump physics
-            self.base_y = LANE_POSITIONS_Y_JACK[self.current_lane]
-            
-        return self.change_state(State.JUMPING)
-
-    def slide(self):
-        return self.change_state(State.SLIDING)
-
-    def toggle_pause(self):
-        self.is_moving = not self.is_moving
-
-    def apply_gravity(self):
-        if self.is_on_ground:
-            self.velocity_y = 0
-        else:
-            self.velocity_y += self.GRAVITY
-            if self.velocity_y > self.MAX_FALL_SPEED:
-                self.velocity_y = self.MAX_FALL_SPEED
-
-        self.y += self.velocity_y
-
-        if self.y >= self.base_y:
-            self.y = self.base_y
-            self.velocity_y = 0
-            self.is_on_ground = True
-            if self.state == State.JUMPING:
-                self.change_state(State.RUNNING)
-                
-    # activate super jump            
-    def super_jump(self):
-        self.powerup_active = True
-        self.JUMP_FORCE = self.SUPER_JUMP_FORCE
-        # 8-15 seconds in milliseconds
-        self.powerup_end_time = millis() + random.randint(8000, 15000) # 10 seconds
-    
-    def fly(self):
-        self.is_flying = True
-        self.powerup_active = True
-
-        self.powerup_end_time = millis() + random.randint(8000, 15000)
-        self.air_lane = 1  # start in middle air lane
-        self.current_sprite_index = AnimationConfig.SPRITE_FLY
-        # Move player to air lane position
-        self.y = AIR_LANE_POSITIONS_Y[self.air_lane]
-        self.base_y = AIR_LANE_POSITIONS_Y[self.air_lane]
-        self.is_on_ground = False
-    
+    def update(self):
+        self.offset = (self.offset + self.speed) % self.width
 
-    def _update_lane_movement(self):
-        # If on train, SKIP the logic that pulls us to the ground lane
-        if self.on_train:
-            # Check if we ran off the end of the train
-            if getattr(self.game, "last_train", None) is not None:
-                train = self.game.last_train
-                px = self.x
-                buffer = 20
-                
-                # If player X is outside train width
-                if px < train.x - buffer or px > train.x + train.w + buffer:
-                    self.on_train = False
-                    # Reset floor to real ground so we fall
-                    self.base_y = LANE_POSITIONS_Y_JACK[self.current_lane]
-            return 
-
-        # Normal lane switching logic (only runs if NOT on train)
-        target_y = LANE_POSITIONS_Y_JACK[self.target_lane]
-        distance = target_y - self.base_y
-
-        if abs(distance) > 2:
-            self.velocity_x = distance * 0.3
-            self.base_y += self.velocity_x
-        else:
-            self.base_y = target_y
-            self.velocity_x = 0
-            self.current_lane = self.target_lane
-
-        if self.is_on_ground:
-            self.y = self.base_y
-
-    def _update_idle(self):
-        pass
-
-    def _update_running(self):
-            self.animation_counter += 1
-            if self.animation_counter >= AnimationConfig.RUN_ANIMATION_SPEED:
-                self.animation_counter = 0
-                self.run_frame_index = (self.run_frame_index + 1) % len(AnimationConfig.RUN_ANIMATION_FRAMES)
-                self.current_sprite_index = AnimationConfig.RUN_ANIMATION_FRAMES[self.run_frame_index]
-
-    def _update_jumping(self):
-        self.apply_gravity()
-        if self.state == State.JUMPING:
-            self.current_sprite_index = AnimationConfig.SPRITE_JUMP
-
-    def _update_sliding(self):
-        if self.state_timer >= AnimationConfig.SLIDE_DURATION:
-            self.change_state(State.RUNNING)
-
-    def _update_flying(self):
-        self.current_sprite_index = AnimationConfig.SPRITE_FLY
-        target_y = AIR_LANE_POSITIONS_Y[self.air_lane]
-        distance = target_y - self.y
-        
-        if abs(distance) > 2:
-            self.y += distance * 0.2  # smooth interpolation
-        else:
-            self.y = target_y
-            self.base_y = target_y
+    def offset_at(self, lag):
+        # whole-pixel offset `lag` of a tick behind the last update
+        return int(round(self.offset - self.speed * lag)) % self.width
 
-    def update(self):
-        if not self.is_moving:
-            return
-        
-        if self.powerup_active and millis() >= self.powerup_end_time:
-            self.powerup_active = False
-            # end flying if active
-            if self.is_flying:
-                self.is_flying = False
-                # Return to ground lane matching the air lane position
-                self.current_lane = self.air_lane
-                self.target_lane = self.air_lane
-                self.base_y = LANE_POSITIONS_Y_JACK[self.air_lane]
-                self.y = self.base_y
-                self.is_on_ground = True
-                self.change_state(State.RUNNING)
-                # Brief invincibility after landing ( seconds)
-                self.invincible = True
-                self.invincible_end_time = millis() + 3000
-            
-        # End invincibility when time is up
-        if self.invincible and millis() >= self.invincible_end_time:
-            self.invincible = False
-            
-        if not self.powerup_active:
-            self.JUMP_FORCE = self.NORMAL_JUMP_FORCE
-
-        # If flying, handle air movement instead of normal states
-        if self.is_flying:
-            self._update_flying()
+    def draw(self, offset):
+        if not self.img:
             return
+        head = self.width - offset
+        h = self.bottom - self.top
+        image(self.img, 0, self.top, head, h, offset, self.top, self.width, self.bottom)
+        if offset:
+            image(self.img, head, self.top, offset, h, 0, self.top, offset, self.bottom)
 
-        self.state_timer += 1
 
-        # If on_train
-        if self.on_train:
-            self.y = self.base_y
-            self.is_on_ground = True
-            self.velocity_y = 0
-        
-        if self.state == State.IDLE:
-            self._update_idle()
-        elif self.state == State.RUNNING:
-            self._update_running()
-        elif self.state == State.JUMPING:
-            self._update_jumping()
-        elif self.state == State.SLIDING:
-            self._update_sliding()
-
-        if self.is_moving:
-            self._update_lane_movement()
-
-    def _update_lane_movement(self):
-        # If on train, SKIP the logic that pulls us to the ground lane
-        if self.on_train:
-            # Check if we ran off the end of the train
-            if getattr(self.game, "last_train", None) is not None:
-                train = self.game.last_train
-                px = self.x
-                buffer = 20
-                
-                # If player X is outside train width
-                if px < train.x - buffer or px > train.x + train.w + buffer:
-                    self.on_train = False
-                    # Reset floor to real ground so we fall
-                    self.base_y = LANE_POSITIONS_Y_JACK[self.current_lane]
-            return 
-
-        # Normal lane switching logic (only runs if NOT on train)
-        target_y = LANE_POSITIONS_Y_JACK[self.target_lane]
-        distance = target_y - self.base_y
-
-        if abs(distance) > 2:
-            self.velocity_x = distance * 0.3
-            self.base_y += self.velocity_x
-        else:
-            self.base_y = target_y
-            self.velocity_x = 0
-            self.current_lane = self.target_lane
-
-        if self.is_on_ground:
-            self.y = self.base_y
-
-    def draw(self):
-        # drawing uses CENTER translate style in your engine — leave as-is
-        if self.sprite_sheet:
-            sheet_width = self.sprite_sheet.width
-            sheet_height = self.sprite_sheet.height
-
-            if AnimationConfig.SPRITE_COORDINATES is not None:
-                coords = AnimationConfig.SPRITE_COORDINATES[self.current_sprite_index]
-                if len(coords) == 2:
-                    frame_x, frame_width = coords
-                    frame_y = 0
-                    frame_height = sheet_height
-                else:
-                    frame_x, frame_y, frame_width, frame_height = coords
-            else:
-                frame_width = sheet_width // 5
-                frame_x = self.current_sprite_index * frame_width
-                frame_y = 0
-                frame_height = sheet_height
-
-            pushMatrix()
-            imageMode(CENTER)
-            translate(self.x, self.y)
-            img_copy = self.sprite_sheet.get(frame_x, frame_y, frame_width, frame_height)
-            image(img_copy, 0, 0, AnimationConfig.CHARACTER_WIDTH, AnimationConfig.CHARACTER_HEIGHT)
-            imageMode(CORNER)
-            popMatrix()
-        else:
-            fill(255, 100, 100)
-            ellipse(self.x, self.y - 20, 40, 40)
-            fill(100, 150, 255)
-            rect(self.x - 10, self.y - 10, 20, 30)
+class Background:
+    """Sky, city and track layers scrolling at their own speeds.
 
-    def switch_lane(self, direction):
-        if not self.is_moving:
-            return
-        
-        # If flying, switch air lanes instead
-        if self.is_flying:
-            if direction == "up" and self.air_lane > 0:
-                self.air_lane -= 1
-            elif direction == "down" and self.air_lane < LANE_COUNT - 1:
-                self.air_lane += 1
-            return
-        
-        if direction == "up" and self.target_lane > 0:
-            self.target_lane -= 1
-        elif direction == "down" and self.target_lane < LANE_COUNT - 1:
-            self.target_lane += 1
+    Sky and city only show above the track and the track only as its band,
+    so a frame is two sub-image blits per layer. The far layers move a
+    whole pixel or more every tick, so there is nothing to gain from
+    caching them between frames.
+    """
 
-class Background:
     def __init__(self, background_img, bg_city_img, lanes_img):
-        self.bg_scroll_speed = 1
-        self.city_scroll_speed = 2
-        self.track_scroll_speed = 5
+        self.track_scroll_speed = TRACK_SCROLL_SPEED
 
-        self.bg_segments = []
-        self.city_segments = []
-        self.track_segments = []
+        far_bottom = FAR_BOTTOM if lanes_img else SCREEN_HEIGHT
+        self.sky = ParallaxLayer(background_img, SKY_SPEED, 0, far_bottom)
+        self.city = ParallaxLayer(bg_city_img, CITY_SPEED, 0, far_bottom)
+        self.track = ParallaxLayer(lanes_img, self.track_scroll_speed, TRACK_TOP)
 
-        self.background = background_img
-        self.bg_city = bg_city_img
-        self.lanes = lanes_img
+        self.moving = True
 
         self.reset()
 
     def reset(self):
-        self.bg_segments = [
-            {"x": 0, "width": SCREEN_WIDTH},
-            {"x": SCREEN_WIDTH, "width": SCREEN_WIDTH}
-        ]
-        self.city_segments = [
-            {"x": 0, "width": SCREEN_WIDTH},
-            {"x": SCREEN_WIDTH, "width": SCREEN_WIDTH}
-        ]
-        self.track_segments = [
-            {"x": 0, "width": SCREEN_WIDTH},
-            {"x": SCREEN_WIDTH, "width": SCREEN_WIDTH}
-        ]
-
-    def update(self, is_moving):
+        self.sky.reset()
+        self.city.reset()
+        self.track.reset()
+        self.set_speed(TRACK_SCROLL_SPEED)
+
+    def set_speed(self, track_scroll_speed):
+        self.track_scroll_speed = track_scroll_speed
+        scale = track_scroll_speed / float(TRACK_SCROLL_SPEED)
+        self.sky.speed = SKY_SPEED * scale
+        self.city.speed = CITY_SPEED * scale
+        self.track.speed = track_scroll_speed
+
+    def update(self, is_moving, track_scroll_speed=TRACK_SCROLL_SPEED):
+        self.moving = is_moving
         if not is_moving:
             return
+        if track_scroll_speed != self.track_scroll_speed:
+            self.set_speed(track_scroll_speed)
+        self.sky.update()
+        self.city.update()
+        self.track.update()
+
+    def draw(self, alpha=1.0):
+        # layers sit where the last tick left them, pull them back by the
+        # part of the next tick that has not happened yet
+        lag = (1 - alpha) if self.moving else 0
+        if not self.sky.img:
+            background(255)
+        self.sky.draw(self.sky.offset_at(lag))
+        self.city.draw(self.city.offset_at(lag))
+        self.track.draw(self.track.offset_at(lag))
+
+class Assets:
+    """Every image and sound the game uses, loaded once per process.
+
+    Loading is staged: the background layers come first, they are all the
+    start screen draws; the sprite atlas and the sounds follow, one file
+    per stage, so the loader's progress moves evenly while they decode.
+    """
 
-        for segment in self.bg_segments:
-            segment["x"] -= self.bg_scroll_speed
-        for segment in self.city_segments:
-            segment["x"] -= self.city_scroll_speed
-        for segment in self.track_segments:
-            segment["x"] -= self.track_scroll_speed
-
-        self.bg_segments = [s for s in self.bg_segments if s["x"] + s["width"] > -50]
-        self.city_segments = [s for s in self.city_segments if s["x"] + s["width"] > -50]
-        self.track_segments = [s for s in self.track_segments if s["x"] + s["width"] > -50]
-
-        if len(self.bg_segments) > 0 and self.bg_segments[-1]["x"] + self.bg_segments[-1]["width"] < SCREEN_WIDTH + 50:
-            self.bg_segments.append({
-                "x": self.bg_segments[-1]["x"] + self.bg_segments[-1]["width"],
-                "width": SCREEN_WIDTH
-            })
-        if len(self.city_segments) > 0 and self.city_segments[-1]["x"] + self.city_segments[-1]["width"] < SCREEN_WIDTH + 50:
-            self.city_segments.append({
-                "x": self.city_segments[-1]["x"] + self.city_segments[-1]["width"],
-                "width": SCREEN_WIDTH
-            })
-        if len(self.track_segments) > 0 and self.track_segments[-1]["x"] + self.track_segments[-1]["width"] < SCREEN_WIDTH + 50:
-            self.track_segments.append({
-                "x": self.track_segments[-1]["x"] + self.track_segments[-1]["width"],
-                "width": SCREEN_WIDTH
-            })
-
-    def draw(self):
-        background(255)
-        if self.background:
-            for segment in self.bg_segments:
-                image(self.background, segment["x"], 0)
-        if self.bg_city:
-            for segment in self.city_segments:
-                image(self.bg_city, segment["x"], 0)
-        if self.lanes:
-            for segment in self.track_segments:
-                image(self.lanes, segment["x"], 0)
-
-class Obstacle:
-    def __init__(self, x, game):
-        self.game = game
-        self.x = x
-        self.num = random.randint(0, 2)
-        self.sprite = self.game.OBSTACLE_SPRITES[self.num]
-
-        self.src_x = self.sprite["x"]
-        self.w = self.sprite["w"]
-        self.h = self.sprite["h"]
-        self.lane = random.randint(0, LANE_COUNT - 1)
-        self.y = LANE_POSITIONS_Y[self.lane] - self.h
-
-        if self.num == 0:
-            self.type = "fence"
-        elif self.num == 1:
-            self.type = "bush"
-        else:
-            self.type = "slide"
-
-        self.img = self.game.obs
-        self.speed = game.background.track_scroll_speed
-
-    def update(self):
-        self.x -= self.speed
-        if self.x + self.w <= 0:
-            if self.lane in self.game.taken_lanes:
-                self.game.taken_lanes.remove(self.lane)
-            if self in self.game.OBSTACLES:
-                self.game.OBSTACLES.remove(self)
-
-    def display(self):
-        image(self.img, self.x, self.y, self.w, self.h, self.src_x, 0, self.src_x + self.w, self.h)
-
-class Train:
-    def __init__(self, x, game):
-        self.game = game
-        self.x = x
-        self.num = random.randint(0, 2)
-        self.sprite = self.game.TRAIN_SPRITES[self.num]
-
-        self.src_x = self.sprite["x"]
-        self.w = self.sprite["w"]
-        self.h = self.sprite["h"]
-
-        self.lane = random.randint(0, LANE_COUNT - 1)
-        self.y = LANE_POSITIONS_Y[self.lane] - self.h
-
-        self.type = ["train1", "train2", "train3"][self.num]
-
-        self.img = self.game.train
-        self.speed = game.background.track_scroll_speed + random.randint(1, 2)
-
-    def update(self):
-        self.x -= self.speed
-        if self.x + self.w <= 0:
-            if self.lane in self.game.taken_lanes:
-                self.game.taken_lanes.remove(self.lane)
-            if self in self.game.OBSTACLES:
-                self.game.OBSTACLES.remove(self)
-
-    def display(self):
-        image(self.img, self.x, self.y, self.w, self.h,
-              self.src_x + self.w, 0, self.src_x, self.h)
-
-class Coin:
-    def __init__(self, x, game):
-        self.type = 'coin'
-        self.x = x
-        self.game = game
-        self.img = self.game.coin_img
-        self.slices = 4
-        self.slice = 0
-        self.speed = game.background.track_scroll_speed
-        self.is_air = False  # Default to ground coin
-
-        self.w = 30
-        self.h = 30
-
-        self.lane = random.randint(0, LANE_COUNT - 1)
-        self.y = LANE_POSITIONS_Y[self.lane] - self.h
-
-    def update_coin(self):
-        self.x -= self.speed
-
-    def display(self):
-        if frameCount % 15 == 0:
-            self.slice = (self.slice + 1) % self.slices
-        src_x = self.slice * self.w
-        image(self.img, self.x, self.y, self.w, self.h, src_x, 0, src_x + self.w, self.h)
-
-class CoinRow:
-    def __init__(self, x, lane, game, is_air=False):
-        self.game = game
-        self.x = x
-        self.lane = lane
-        self.coins = []
-        self.coin_w = 30
-        self.count = random.randint(4, 10)
-        self.space = 50
-        self.w = (self.count * self.coin_w) + (self.space * (self.count - 1))
-
-        self.type = 'coinrow'
-        self.is_air = is_air
-        self.speed = game.background.track_scroll_speed
-        self.h = 30
-
-        if is_air:
-            self.y = AIR_LANE_POSITIONS_Y[lane] - self.h
-        else:
-            self.y = LANE_POSITIONS_Y[lane] - self.h
-
-        for i in range(self.count):
-            c = Coin(self.x + i * self.space, game)
-            c.lane = lane
-            c.y = self.y
-            c.is_air = is_air  # Pass air flag to each coin
-            self.coins.append(c)
+    def __init__(self):
+        self.background = None
+        self.bg_city = None
+        self.lanes = None
+        self.atlas = None
+
+        # sounds: a few voices for the effects that can overlap, and no
+        # more than one coin sound per 3 frames however many rows are hit
+        self.audio = SoundBoard(player)
+
+        self.loader = StagedLoader([
+            ("backgrounds", self.load_backgrounds),
+            ("sprites", self.load_atlas),
+            ("music", lambda: self.audio.load_music(PATH + '/sounds/bg_sound.mp3')),
+            ("death sound", lambda: self.audio.load('death', PATH + '/sounds/death_sound.mp3')),
+            ("coin sound", lambda: self.audio.load('coin', PATH + '/sounds/coin.mp3',
+                                                   voices=3, min_interval=50)),
+            ("power sound", lambda: self.audio.load('power', PATH + '/sounds/powerUp.mp3',
+                                                    voices=2, min_interval=200)),
+        ], critical=1)
+
+    def load_image(self, name, filename):
+        setattr(self, name, loadImage(PATH + "/images/" + filename))
+
+    def load_backgrounds(self):
+        self.load_image("background", "background.png")
+        self.load_image("bg_city", "bg_city.png")
+        self.load_image("lanes", "lanes.png")
+
+    def load_atlas(self):
+        f = open(PATH + "/images/atlas.json")
+        try:
+            meta = json.load(f)
+        finally:
+            f.close()
+        self.atlas = Atlas(loadImage(PATH + "/images/" + meta["image"]), meta["frames"])
+
+_assets = None
+
+def load_assets(wait=True):
+    """The shared Assets, with at least the start screen's stages loaded.
+
+    With wait, also everything else: whatever a background load has not
+    finished yet is waited for, or loaded right here if none was started.
+    """
+    # shared by every Game, so restarting never touches the disk
+    global _assets
+    if _assets is None:
+        _assets = Assets()
+        _assets.loader.run_critical()
+    if wait:
+        _assets.loader.finish()
+    return _assets
+
+class Game(Simulation):
+    def __init__(self, background=None, hud=None):
+        assets = load_assets()
+        self.assets = assets
+
+        # the start screen's background and panels carry over when given
+        if background is None:
+            background = Background(assets.background, assets.bg_city, assets.lanes)
+        if hud is None:
+            hud = HUD()
+        self.background = background
+        self.hud = hud
+        self.render_queue = RenderQueue(LANE_COUNT)
+        # one snapshot per second of the current run, for seeking
+        self.snapshots = SnapshotRing(capacity=60, every=TICKS_PER_SECOND)
+
+        self.atlas = assets.atlas
+
+        self.audio = assets.audio
+
+        # timers run on simulation ticks, not on millis()
+        Simulation.__init__(self)
+        self.build_sprites()
+        self.subscribe()
+
+    def build_sprites(self):
+        """One placement per entity type, scaled to its hitbox, for draw_object."""
+        atlas = self.atlas
+        # by kind; coin rows draw coin by coin from coin_sprites
+        self.sprites = [atlas.placement(name, size[0], size[1]) if size else None
+                        for name, size in zip(KIND_NAMES, KIND_SIZES)]
+        self.coin_sprites = [atlas.placement(name, CoinRow.coin_w, CoinRow.h)
+                             for name in atlas.frame_names("coin")]
+        # by sprite index, centred on the player's position
+        self.player_sprites = {}
+        w = AnimationConfig.CHARACTER_WIDTH
+        h = AnimationConfig.CHARACTER_HEIGHT
+        for index, name in enumerate(atlas.frame_names("player")):
+            dx, dy, dw, dh, u1, v1, u2, v2 = atlas.placement(name, w, h)
+            self.player_sprites[index] = (dx - w / 2.0, dy - h / 2.0, dw, dh, u1, v1, u2, v2)
+        # the face-on frame; coin0 is the coin edge-on
+        self.hud.set_coin(atlas.img, atlas.placement("coin1", CoinRow.coin_w, CoinRow.h))
+
+    def reset(self, run_seed=None):
+        Simulation.reset(self, run_seed)
+        self.render_queue.clear()
+        self.snapshots.clear()
+        self.background.reset()
+        self.audio.stop_all()
+        self.audio.start_music()
+
+    def subscribe(self):
+        events = self.events
+        events.subscribe(Died, self.on_death)
+        events.subscribe(CoinCollected, lambda e: self.audio.queue('coin'))
+        events.subscribe(PowerUpCollected, lambda e: self.audio.queue('power'))
+        events.subscribe(Spawned, lambda e: self.render_queue.add(e.obj, self.obstacle_index.travel))
+        events.subscribe(Despawned, lambda e: self.render_queue.remove(e.obj))
+
+    def on_death(self, event):
+        self.audio.stop_music()
+        self.audio.queue('death')
+        # the frame being drawn still shows the game-over overlay
+        noLoop()
 
     def update(self):
-        self.x -= self.speed
-        for c in self.coins:
-            c.update_coin()
-            
-        should_remove = False
-        
-        if len(self.coins) == 0:
-            should_remove = True
-        elif self.coins[-1].x + self.coins[-1].w < 0:
-            should_remove = True
-            
-        if should_remove:      
-            if self.lane in self.game.taken_lanes:
-                self.game.taken_lanes.remove(self.lane)
-            if self in self.game.COIN_ROWS:
-                self.game.COIN_ROWS.remove(self)
-
-    def display(self):
-        for c in self.coins:
-            c.display()
-
-
-# CLASS POWER UPS: initializing, updating, displaying work for all powerups
-# in order to implement flying has to work with other class and/or add it as function in this class
-class PowerUP:
-    def __init__(self, x, lane, game):
-        self.game = game
-        self.x = x
-        self.lane = lane
-        self.type = random.choice(['doublejump', 'flying'])
-        if self.type == 'doublejump':
-            self.sprite = self.game.POWERUPS_SPRITES[1]
+        self.profiler.begin("background.update")
+        self.background.update(self.player.is_moving, self.track_scroll_speed)
+        self.profiler.end("background.update")
+        Simulation.update(self)
+        self.snapshots.take(self)
+        if self.game_over and self.replay is None:
+            self.save_replay(LAST_RUN_REPLAY)
+
+    def seek_by(self, seconds):
+        """Jump a replay forwards or backwards, silently."""
+        target = max(0, self.tick + int(seconds * TICKS_PER_SECOND))
+        seek(self, self.snapshots, target)
+        self.audio.stop_all()
+        if not self.game_over:
+            self.audio.start_music()
+            loop()
+
+    def save_replay(self, path):
+        folder = os.path.dirname(path)
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        self.input_log.save(path)
+
+    def restart(self):
+        if REPLAY_FILE:
+            self.start_replay(InputLog.load(REPLAY_FILE))
         else:
-            self.sprite = self.game.POWERUPS_SPRITES[0]
-            
-        self.img = self.game.powerups
-        self.flag = False
-        
-        self.src_x = self.sprite["x"]
-        self.w = self.sprite["w"]
-        self.h = self.sprite["h"]
-        
-        self.speed = game.background.track_scroll_speed
-        self.y = LANE_POSITIONS_Y[lane] - self.h
-        
-    def update(self):
-        self.x -= self.speed
-        
-            
-    def display(self):
-        image(self.img, self.x, self.y, self.w, self.h, self.src_x, 0, self.src_x + self.w, self.h)
-            
-        
-class Game:
-    def __init__(self):
-        self.game_over = False
-        self.score = 0
-
-        # image loads
-        
-        jack_img = loadImage(PATH + "/images/last_try.png") 
-        background_img = loadImage(PATH + "/images/background.png") 
-        bg_city_img = loadImage(PATH + "/images/bg_city.png") 
-        lanes_img = loadImage(PATH + "/images/lanes.png") 
-
-        self.player = Player(jack_img, self)
-        self.background = Background(background_img, bg_city_img, lanes_img)
-
-        self.train = loadImage(PATH + '/images/trains.png') 
-        self.obs = loadImage(PATH + '/images/obstacles.png') 
-        self.coin_img = loadImage(PATH + '/images/coins.png') 
-        self.powerups = loadImage(PATH + '/images/powerups.png') 
-        
-        # sounds 
-        self.bg_sound = player.loadFile(PATH + '/sounds/bg_sound.mp3') 
-        self.death_sound = player.loadFile(PATH + '/sounds/death_sound.mp3') 
-        self.coin_sound = player.loadFile(PATH + '/sounds/coin.mp3')
-        self.power_sound = player.loadFile(PATH + '/sounds/powerUp.mp3') 
-        self.bg_sound.loop()
-
-        self.OBSTACLES = []
-        self.COIN_ROWS = []
-        self.POWER_UPS = []
-        self.taken_lanes = set()
-
-        self.last_train = None
-        self.powerups_count = 0
-        self.last_powerup_time = 0  # Track last powerup spawn/collection time
-        self.powerup_cooldown = 20000  # 20 seconds cooldown between power-ups
-
-        self.OBSTACLE_SPRITES = [
-            {"x": 0,   "w": 107, "h": 100},  # fence
-            {"x": 124, "w": 94,  "h": 100},  # bush
-            {"x": 229, "w": 136, "h": 100},  # slide barrier
-        ]
-
-        self.TRAIN_SPRITES = [
-            {"x": 0,   "w": 276, "h": 134},
-            {"x": 284, "w": 275, "h": 134},
-            {"x": 566, "w": 314, "h": 134},
-        ]
-        
-        self.POWERUPS_SPRITES = [
-            {"x": 0,   "w": 57, "h": 51},
-            {"x": 57, "w": 43, "h": 51},
-        ]
-
-    def check_player(self, obj):
-        # Invincible: skip obstacles but still collect coins
-        if self.player.invincible and obj.type not in ('coin', 'coinrow'):
-            return False
-            
-        if self.player.is_flying:
-            # flying - collect air coins in matching air lane
-            is_valid_air_coin = obj.type in ('coin', 'coinrow') and obj.is_air and obj.lane == self.player.air_lane
-            if not is_valid_air_coin:
-                return False
+            self.reset()
+
+    def draw_player(self, alpha):
+        p = self.player
+        y = interpolate(p.prev_y, p.y, alpha)
+        sprite = self.player_sprites.get(p.current_sprite_index)
+        if sprite is not None:
+            dx, dy, dw, dh, u1, v1, u2, v2 = sprite
+            image(self.atlas.img, p.x + dx, y + dy, dw, dh, u1, v1, u2, v2)
         else:
-            if obj.lane not in (self.player.current_lane, self.player.target_lane):
-                return False
-
-        padding = 15
-        p_left = self.player.x - self.player.sprite_width/2 + padding
-        p_right = self.player.x + self.player.sprite_width/2 - padding
-        p_top = self.player.y - self.player.sprite_height/2 + padding
-        p_bottom = self.player.y + self.player.sprite_height/2 - padding
-
-        # coins: collect, but not lethal
-        if getattr(obj, "type", None) in ("coin", "coinrow"):
-            return (p_left < obj.x + obj.w and
-                    p_right > obj.x and
-                    p_top < obj.y + obj.h and
-                    p_bottom > obj.y)
-        #powerups: collect and use
-        if obj.type in ('flying', 'doublejump'):
-            return (p_left < obj.x + obj.w and
-                    p_right > obj.x and
-                    p_top < obj.y + obj.h and
-                    p_bottom > obj.y)
-            
-        # trains:
-        if "train" in getattr(obj, "type", ""):
-            feet = p_bottom
-            train_top = obj.y
-            train_left = obj.x
-            train_right = obj.x + obj.w
-
-            # 1. Check if we are jumping OUT of the train
-            # If colliding but moving UP, we are jumping off. Safe.
-            is_touching = (p_left < train_right and p_right > train_left and 
-                           p_top < obj.y + obj.h and p_bottom > obj.y)
-            
-            if is_touching and self.player.velocity_y < 0:
-                return False
-
-            # 2. Check Landing
-            horizontally_over = (p_right > train_left and p_left < train_right)
-            falling_down = self.player.velocity_y >= 0
-            # Allow feet to be slightly below top (tolerance)
-            within_landing = (feet >= train_top - 5 and feet <= train_top + 5)
-
-            if horizontally_over and falling_down and within_landing:
-                self.player.on_train = True
-                self.player.is_on_ground = True
-                self.player.velocity_y = 0
-                
-                # --- VISUAL FIX ---
-                # Lift base_y by half height (30px) so feet sit ON top, not waist.
-                self.player.base_y = train_top - 30
-                self.player.y = self.player.base_y 
-                
-                self.last_train = obj
-                return False
-
-            # If we are already riding this train, ignore collision
-            if self.player.on_train:
-                return False
-
-        # --- GENERAL COLLISION (Death) ---
-        is_colliding = (p_left < obj.x + obj.w and
-                        p_right > obj.x and
-                        p_top < obj.y + obj.h and
-                        p_bottom > obj.y)
-
-        if not is_colliding:
-            return False
-
-        # Avoidance logic
-        if obj.type in ("fence", "bush"):
-            if self.player.is_jumping and not self.player.is_on_ground:
-                return False
-
-        if obj.type == "slide":
-            if self.player.is_sliding:
-                return False
-
-        return True
-
-    def check_collision(self, rect1, rect2):
-        return (rect1.x < rect2.x + rect2.w and
-                rect1.x + rect1.w > rect2.x and
-                rect1.y < rect2.y + rect2.h and
-                rect1.y + rect1.h > rect2.y)
-
-    def is_space_free(self, new_obj, other_list, is_coin_check=False):
-        MIN_DIST = 200
-        TRAIN_BUFFER = 800
-        SLIDE_BUFFER = 350
-        COIN_BUFFER = 100
-
-        for other in other_list:
-            if new_obj.lane != other.lane:
-                continue
-
-            # collision check
-            if self.check_collision(new_obj, other):
-                return False
-
-            if new_obj.x < other.x:
-                left, right = new_obj, other
-            else:
-                left, right = other, new_obj
-
-            distance = right.x - (left.x + left.w)
-
-            required_gap = MIN_DIST
-
-            if is_coin_check or other.type == 'coinrow' or new_obj.type == 'coinrow':
-                required_gap = COIN_BUFFER
-            elif "train" in new_obj.type or "train" in other.type:
-                required_gap = TRAIN_BUFFER
-                if left.speed > right.speed:
-                    required_gap += 600
-            elif new_obj.type == "slide" and other.type == "slide":
-                required_gap = SLIDE_BUFFER
-
-            if distance < required_gap:
-                return False
-
-        return True
-
-    def spawn_obstacle(self):
-        blocked_lanes = set()
-        for ob in self.OBSTACLES:
-            if ob.x > SCREEN_WIDTH - 200:
-                blocked_lanes.add(ob.lane)
-        no_spawn_lane = len(blocked_lanes)>=2
-        
-        # Normal random spawner with safe checks
-        attempts = 8
-        for _ in range(attempts):
-            start_x = random.randint(SCREEN_WIDTH + 200, SCREEN_WIDTH + 1000)
-            #skip the lane if other lanes are already blocked
-            if no_spawn_lane:
-                return
-            
-            if random.random() < 0.4:
-                new_obj = Train(start_x, self)
-            else:
-                new_obj = Obstacle(start_x, self)
-                
-            if new_obj.lane not in blocked_lanes and len(blocked_lanes)>=2:
-                continue 
-
-            if not self.is_space_free(new_obj, self.OBSTACLES):
-                continue
-            if not self.is_space_free(new_obj, self.COIN_ROWS):
-                continue
-            if not self.is_space_free(new_obj, self.POWER_UPS):
-                continue
-
-
-            self.OBSTACLES.append(new_obj)
-            self.taken_lanes.add(new_obj.lane)
-            return
-
-        # if failed, do nothing this tick
-
-    def spawn_coinrow(self):
-        attempts = 6
-        for _ in range(attempts):
-            lane = random.randint(0, LANE_COUNT - 1)
-            start_x = random.randint(SCREEN_WIDTH + 200, SCREEN_WIDTH + 800)
-
-            new_row = CoinRow(start_x, lane, self)
-
-            if not self.is_space_free(new_row, self.OBSTACLES, is_coin_check=True):
-                continue
-            if not self.is_space_free(new_row, self.COIN_ROWS, is_coin_check=True):
-                continue
-            if not self.is_space_free(new_row, self.POWER_UPS, is_coin_check=True):
-                continue
+            fill(255, 100, 100)
+            ellipse(p.x, y - 20, 40, 40)
+            fill(100, 150, 255)
+            rect(p.x - 10, y - 10, 20, 30)
 
-            self.COIN_ROWS.append(new_row)
-            self.taken_lanes.add(new_row.lane)
-  
-            return
-        
-    def spawn_powerup(self):
-        # Check cooldown - don't spawn if not enough time has passed
-        if millis() - self.last_powerup_time < self.powerup_cooldown:
+    def draw_coinrow(self, row, alpha):
+        if not self.coin_sprites:
             return
-            
-        if random.random() < 0.003:  # 0.3% chance per frame
-            attempts = 3
-            for _ in range(attempts):
-                lane = random.randint(0, LANE_COUNT - 1)
-                start_x = random.randint(SCREEN_WIDTH + 200, SCREEN_WIDTH + 800)
-
-                new_pu = PowerUP(start_x, lane, self)
-                
-                # Check against Obstacles Aand trains
-                if not self.is_space_free(new_pu, self.OBSTACLES):
-                    continue
-                
-                # Check against Coins
-                if not self.is_space_free(new_pu, self.COIN_ROWS):
-                    continue
-                
-                # Check against other Powerups
-                if not self.is_space_free(new_pu, self.POWER_UPS):
-                    continue
-
-                self.POWER_UPS.append(new_pu)
-                self.last_powerup_time = millis()  # Record spawn time
-                return
-
-    def spawn_air_coinrow(self):
-        """Spawn coin rows in air lanes while flying"""
-        if not self.player.is_flying:
+        # animation runs on simulation ticks, 15 per frame
+        dx, dy, dw, dh, u1, v1, u2, v2 = self.coin_sprites[(self.tick // 15) % len(self.coin_sprites)]
+        img = self.atlas.img
+        x = self.screen_x(row, alpha) + dx
+        y = row.y + dy
+        for i in range(row.count):
+            if not row.is_collected(i):
+                image(img, x + i * row.space, y, dw, dh, u1, v1, u2, v2)
+
+    def screen_x(self, obj, alpha):
+        # everything was screen_speed further right one tick ago
+        return obj.x - self.distance + self.screen_speed(obj) * (1 - alpha)
+
+    def draw_object(self, obj, alpha):
+        x = self.screen_x(obj, alpha)
+        sprite = self.sprites[obj.kind]
+        if sprite is None:
+            fill(120)
+            rect(x, obj.y, obj.w, obj.h)
             return
-        attempts = 4
-        for _ in range(attempts):
-            lane = random.randint(0, LANE_COUNT - 1)
-            start_x = random.randint(SCREEN_WIDTH + 100, SCREEN_WIDTH + 500)
-            
-            new_row = CoinRow(start_x, lane, self, is_air=True)
-            
-            # Check against other air coins only (ground coins are far below)
-            air_rows = [r for r in self.COIN_ROWS if r.is_air]
-            if not self.is_space_free(new_row, air_rows, is_coin_check=True):
-                continue
-            
-            self.COIN_ROWS.append(new_row)
-            return
-
-    def update(self):
-        self.background.update(self.player.is_moving)
-        self.player.update()
-
-        # check obstacles near player
-        for obs in list(self.OBSTACLES):  # iterate copy because may remove
-            # optimize lane check
-            if obs.lane != self.player.current_lane and obs.lane != self.player.target_lane and abs(self.player.target_lane - self.player.current_lane) != 1:
-                continue
-            if self.check_player(obs):
-                self.game_over = True
-                self.bg_sound.pause()
-                self.death_sound.rewind()
-                self.death_sound.play()
-                break
+        dx, dy, dw, dh, u1, v1, u2, v2 = sprite
+        image(self.atlas.img, x + dx, obj.y + dy, dw, dh, u1, v1, u2, v2)
 
-        # coins collection
-        for cr in list(self.COIN_ROWS):
-            for co in list(cr.coins):
-                if self.check_player(co):
-                    try:
-                        cr.coins.remove(co)
-                    except ValueError:
-                        pass
-                    self.score += 1
-                    self.coin_sound.rewind()
-                    self.coin_sound.play()
-                        
-        # power-ups collection
-        for pu in list(self.POWER_UPS):            
-            if pu.x + pu.w < 0:
-                self.POWER_UPS.remove(pu)
-                continue
-            
-            # Skip collecting if a power-up is already active
-            if self.player.powerup_active:
-                continue
-            
-            if self.check_player(pu):
-                self.power_sound.rewind()
-                self.power_sound.play()
-                self.last_powerup_time = millis()  # Reset cooldown on collection
-                if pu.type == 'doublejump':
-                    self.player.super_jump()
-                elif pu.type == 'flying':
-                    self.player.fly()
-                if pu in self.POWER_UPS:
-                    self.POWER_UPS.remove(pu)
-
-        # spawn/maintain obstacles
-        if len(self.OBSTACLES) < 6:
-            self.spawn_obstacle()
-        for o in list(self.OBSTACLES):
-            o.update()
-
-        # spawn/maintain coin rows
-        if len(self.COIN_ROWS) < 3:
-            self.spawn_coinrow()
-        for row in list(self.COIN_ROWS):
-            row.update()
-        
-        # spawn/maintain power ups    
-        if len(self.POWER_UPS) < 1:
-            self.spawn_powerup()
-        for pu in list(self.POWER_UPS):
-            pu.update()
-        
-        # spawn air coins while flying
-        if self.player.is_flying:
-            air_coin_count = sum(1 for r in self.COIN_ROWS if r.is_air)
-            if air_coin_count < 3:
-                self.spawn_air_coinrow()
-        
-        # Remove air coin rows when flying ends
-        if not self.player.is_flying:
-            for row in list(self.COIN_ROWS):
-                if row.is_air:
-                    self.COIN_ROWS.remove(row)
-
-    def display(self):
-        self.background.draw()
-        
-        for row in self.COIN_ROWS:
-            row.display()
-        
-        self.OBSTACLES.sort(key=lambda obj: obj.y)    
-        self.POWER_UPS.sort(key=lambda pu: pu.y)       
-        all_objects = self.POWER_UPS + self.OBSTACLES
-        
-        for smth in all_objects:
-            if smth.lane <= self.player.current_lane:
-                smth.display()
-                
-        self.player.draw()
-        
-        for smth in all_objects:
-            if smth.lane > self.player.current_lane:
-                smth.display()
-            
-        
+    def display(self, alpha=1.0):
+        """Draw the world `alpha` of the way from the previous tick to the last one."""
+        if self.game_over:
+            # the world stopped on the death tick
+            alpha = 1.0
+        prof = self.profiler
+        prof.begin("draw.background")
+        self.background.draw(alpha)
+        prof.end("draw.background")
         
+        # one walk over the queue in painter's order, the player right
+        # after the lane (ground or air) it is in
+        prof.begin("draw.world")
+        p = self.player
+        player_layer = AIR if p.is_flying else GROUND
+        player_lane = p.air_lane if p.is_flying else p.current_lane
+        queue = self.render_queue
+        queue.admit(self.distance + SCREEN_WIDTH, self.obstacle_index.travel)
+        for layer, lanes in enumerate(queue.buckets):
+            for lane, bucket in enumerate(lanes):
+                for obj in bucket:
+                    if obj.kind == COINROW:
+                        self.draw_coinrow(obj, alpha)
+                    else:
+                        self.draw_object(obj, alpha)
+                if layer == player_layer and lane == player_lane:
+                    self.draw_player(alpha)
+        prof.end("draw.world")
+
+        prof.begin("draw.hud")
+        # panels are images, keep the player's tint off them
+        noTint()
         if self.game_over:
-            noLoop()
-            fill(0, 0, 0, 150)
-            noStroke()
-            rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
-            textSize(32)
-            fill(255, 255, 255)
-            textAlign(CENTER, CENTER)
-            text('GAME OVER', SCREEN_WIDTH/2, SCREEN_HEIGHT/2-30)
-            textSize(24)
-            text('Score:' + ' ' + str(self.score), SCREEN_WIDTH/2, SCREEN_HEIGHT/2 + 20)
-            textSize(16)
-            text('Click to restart', SCREEN_WIDTH/2, SCREEN_HEIGHT/2 + 70)
+            self.hud.game_over.draw(self.score)
         else:
-            padding = 10
-            box_width = 80 + 8 * len(str(self.score))
-            box_height = 50
-            box_x = SCREEN_WIDTH - box_width - 20
-            box_y = 15
-            
-            noTint()
-            fill(255, 255, 255, 200)
-            noStroke()
-            rect(box_x, box_y, box_width, box_height, 10)
-
-            if self.coin_img:
-                image(self.coin_img, box_x + 10, box_y + 10, 30, 30, 0, 0, 30, 30)
-
-            fill(0)
-            textSize(24)
-            textAlign(LEFT, CENTER)
-            text(str(self.score), box_x + 50, box_y + (box_height/2) - 3)
-            
+            remaining_seconds = 0
             # Display power-up countdown timer
             if self.player.powerup_active:
-                remaining_ms = self.player.powerup_end_time - millis()
-                remaining_seconds = int(remaining_ms / 1000) + 1  # Round up
-                if remaining_seconds > 0:
-                    # Timer box
-                    timer_box_width = 60
-                    timer_box_height = 50
-                    timer_box_x = box_x - timer_box_width - 10
-                    timer_box_y = 15
-                    
-                    # Draw timer background
-                    fill(255, 200, 0, 220)  # Yellow/gold color
-                    noStroke()
-                    rect(timer_box_x, timer_box_y, timer_box_width, timer_box_height, 10)
-                    
-                    # Draw countdown number
-                    fill(0)
-                    textSize(28)
-                    textAlign(CENTER, CENTER)
-                    text(str(remaining_seconds), timer_box_x + timer_box_width/2, timer_box_y + timer_box_height/2)
+                remaining_ticks = self.timers.remaining(self.player.powerup_timer)
+                remaining_seconds = remaining_ticks // TICKS_PER_SECOND + 1  # Round up
+            self.hud.draw_score(self.score, remaining_seconds)
+        prof.end("draw.hud")
 
 # global game
 game = None
 game_started = False
+timestep = FixedTimestep()
+show_profiler = False
+# overlay rows, refreshed every few frames rather than re-sorted every frame
+profiler_rows = []
+# built from the critical assets in setup(), handed over to the Game
+start_background = None
+start_hud = None
+# ms since launch, see report_load_times()
+first_frame_ms = None
+setup_ms = None
 
 def setup():
-    global game
+    global start_background, start_hud, setup_ms
     size(SCREEN_WIDTH, SCREEN_HEIGHT)
     frameRate(60)
-    game = Game()
+    # only the start screen's layers load before the first frame, sprites
+    # and sounds decode behind it
+    assets = load_assets(wait=False)
+    assets.loader.start()
+    start_background = Background(assets.background, assets.bg_city, assets.lanes)
+    start_hud = HUD()
+    setup_ms = millis()
+
+def start_game():
+    """Build the Game once everything has loaded."""
+    global game
+    game = Game(start_background, start_hud)
+    if REPLAY_FILE:
+        game.restart()
+    if PROFILE_LOG:
+        game.profiler.set_enabled(True)
+        game.profiler.open_log(PROFILE_LOG)
+    report_load_times()
+
+def report_load_times():
+    loader = load_assets(wait=False).loader
+    print("first frame after %d ms (setup %d ms), all assets after %d ms" % (
+        first_frame_ms, setup_ms, millis()))
+    print("  " + ", ".join("%s %.0f ms" % timing for timing in loader.timings))
 
 def draw():
-    global game_started
-    
+    global game_started, first_frame_ms
+
     if not game_started:
         draw_start_screen()
+        if first_frame_ms is None:
+            first_frame_ms = millis()
+        if game is None:
+            # the button shows from the next frame on
+            if load_assets(wait=False).loader.ready():
+                start_game()
+        else:
+            game.audio.flush(millis())
     else:
-        game.update()
-        game.display()
+        prof = game.profiler
+        prof.frame_start()
+        prof.begin("update")
+        ticks = timestep.advance(millis())
+        for _ in range(ticks):
+            game.update()
+            if game.game_over:
+                break
+        prof.end("update")
+        prof.begin("display")
+        game.display(timestep.alpha)
+        prof.end("display")
+        # sounds queued by this frame's ticks, coalesced into one play each
+        prof.begin("audio")
+        game.audio.flush(millis())
+        prof.end("audio")
+        prof.count("ticks", ticks)
+        prof.count("obstacles", len(game.OBSTACLES))
+        prof.count("coin_rows", len(game.COIN_ROWS))
+        prof.count("powerups", len(game.POWER_UPS))
+        prof.frame_end()
+        if show_profiler:
+            draw_profiler_overlay(prof)
+
+def draw_profiler_overlay(prof):
+    global profiler_rows
+    if prof.frame % 15 == 0 or not profiler_rows:
+        profiler_rows = prof.summary()
+
+    line_height = 16
+    box_height = line_height * (len(profiler_rows) + 2) + 10
+    noStroke()
+    fill(0, 0, 0, 170)
+    rect(10, 10, 330, box_height, 6)
+
+    fill(255)
+    textSize(12)
+    textAlign(LEFT, TOP)
+    columns = (170, 225, 280)
+    text("ms", 20, 15)
+    for header, x in zip(("p50", "p95", "p99"), columns):
+        text(header, x, 15)
+    y = 15 + line_height
+    for row in profiler_rows:
+        text(row[0], 20, y)
+        for value, x in zip(row[1:], columns):
+            text("%.2f" % value, x, y)
+        y += line_height
+    text("obstacles %d  coin rows %d  power-ups %d" % (
+        len(game.OBSTACLES), len(game.COIN_ROWS), len(game.POWER_UPS)), 20, y)
 
 def draw_start_screen():
     # Draw background layers (without obstacles/trains)
-    game.background.draw()
-    
-    # Semi-transparent overlay
-    fill(0, 0, 0, 180)
-    noStroke()
-    rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
-    
-    # Title
-    fill(255, 215, 0)  # Gold color
-    textSize(56)
-    textAlign(CENTER, CENTER)
-    text("SUBWAY RUNNER", SCREEN_WIDTH/2, 80)
-    
-    # Welcome message
-    fill(255, 255, 255)
-    textSize(20)
-    text("Welcome to the game of endless run!", SCREEN_WIDTH/2, 150)
-    
-    textSize(16)
-    text("Watch out for obstacles on the tracks, collect power-ups and coins.", SCREEN_WIDTH/2, 190)
-    text("Be careful: the game ends if you run into any obstacle or collide with a train.", SCREEN_WIDTH/2, 215)
-    
-    # Controls section
-    fill(255, 215, 0)
-    textSize(24)
-    text("CONTROLS", SCREEN_WIDTH/2, 270)
-    
-    fill(255, 255, 255)
-    textSize(18)
-    textAlign(LEFT, CENTER)
-    text("UP Arrow", SCREEN_WIDTH/2 - 250, 310)
-    textAlign(LEFT, CENTER)
-    text("Move to the upper lane", SCREEN_WIDTH/2 - 50, 310)
-    
-    text("DOWN Arrow", SCREEN_WIDTH/2 - 250, 345)
-    text("Move to the lower lane", SCREEN_WIDTH/2 - 50, 345)
-    
-    text("SPACE", SCREEN_WIDTH/2 - 250, 380)
-    text("Jump to avoid fences and bushes", SCREEN_WIDTH/2 - 50, 380)
-    
-    text("CTRL", SCREEN_WIDTH/2 - 250, 415)
-    text("Slide under low barriers", SCREEN_WIDTH/2 - 50, 415)
-    
-    # Obstacles section
-    fill(255, 215, 0)
-    textSize(24)
-    textAlign(CENTER, CENTER)
-    text("OBSTACLES", SCREEN_WIDTH/2, 470)
-    
-    fill(255, 255, 255)
-    textSize(18)
-    textAlign(LEFT, CENTER)
-    text("Fences & Bushes", SCREEN_WIDTH/2 - 250, 510)
-    text("Jump over them", SCREEN_WIDTH/2 - 50, 510)
-    
-    text("Slide Barriers", SCREEN_WIDTH/2 - 250, 545)
-    text("Slide underneath", SCREEN_WIDTH/2 - 50, 545)
-    
-    # Good luck message
-    fill(255, 255, 255)
-    textSize(18)
-    textAlign(CENTER, CENTER)
-    text("Good luck and have fun!", SCREEN_WIDTH/2, 595)
-    
-    # Click to Play button
-    button_width = 250
-    button_height = 60
-    button_x = SCREEN_WIDTH/2 - button_width/2
-    button_y = 635
-    
-    # Button in gold color (same as title)
-    fill(255, 215, 0)
-    noStroke()
-    rect(button_x, button_y, button_width, button_height, 15)
-    
-    # Button text
-    fill(0)
-    textSize(28)
-    textAlign(CENTER, CENTER)
-    text("CLICK TO PLAY", SCREEN_WIDTH/2, button_y + button_height/2)
+    start_background.draw()
+    noTint()
+    # a progress bar where the button goes until everything has loaded
+    ready = game is not None
+    start_hud.start_screen.draw(ready)
+    if not ready:
+        start_hud.loading.draw(int(load_assets(wait=False).loader.progress() * 100))
 
 def keyPressed():
-    global game_started
+    global game_started, show_profiler
+    if game is None:
+        return
+    if key == 'p' or key == 'P':
+        show_profiler = not show_profiler
+        # profiling stays on while it is logging to a file
+        game.profiler.set_enabled(show_profiler or game.profiler.log is not None)
+        return
     if not game_started:
         return
         
     if key == CODED:
-        if keyCode == UP:
-            game.player.switch_lane("up")
+        if game.replay is not None and keyCode in (LEFT, RIGHT):
+            game.seek_by(SEEK_SECONDS if keyCode == RIGHT else -SEEK_SECONDS)
+        elif keyCode == UP:
+            game.input("up")
         elif keyCode == DOWN:
-            game.player.switch_lane("down")
+            game.input("down")
         elif keyCode == CONTROL or keyCode == 17:
-            game.player.slide()
+            game.input("slide")
     elif key == ' ':
-        game.player.jump()
+        game.input("jump")
 
 def mousePressed():
-    global game, game_started
+    global game_started
     
     # Start screen - check if button clicked
     if not game_started:
-        button_width = 250
-        button_height = 60
-        button_x = SCREEN_WIDTH/2 - button_width/2
-        button_y = 635
-        
-        if (mouseX >= button_x and mouseX <= button_x + button_width and
-            mouseY >= button_y and mouseY <= button_y + button_height):
+        if game is not None and in_button(mouseX, mouseY):
             game_started = True
+            timestep.reset()
     # Game over - restart directly to game
     elif game.game_over:
-        game.bg_sound.close()
-        game.death_sound.close()
-        game.coin_sound.close()
-        game.power_sound.close()
-        game = Game()
+        game.restart()
+        timestep.reset()
         loop()
 
+def stop():
+    # the profiler buffers its log rows; write out the last of them
+    if game is not None:
+        game.profiler.close_log()
@@ -0,0 +1,44 @@
+"""Helpers shared by the tests: a reproducible driver and a state fingerprint."""
+
+import random
+
+import batch
+
+
+class Driver:
+    """DodgePolicy plus the odd random input, drawn from (seed, tick).
+
+    Nothing carries over between ticks, so a run restored from a snapshot
+    gets exactly the inputs the original got.
+    """
+
+    def __init__(self, seed, noise=0.01):
+        self.seed = seed
+        self.noise = noise
+        self.dodge = batch.DodgePolicy(seed)
+
+    def __call__(self, sim):
+        rng = random.Random(self.seed * 1000003 + sim.tick)
+        if rng.random() < self.noise:
+            sim.input(rng.choice(("up", "down", "jump", "slide")))
+        else:
+            self.dodge.rng = rng
+            self.dodge(sim)
+
+
+def state_of(sim):
+    """Everything a tick can change that the player would notice."""
+    p = sim.player
+    timers = sim.timers
+    return (
+        sim.tick, sim.score, sim.death_tick, sim.game_over, sim.distance,
+        sim.track_scroll_speed, sim.powerup_ready,
+        timers.remaining(sim.powerup_cooldown_timer),
+        p.x, p.y, p.velocity_y, p.current_lane, p.target_lane, p.air_lane, p.state,
+        p.is_flying, p.on_train, p.powerup_active, p.invincible, p.JUMP_FORCE,
+        timers.remaining(p.powerup_timer), timers.remaining(p.invincible_timer),
+        timers.remaining(p.slide_timer),
+        sorted((obj.x, obj.lane, obj.kind, obj.speed) for obj in sim.OBSTACLES),
+        sorted((row.x, row.lane, row.is_air, row.remaining) for row in sim.COIN_ROWS),
+        sorted((pu.x, pu.lane, pu.kind) for pu in sim.POWER_UPS),
+    )
@@ -0,0 +1,39 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from envs import ACTIONS, SubwayEnv, VectorSubwayEnv
+
+from support import Driver
+
+
+def test_vector_env_steps_like_scalar_envs():
+    n, seed = 24, 1000
+    vec = VectorSubwayEnv(n)
+    obs = vec.reset(seed)
+    scalars = [SubwayEnv() for _ in range(n)]
+    scalar_obs = [env.reset(seed + i) for i, env in enumerate(scalars)]
+    drivers = [Driver(i, noise=0.002) for i in range(n)]
+    live = set(range(n))
+
+    for _ in range(3000):
+        actions = np.zeros(n, int)
+        for i in live:
+            np.testing.assert_allclose(obs[i], scalar_obs[i], atol=1e-5)
+            # the driver steers the scalar game; its input becomes the action
+            sim = scalars[i].sim
+            drivers[i](sim)
+            if sim.pending_inputs:
+                actions[i] = ACTIONS.index(sim.pending_inputs.pop())
+                del sim.pending_inputs[:]
+
+        obs, rewards, dones, _ = vec.step(actions)
+        for i in sorted(live):
+            scalar_obs[i], reward, done, _ = scalars[i].step(int(actions[i]))
+            assert done == dones[i]
+            assert reward == pytest.approx(rewards[i])
+            if done:
+                # the vector env has moved on to a new run already
+                live.discard(i)
+        if not live:
+            break
@@ -0,0 +1,49 @@
+import os
+
+import pytest
+
+from replay import InputLog, replay_headless
+from simulation import Simulation
+
+from support import Driver, state_of
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def record(seed, max_ticks=20000):
+    sim = Simulation(seed=seed)
+    driver = Driver(seed, noise=0.02)
+    states = []
+    while not sim.game_over and sim.tick < max_ticks:
+        driver(sim)
+        sim.update()
+        states.append(state_of(sim))
+    return sim, states
+
+
+@pytest.mark.parametrize("seed", [3, 17, 29])
+def test_replay_matches_the_recorded_run_tick_by_tick(seed):
+    sim, states = record(seed)
+    log = InputLog.from_bytes(sim.input_log.to_bytes())
+
+    replayed = Simulation()
+    replayed.start_replay(log)
+    for expected in states:
+        replayed.update()
+        assert state_of(replayed) == expected
+
+
+@pytest.mark.parametrize("seed", [3, 17])
+def test_headless_replay_ends_with_the_same_score(seed):
+    sim, _ = record(seed)
+    assert sim.game_over
+    log = InputLog.from_bytes(sim.input_log.to_bytes())
+    assert replay_headless(log) == (sim.score, sim.death_tick)
+
+
+def test_replay_recorded_under_python_27():
+    # the sketch records under Jython 2.7; this log was recorded with
+    # CPython 2.7.18 from batch.DodgePolicy(4) on seed 4
+    log = InputLog.load(os.path.join(FIXTURES, "seed4_py27.replay"))
+    assert log.end_tick
+    assert replay_headless(log) == (log.score, log.end_tick)
@@ -0,0 +1,59 @@
+import pytest
+
+from replay import InputLog
+from simulation import Simulation
+from snapshot import SnapshotRing, snapshot, restore, seek
+
+from support import Driver, state_of
+
+
+@pytest.mark.parametrize("seed, at", [(5, 120), (5, 900), (12, 1500), (40, 2400)])
+def test_restored_run_steps_like_the_original(seed, at):
+    driver = Driver(seed)
+    original = Simulation(seed=seed)
+    while original.tick < at and not original.game_over:
+        driver(original)
+        original.update()
+    data = snapshot(original)
+
+    restored = Simulation()
+    restore(restored, data)
+    assert state_of(restored) == state_of(original)
+    assert snapshot(restored) == data
+
+    for _ in range(1500):
+        if original.game_over:
+            break
+        driver(original)
+        original.update()
+        driver(restored)
+        restored.update()
+        assert state_of(restored) == state_of(original)
+    assert snapshot(restored) == snapshot(original)
+
+
+def test_restore_rejects_other_versions():
+    data = bytearray(snapshot(Simulation(seed=1)))
+    data[4] ^= 0xff
+    with pytest.raises(ValueError):
+        restore(Simulation(), bytes(data))
+
+
+def test_seek_further_back_than_the_ring_replays_from_the_start():
+    driver = Driver(8)
+    original = Simulation(seed=8)
+    states = {}
+    while original.tick < 1500 and not original.game_over:
+        driver(original)
+        original.update()
+        states[original.tick] = state_of(original)
+    log = InputLog.from_bytes(original.input_log.to_bytes())
+
+    replayed = Simulation()
+    replayed.start_replay(log)
+    # three snapshots, 60 ticks apart: the ring reaches back 180 ticks or so
+    ring = SnapshotRing(capacity=3, every=60)
+    end = original.tick
+    for target in (end - 10, end - 100, end // 5, end * 2 // 3, 30):
+        assert seek(replayed, ring, target) == target
+        assert state_of(replayed) == states[target]
@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+from timers import TimerWheel
+
+
+def chains(name):
+    # some timers schedule another one when they fire
+    return name > 0 and name % 7 == 0
+
+
+class NaiveTimers:
+    """Reference: scan every timer on every tick."""
+
+    def __init__(self):
+        self.now = 0
+        self.seq = 0
+        self.timers = {}
+
+    def after(self, delay, name):
+        self.seq += 1
+        self.timers[self.seq] = (self.now + max(1, delay), name)
+        return self.seq
+
+    def cancel(self, seq):
+        self.timers.pop(seq, None)
+
+    def remaining(self, seq):
+        if seq not in self.timers:
+            return 0
+        return self.timers[seq][0] - self.now
+
+    def advance(self):
+        self.now += 1
+        due = sorted(seq for seq, (at, _) in self.timers.items() if at == self.now)
+        names = [self.timers.pop(seq)[1] for seq in due]
+        for name in names:
+            if chains(name):
+                self.after(name % 5, -name)
+        return names
+
+
+@pytest.mark.parametrize("levels", [1, 2, 4])
+def test_wheel_fires_like_a_naive_scan(levels):
+    rng = random.Random(levels)
+    wheel = TimerWheel(levels)
+    naive = NaiveTimers()
+    fired = []
+    handles = []
+    # delays reach past the top level, so the overflow list gets used too
+    longest = min(wheel.span * 3, 20000)
+
+    def fire(name):
+        fired.append(name)
+        # scheduled while the wheel is firing
+        if chains(name):
+            wheel.after(name % 5, fire, -name)
+
+    for name in range(1, 3000):
+        roll = rng.random()
+        if roll < 0.3:
+            delay = rng.choice((0, 1, rng.randint(1, 64), rng.randint(1, longest)))
+            handles.append((wheel.after(delay, fire, name), naive.after(delay, name)))
+        elif roll < 0.4 and handles:
+            timer, seq = handles.pop(rng.randrange(len(handles)))
+            wheel.cancel(timer)
+            naive.cancel(seq)
+        del fired[:]
+        wheel.advance()
+        assert fired == naive.advance()
+        for timer, seq in handles[-20:]:
+            assert wheel.remaining(timer) == naive.remaining(seq)
+
+    while naive.timers:
+        del fired[:]
+        wheel.advance()
+        assert fired == naive.advance()
+
+
+def test_plain_countdown_and_clear():
+    wheel = TimerWheel()
+    countdown = wheel.after(3)
+    assert wheel.remaining(countdown) == 3
+    for _ in range(3):
+        wheel.advance()
+    assert wheel.remaining(countdown) == 0
+    assert not countdown.active
+
+    pending = wheel.after(10)
+    wheel.clear()
+    assert wheel.remaining(pending) == 0
+    assert wheel.remaining(None) == 0
@@ -0,0 +1,135 @@
+"""Tick-based timers on a hierarchical timing wheel.
+
+Everything timed in a run (power-up expiry, landing invincibility, the
+power-up cooldown, a slide) is a Timer on the simulation's TimerWheel
+instead of an end time polled every frame. advance() moves the wheel on by
+one tick and touches only the slot that comes due, so a tick costs
+O(timers that expire) plus a cascade every 64 ticks.
+
+    timer = wheel.after(90, player.end_slide)   # fires 90 advance()s from now
+    wheel.remaining(timer)                      # ticks left, 0 once done
+    wheel.cancel(timer)
+
+Time is whatever advance() counts, never the wall clock, so a replay (or a
+restored snapshot) fires every timer on the same tick as the original run.
+Timers due on the same tick fire in the order they were scheduled.
+"""
+
+from operator import attrgetter
+
+SLOT_BITS = 6
+SLOTS = 1 << SLOT_BITS
+MASK = SLOTS - 1
+
+by_seq = attrgetter("seq")
+
+
+class Timer(object):
+    __slots__ = ("due", "callback", "args", "seq", "active")
+
+    def __init__(self, due, callback, args, seq):
+        self.due = due
+        self.callback = callback
+        self.args = args
+        self.seq = seq
+        self.active = True
+
+
+class TimerWheel:
+    """Timers bucketed by due tick, 64 slots per level.
+
+    Level k holds timers due within 64**(k+1) ticks, by bits 6k..6k+5 of
+    their due tick; when the level below wraps, the next slot up is spread
+    over the lower levels. Timers further out than the top level wait in
+    an overflow list until it wraps. Cancelled timers are only flagged and
+    dropped when their slot is reached.
+
+    A timer without a callback is a plain countdown, read with remaining().
+    """
+
+    def __init__(self, levels=4):
+        self.levels = [[[] for _ in range(SLOTS)] for _ in range(levels)]
+        self.span = 1 << (SLOT_BITS * levels)
+        self.overflow = []
+        self.now = 0
+        self.seq = 0
+
+    def after(self, delay, callback=None, *args):
+        """Schedule callback(*args) to run `delay` advance()s from now (at least one)."""
+        self.seq += 1
+        timer = Timer(self.now + max(1, delay), callback, args, self.seq)
+        self.place(timer)
+        return timer
+
+    def place(self, timer):
+        delta = timer.due - self.now
+        if delta >= self.span:
+            self.overflow.append(timer)
+            return
+        level = 0
+        limit = SLOTS
+        while delta >= limit:
+            level += 1
+            limit <<= SLOT_BITS
+        self.levels[level][(timer.due >> (SLOT_BITS * level)) & MASK].append(timer)
+
+    def cancel(self, timer):
+        # None and finished timers are fine, so callers can cancel blindly
+        if timer is not None:
+            timer.active = False
+
+    def remaining(self, timer):
+        """Ticks until timer fires, 0 for None or a fired or cancelled timer."""
+        if timer is None or not timer.active:
+            return 0
+        return timer.due - self.now
+
+    def clear(self):
+        for level in self.levels:
+            for slot in level:
+                for timer in slot:
+                    timer.active = False
+                del slot[:]
+        for timer in self.overflow:
+            timer.active = False
+        self.overflow = []
+
+    def cascade(self, timers):
+        for timer in timers:
+            if timer.active:
+                self.place(timer)
+
+    def advance(self):
+        """Move on one tick and run what came due; returns how many fired."""
+        self.now = now = self.now + 1
+        levels = self.levels
+        shift = SLOT_BITS
+        for level in levels[1:]:
+            if now & ((1 << shift) - 1):
+                break
+            index = (now >> shift) & MASK
+            slot = level[index]
+            if slot:
+                level[index] = []
+                self.cascade(slot)
+            shift += SLOT_BITS
+        if not now & (self.span - 1) and self.overflow:
+            waiting = self.overflow
+            self.overflow = []
+            self.cascade(waiting)
+
+        index = now & MASK
+        due = levels[0][index]
+        if not due:
+            return 0
+        levels[0][index] = []
+        if len(due) > 1:
+            due.sort(key=by_seq)
+        fired = 0
+        for timer in due:
+            if timer.active:
+                timer.active = False
+                fired += 1
+                if timer.callback is not None:
+                    timer.callback(*timer.args)
+        return fired
@@ -0,0 +1,50 @@
+"""Fixed-timestep scheduler between the sketch's draw() and Simulation.update.
+
+Real time is accumulated every rendered frame and spent in whole simulation
+ticks, so the world moves at the same speed whatever the frame rate. The
+leftover fraction of a tick is exposed as `alpha` for render interpolation.
+"""
+
+from simulation import MS_PER_TICK
+
+
+class FixedTimestep:
+    def __init__(self, step_ms=MS_PER_TICK, max_steps=5):
+        self.step_ms = step_ms
+        # catch-up cap: after a long stall drop time instead of spiralling
+        self.max_steps = max_steps
+        self.reset()
+
+    def reset(self, now_ms=None):
+        self.last_time = now_ms
+        self.accumulator = 0.0
+        self.alpha = 0.0
+        self.dropped_ms = 0.0
+
+    def advance(self, now_ms):
+        """Feed the current real time, get the number of ticks to run now."""
+        if self.last_time is None:
+            # first frame after a reset runs exactly one tick
+            self.last_time = now_ms
+            self.alpha = 1.0
+            return 1
+
+        elapsed = now_ms - self.last_time
+        self.last_time = now_ms
+        if elapsed < 0:
+            elapsed = 0
+        self.accumulator += elapsed
+
+        steps = int(self.accumulator // self.step_ms)
+        if steps > self.max_steps:
+            self.dropped_ms += (steps - self.max_steps) * self.step_ms
+            self.accumulator -= (steps - self.max_steps) * self.step_ms
+            steps = self.max_steps
+        self.accumulator -= steps * self.step_ms
+
+        self.alpha = self.accumulator / self.step_ms
+        return steps
+
+
+def interpolate(previous, current, alpha):
+    return previous + (current - previous) * alpha
@@ -0,0 +1,209 @@
+"""Retained UI panels for the sketch.
+
+Each panel renders into its own offscreen PGraphics and keeps the input it
+was last rendered for (score, whole seconds left, ...). draw(key) re-renders
+only when the key changed, so a frame normally costs one image() blit per
+panel instead of a dozen fill/textSize/text calls.
+
+Like the sketch itself this relies on Processing's drawing builtins, so it
+only works inside Processing.py.
+"""
+
+from simulation import SCREEN_WIDTH, SCREEN_HEIGHT
+
+GOLD = (255, 215, 0)
+
+BUTTON_WIDTH = 250
+BUTTON_HEIGHT = 60
+BUTTON_X = SCREEN_WIDTH/2 - BUTTON_WIDTH/2
+BUTTON_Y = 635
+
+SCORE_BOX_HEIGHT = 50
+SCORE_BOX_MARGIN = 20
+# wide enough for a ten-digit score
+SCORE_PANEL_WIDTH = 80 + 8 * 10
+TIMER_BOX_WIDTH = 60
+TIMER_BOX_HEIGHT = 50
+
+_STALE = object()
+
+
+class Panel:
+    """A screen region drawn by render(g, key) into its own buffer."""
+
+    def __init__(self, x, y, w, h, render):
+        self.x = x
+        self.y = y
+        self.buffer = createGraphics(w, h)
+        self.render = render
+        self.key = _STALE
+        self.renders = 0
+
+    def draw(self, key=None, x=None, y=None):
+        if key != self.key:
+            g = self.buffer
+            g.beginDraw()
+            g.clear()
+            self.render(g, key)
+            g.endDraw()
+            self.key = key
+            self.renders += 1
+        image(self.buffer, self.x if x is None else x, self.y if y is None else y)
+
+
+def in_button(x, y):
+    return (x >= BUTTON_X and x <= BUTTON_X + BUTTON_WIDTH and
+            y >= BUTTON_Y and y <= BUTTON_Y + BUTTON_HEIGHT)
+
+
+def score_box_width(score):
+    return 80 + 8 * len(str(score))
+
+
+def score_box_x(score):
+    return SCREEN_WIDTH - score_box_width(score) - SCORE_BOX_MARGIN
+
+
+def render_start_screen(g, ready):
+    # Semi-transparent overlay
+    g.fill(0, 0, 0, 180)
+    g.noStroke()
+    g.rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+    # Title
+    g.fill(*GOLD)
+    g.textSize(56)
+    g.textAlign(CENTER, CENTER)
+    g.text("SUBWAY RUNNER", SCREEN_WIDTH/2, 80)
+
+    # Welcome message
+    g.fill(255, 255, 255)
+    g.textSize(20)
+    g.text("Welcome to the game of endless run!", SCREEN_WIDTH/2, 150)
+
+    g.textSize(16)
+    g.text("Watch out for obstacles on the tracks, collect power-ups and coins.", SCREEN_WIDTH/2, 190)
+    g.text("Be careful: the game ends if you run into any obstacle or collide with a train.", SCREEN_WIDTH/2, 215)
+
+    # Controls section
+    g.fill(*GOLD)
+    g.textSize(24)
+    g.text("CONTROLS", SCREEN_WIDTH/2, 270)
+
+    g.fill(255, 255, 255)
+    g.textSize(18)
+    g.textAlign(LEFT, CENTER)
+    rows = [
+        ("UP Arrow", "Move to the upper lane", 310),
+        ("DOWN Arrow", "Move to the lower lane", 345),
+        ("SPACE", "Jump to avoid fences and bushes", 380),
+        ("CTRL", "Slide under low barriers", 415),
+    ]
+    for label, action, y in rows:
+        g.text(label, SCREEN_WIDTH/2 - 250, y)
+        g.text(action, SCREEN_WIDTH/2 - 50, y)
+
+    # Obstacles section
+    g.fill(*GOLD)
+    g.textSize(24)
+    g.textAlign(CENTER, CENTER)
+    g.text("OBSTACLES", SCREEN_WIDTH/2, 470)
+
+    g.fill(255, 255, 255)
+    g.textSize(18)
+    g.textAlign(LEFT, CENTER)
+    g.text("Fences & Bushes", SCREEN_WIDTH/2 - 250, 510)
+    g.text("Jump over them", SCREEN_WIDTH/2 - 50, 510)
+    g.text("Slide Barriers", SCREEN_WIDTH/2 - 250, 545)
+    g.text("Slide underneath", SCREEN_WIDTH/2 - 50, 545)
+
+    # Good luck message
+    g.textAlign(CENTER, CENTER)
+    g.text("Good luck and have fun!", SCREEN_WIDTH/2, 595)
+
+    # Click to Play button, gold like the title, once everything has loaded
+    if not ready:
+        return
+    g.fill(*GOLD)
+    g.rect(BUTTON_X, BUTTON_Y, BUTTON_WIDTH, BUTTON_HEIGHT, 15)
+    g.fill(0)
+    g.textSize(28)
+    g.text("CLICK TO PLAY", SCREEN_WIDTH/2, BUTTON_Y + BUTTON_HEIGHT/2)
+
+
+def render_loading(g, percent):
+    # button-sized bar filling with the loaded fraction
+    g.noStroke()
+    g.fill(0, 0, 0, 160)
+    g.rect(0, 0, BUTTON_WIDTH, BUTTON_HEIGHT, 15)
+    g.fill(*GOLD)
+    g.rect(0, 0, BUTTON_WIDTH * percent / 100.0, BUTTON_HEIGHT, 15)
+    g.fill(255)
+    g.textSize(20)
+    g.textAlign(CENTER, CENTER)
+    g.text("LOADING %d%%" % percent, BUTTON_WIDTH/2, BUTTON_HEIGHT/2)
+
+
+def render_game_over(g, score):
+    g.fill(0, 0, 0, 150)
+    g.noStroke()
+    g.rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+    g.textSize(32)
+    g.fill(255, 255, 255)
+    g.textAlign(CENTER, CENTER)
+    g.text('GAME OVER', SCREEN_WIDTH/2, SCREEN_HEIGHT/2-30)
+    g.textSize(24)
+    g.text('Score:' + ' ' + str(score), SCREEN_WIDTH/2, SCREEN_HEIGHT/2 + 20)
+    g.textSize(16)
+    g.text('Click to restart', SCREEN_WIDTH/2, SCREEN_HEIGHT/2 + 70)
+
+
+def render_timer(g, remaining_seconds):
+    g.fill(255, 200, 0, 220)  # Yellow/gold color
+    g.noStroke()
+    g.rect(0, 0, TIMER_BOX_WIDTH, TIMER_BOX_HEIGHT, 10)
+    g.fill(0)
+    g.textSize(28)
+    g.textAlign(CENTER, CENTER)
+    g.text(str(remaining_seconds), TIMER_BOX_WIDTH/2, TIMER_BOX_HEIGHT/2)
+
+
+class HUD:
+    """Every panel of the game, created once the sketch has a surface."""
+
+    def __init__(self):
+        # coin icon of the score box, an image and a placement in it
+        self.coin_img = None
+        self.coin_sprite = None
+        self.start_screen = Panel(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT, render_start_screen)
+        self.loading = Panel(BUTTON_X, BUTTON_Y, BUTTON_WIDTH, BUTTON_HEIGHT, render_loading)
+        self.game_over = Panel(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT, render_game_over)
+        # right-aligned in a buffer wide enough for any score
+        self.score = Panel(SCREEN_WIDTH - SCORE_PANEL_WIDTH - SCORE_BOX_MARGIN, 15,
+                           SCORE_PANEL_WIDTH, SCORE_BOX_HEIGHT, self.render_score)
+        self.timer = Panel(0, 15, TIMER_BOX_WIDTH, TIMER_BOX_HEIGHT, render_timer)
+
+    def render_score(self, g, score):
+        box_width = score_box_width(score)
+        box_x = SCORE_PANEL_WIDTH - box_width
+        g.noStroke()
+        g.fill(255, 255, 255, 200)
+        g.rect(box_x, 0, box_width, SCORE_BOX_HEIGHT, 10)
+        if self.coin_img and self.coin_sprite:
+            dx, dy, dw, dh, u1, v1, u2, v2 = self.coin_sprite
+            g.image(self.coin_img, box_x + 10 + dx, 10 + dy, dw, dh, u1, v1, u2, v2)
+        g.fill(0)
+        g.textSize(24)
+        g.textAlign(LEFT, CENTER)
+        g.text(str(score), box_x + 50, (SCORE_BOX_HEIGHT/2) - 3)
+
+    def set_coin(self, img, sprite):
+        self.coin_img = img
+        self.coin_sprite = sprite
+        self.score.key = _STALE
+
+    def draw_score(self, score, remaining_seconds=0):
+        """Score box, plus the power-up timer to its left while one runs."""
+        self.score.draw(score)
+        if remaining_seconds > 0:
+            self.timer.draw(remaining_seconds, score_box_x(score) - TIMER_BOX_WIDTH - 10)